@@ -1,33 +1,213 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, g, request, jsonify, render_template, send_from_directory, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import json
+import atexit
+import heapq
+import logging
 import os
-from math import radians, sin, cos, sqrt, atan2
+import time
+
+import serialize
+from batch import distance_rows, plan_batch
+from distance import DistanceMatrix
+from events import EventLog
+from forecast import DemandForecast, plan_transfers
+from geo import set_distance_provider
+from inventory import StockIndex
+from manifest import ManifestError, read_manifest
+from metrics import REGISTRY, Sampler, configure_logging, log_sampled, span
+from model import Inventory
+import offload
+from offload import Conflict, Jobs, SharedArray, shared_inventory
+from pending import PRIORITY_ORDER, PendingQueue
+from priority import CampPriorities
+from rebalance import Rebalancer
+from roads import RoadNetwork
+from routing import MatrixCache, plan_routes
+from session import SessionAllocations
+from state import StateStore
+from storage import open_storage
 
 # Get the directory where app.py is located
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_PATH = os.path.join(BASE_DIR, "data", "hubs.json")
-allocations_data=[]
-# Initialize Flask app
-app = Flask(__name__, template_folder="templates")
+DATA_PATH = os.environ.get("DISASTRO_DATA_PATH", os.path.join(BASE_DIR, "data", "hubs.json"))
+# "json" (hubs.json plus journal) or "sqlite" (hubs.db, migrated from hubs.json on first use)
+STORAGE = os.environ.get("DISASTRO_STORAGE", "json")
+# Session allocations kept in memory, by count and age in seconds (0 = no age limit);
+# older ones are appended to hubs.session.ndjson next to the data file
+SESSION_LIMIT = int(os.environ.get("DISASTRO_SESSION_LIMIT", 10000))
+SESSION_MAX_AGE = float(os.environ.get("DISASTRO_SESSION_MAX_AGE", 0))
+# Session lists at least this long are streamed in chunks instead of joined into one body
+SESSION_STREAM_MIN = int(os.environ.get("DISASTRO_SESSION_STREAM_MIN", 5000))
+# Road graph file (see roads.py); when set, distances follow the roads instead of the great circle
+ROAD_GRAPH = os.environ.get("DISASTRO_ROAD_GRAPH")
+roads = RoadNetwork.load(ROAD_GRAPH) if ROAD_GRAPH else None
+set_distance_provider(roads)
+# Length of a demand-forecast period in seconds; camps' stated needs are read as needs per period
+FORECAST_PERIOD = float(os.environ.get("DISASTRO_FORECAST_PERIOD", 86400))
+# Serve pending requests from the stocked hubs that deliver soonest when stock arrives, moving
+# stock between hubs where that gets it to the camps sooner (see rebalance.py); 1 turns it on
+REBALANCE = os.environ.get("DISASTRO_REBALANCE", "0") == "1"
+# Fleet speed in km/h the rebalancer times deliveries and transfers with
+FLEET_SPEED_KMH = float(os.environ.get("DISASTRO_FLEET_SPEED_KMH", 40))
+# Change feed behind /events; ids are handed to pages with their initial state
+events = EventLog()
+# DISASTRO_LOG_LEVEL=DEBUG logs allocations, one request in DISASTRO_LOG_SAMPLE
+log = configure_logging().getChild("app")
+log_sample = Sampler(int(os.environ.get("DISASTRO_LOG_SAMPLE", 100)))
+class JSONProvider(DefaultJSONProvider):
+    """jsonify and request.get_json through serialize.py (orjson when installed)."""
+
+    def dumps(self, obj, **kwargs):
+        return serialize.dumps_str(obj, sort_keys=self.sort_keys, pretty=bool(kwargs.get("indent")))
+
+    def loads(self, s, **kwargs):
+        return serialize.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(serialize.dumps(obj, self.sort_keys, pretty) + b"\n",
+                                        mimetype=self.mimetype)
+
+# Initialize Flask app; the pages live with the original app and follow this one's /events
+app = Flask(__name__, template_folder=os.path.join(BASE_DIR, "disaster management", "templates"),
+            static_folder=os.path.join(BASE_DIR, "disaster management", "static"))
+app.json = JSONProvider(app)
 CORS(app)
 
-# Load hubs and relief camps data
-def load_data():
-    try:
-        with open(DATA_PATH, encoding="utf-8") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"Error loading data: {e}")
-        return {"hubs": [], "relief_camps": []}
+def dumps(obj):
+    """Serialize like jsonify does outside debug mode: sorted keys, no whitespace."""
+    return serialize.dumps_str(obj, sort_keys=True)
+
+# This session's allocations, kept serialized for /session_allocations
+allocations_data = SessionAllocations(dumps, SESSION_LIMIT, SESSION_MAX_AGE,
+                                      os.path.splitext(DATA_PATH)[0] + ".session.ndjson")
+# (event id, body) of the last /hubs.json served
+hubs_cache = None
+# Stop-to-stop distance matrices of recent /plan_routes calls
+route_matrices = MatrixCache()
+# Planning offloaded to a process pool (?async=1, /pending/sweep); 0 = one process per CPU
+jobs = Jobs(int(os.environ.get("DISASTRO_OFFLOAD_WORKERS", 0)) or None)
+
+store = None
+stock = None
+# Units per hub and resource as one hubs x resources array, for vectorized work
+inventory = None
+pending = None
+priorities = None
+distances = None
+forecast = None
+rebalancer = None
+
+REQUEST_SECONDS = REGISTRY.histogram("disastro_request_seconds", "Request handling time.", ["endpoint"])
+REQUESTS = REGISTRY.counter("disastro_requests_total", "Requests served.", ["endpoint", "status"])
+ALLOCATIONS = REGISTRY.counter("disastro_allocations_total", "Allocation records created.", ["resource", "status"])
+UNITS_ALLOCATED = REGISTRY.counter("disastro_units_allocated_total", "Units shipped from hubs.", ["resource"])
+UNITS_UNFILLED = REGISTRY.counter("disastro_units_unfilled_total",
+                                  "Units requested that no hub could supply at request time.", ["resource"])
+REGISTRY.gauge("disastro_pending_requests", "Pending allocation requests waiting for stock.", ["resource"],
+               lambda: {(resource,): pending.count(resource) for resource in pending.resources()})
+REGISTRY.gauge("disastro_session_allocations", "Session allocations held in memory.",
+               callback=lambda: len(allocations_data))
+REGISTRY.gauge("disastro_unsaved_records", "Change records not yet compacted into the snapshot.",
+               callback=lambda: store.storage.size)
+REGISTRY.gauge("disastro_events_published", "Change events published this run.", callback=lambda: events.seq)
+
+def json_body():
+    """The request's JSON payload (None if it is not JSON), timed as the "request.parse" span."""
+    with span("request.parse"):
+        return request.get_json(silent=True)
+
+def init_store(path=DATA_PATH, storage=STORAGE):
+    """
+    Load hubs and relief camps into memory and build the lookup structures
+    kept in step with them. The store writes changes back in the background.
+    """
+    global store, stock, inventory, pending, priorities, distances, forecast, rebalancer
+    if store is not None:
+        store.close()
+    store = StateStore(path, storage=open_storage(storage, path)).start()
+    stock = StockIndex.from_hubs(store.hubs)
+    inventory = Inventory.from_hubs(store.hubs)
+    pending = PendingQueue.from_camps(store.relief_camps)
+    priorities = CampPriorities(store.relief_camps)
+    distances = DistanceMatrix.from_state(store.hubs, store.relief_camps)
+    forecast = DemandForecast(store.relief_camps, inventory.resources, FORECAST_PERIOD)
+    rebalancer = Rebalancer(store.hubs, speed_kmh=FLEET_SPEED_KMH)
+
+    def on_record(record):
+        if record["op"] == "inventory":
+            units = store.hub(record["hub"])["resources"][record["resource"]]
+            previous = inventory.get(record["hub"], record["resource"])
+            stock.update(record["hub"], record["resource"], units)
+            inventory.set(record["hub"], record["resource"], units)
+            # Only stock that rose can serve requests waiting on it
+            rose = record["delta"] > 0 if "delta" in record else units > previous
+            if rose and pending.count(record["resource"]):
+                rebalancer.touch(record["resource"])
+            events.publish("inventory", {"hub": record["hub"], "resource": record["resource"], "units": units})
+        elif record["op"] == "hub":
+            hub = record["hub"]
+            stock.add_hub(hub["name"], hub["location"], hub["resources"])
+            inventory.add_hub(hub["name"], hub["resources"])
+            distances.set_hub(hub["name"], hub["location"])
+            rebalancer.set_hub(hub["name"], hub["location"], hub.get("dispatch_hours", 0))
+            for resource in hub["resources"]:
+                if pending.count(resource):
+                    rebalancer.touch(resource)
+            events.publish("hub", hub)
+        elif record["op"] == "alloc":
+            alloc = record["alloc"]
+            units = alloc.get("allocated_units")
+            ALLOCATIONS.inc(resource=alloc.get("resource"), status=alloc.get("status", "Allocated"))
+            if alloc.get("status") != "Pending" and isinstance(units, (int, float)) and units > 0:
+                priorities.delivered_to(record["camp"], units)
+                forecast.observe(record["camp"], alloc.get("resource"), units)
+                UNITS_ALLOCATED.inc(units, resource=alloc.get("resource"))
+            events.publish("allocation", {"camp": record["camp"], "alloc": alloc})
+        elif record["op"] == "alloc_update":
+            events.publish("allocation_update", {"camp": record["camp"], "index": record["index"],
+                                                 "fields": record["fields"]})
+            # A filled pending request is also an entry of the session list
+            alloc = store.camp(record["camp"])["allocations"][record["index"]]
+            if alloc.get("status") != "Pending" or alloc.get("units_remaining", 0) <= 0:
+                pending.resolve(alloc["resource"], record["camp"], record["index"])
+            with allocations_data.lock:
+                position = allocations_data.refresh(alloc)
+                if position is not None:
+                    events.publish("session", {"start": position, "allocations": [alloc]})
 
-def save_data(data):
-    with open(DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    store.subscribe(on_record)
+    return store
 
-data = load_data()
-HUBS = data["hubs"]
-RELIEF_CAMPS = data["relief_camps"]
+def shutdown():
+    jobs.shutdown()
+    store.close()
+    with allocations_data.lock:
+        allocations_data.flush()
+
+# A spawned pool process re-imports this module as __mp_main__ and needs none of the state
+if __name__ != "__mp_main__":
+    init_store()
+    atexit.register(shutdown)
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    if "started" in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.started, endpoint=endpoint)
+    REQUESTS.inc(endpoint=endpoint, status=str(response.status_code))
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Counters, gauges and timing histograms in the Prometheus text format."""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route('/')
 def index():
@@ -37,214 +217,1017 @@ def index():
 def hub_page():
     return render_template("hub.html")
 
+def not_modified(etag):
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+def hubs_changes(since, upto):
+    """
+    What changed in /hubs.json between event `since` and seq `upto`, or
+    None if those events are no longer retained. Inventory is collapsed to
+    the latest units per hub and resource; "hubs" holds hubs added or
+    replaced, to be applied before "inventory".
+    """
+    offset = events.offset(since)
+    changed = None if offset is None else events.read(offset)
+    if changed is None:
+        return None
+    hubs, inventory, allocations, updates = {}, {}, [], []
+    for seq, kind, data in changed:
+        if seq > upto:
+            break
+        if kind == "inventory":
+            inventory.setdefault(data["hub"], {})[data["resource"]] = data["units"]
+        elif kind == "hub":
+            hubs[data["name"]] = data
+            inventory.pop(data["name"], None)
+        elif kind == "allocation":
+            allocations.append(data)
+        elif kind == "allocation_update":
+            updates.append(data)
+    return {"since": since, "version": events.event_id(upto), "hubs": list(hubs.values()),
+            "inventory": inventory, "allocations": allocations, "allocation_updates": updates}
+
 @app.route('/hubs.json')
 def hubs_json():
-    return jsonify(load_data())
-
-def calculate_distance(loc1, loc2):
-    R = 6371.0
-    lat1, lon1 = radians(loc1[0]), radians(loc1[1])
-    lat2, lon2 = radians(loc2[0]), radians(loc2[1])
-    
-    dlat, dlon = lat2 - lat1, lon2 - lon1
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    
-    return R * c
+    """
+    Hubs and relief camps. The ETag is the id of the last event the state
+    reflects, so If-None-Match gets a 304 until something changes, and the
+    serialized body is reused until then. ?since=<id> answers with only
+    the changes after that id (see hubs_changes), or the full state if
+    they are no longer retained.
+    """
+    global hubs_cache
+    since = request.args.get("since")
+    with store.lock:
+        # Every change to hubs is published under a lock held here, so the
+        # state reflects exactly the events up to this id.
+        upto = events.seq
+        version = events.event_id(upto)
+        if version in request.if_none_match or since == version:
+            return not_modified(version)
+        changes = None if since is None else hubs_changes(since, upto)
+        if changes is not None:
+            body = dumps(changes)
+        else:
+            if hubs_cache is None or hubs_cache[0] != version:
+                with span("serialize.hubs"):
+                    hubs_cache = (version, serialize.dumps(store.data, sort_keys=True))
+            body = hubs_cache[1]
+    response = app.response_class(body, mimetype="application/json")
+    response.headers["X-Event-Id"] = version
+    if changes is None:
+        response.set_etag(version)
+    return response
 
-@app.route('/allocate', methods=['POST'])
-def allocate_to_relief_camp():
-    try:
-        data = load_data()
-        HUBS, RELIEF_CAMPS = data["hubs"], data["relief_camps"]
+@app.route('/events')
+def event_stream():
+    """
+    Server-sent events with incremental changes: "inventory" (a hub's new
+    stock of one resource), "hub", "allocation", "allocation_update" and
+    "session" (allocations appended to /session_allocations at "start").
+    Resumes after the Last-Event-ID header or ?since=<id>; a "reset" event
+    means the requested point is no longer retained and state should be
+    re-fetched.
+    """
+    since = request.headers.get("Last-Event-ID") or request.args.get("since")
+    return Response(stream_with_context(events.stream(since)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def serve_nearest(relief_camp_name, location, resource, units_needed):
+    """
+    Ship `units_needed` of `resource` to a camp from the nearest stocked
+    hubs (the resource locked). Returns the allocation records, ending with
+    a "Not fully allocated" one if the hubs ran out.
+    """
+    allocations = []
+    total_allocated = 0
+    for distance, hub_name in stock.nearest(resource, location):
+        if total_allocated >= units_needed:
+            break
+
+        hub = store.hub(hub_name)
+        available_units = hub["resources"].get(resource, 0)
+        alloc_units = min(units_needed - total_allocated, available_units)
+        total_allocated += alloc_units
+        store.adjust_inventory(hub, resource, -alloc_units)
+
+        allocations.append({
+            "resource": resource,
+            "allocated_to": relief_camp_name,
+            "hub": hub["name"],
+            "allocated_units": alloc_units,
+            "distance_km": round(distance, 2)
+        })
+
+    if total_allocated < units_needed:
+        UNITS_UNFILLED.inc(units_needed - total_allocated, resource=resource)
+        allocations.append({
+            "resource": resource,
+            "allocated_to": relief_camp_name,
+            "hub": "N/A",
+            "allocated_units": "Not fully allocated"
+        })
+    return allocations
 
-        req_data = request.json
+def allocate_camp(req_data, defer_shortfall=False):
+    """
+    /allocate: serve one camp's requests from the nearest stocked hubs.
+    Returns (body, status). With `defer_shortfall`, a call that leaves any
+    request short records nothing, so the caller can top it up elsewhere
+    and record the outcome with record_allocations (see shards.py).
+    """
+    try:
         relief_camp_name = req_data.get("relief_camp")
         location = req_data.get("location")
         requests = req_data.get("requests", [])
 
         if not relief_camp_name or not location or not requests:
-            return jsonify({"error": "Invalid request data"}), 400
+            return {"error": "Invalid request data"}, 400
 
         allocations = []
+        resources = {req.get("resource") for req in requests if req.get("resource")}
 
-        for req in requests:
-            resource = req.get("resource")
-            units_needed = req.get("units")
+        with store.locked(resources), span("allocate.camp"):
+            for req in requests:
+                resource = req.get("resource")
+                units_needed = req.get("units")
 
-            if not resource or not isinstance(units_needed, int) or units_needed <= 0:
+                if not resource or not isinstance(units_needed, int) or units_needed <= 0:
+                    continue
+
+                # Walk the hubs holding this resource, nearest first
+                allocations.extend(serve_nearest(relief_camp_name, location, resource, units_needed))
+
+            if defer_shortfall and any(alloc["hub"] == "N/A" for alloc in allocations):
+                return allocations, 200
+            for alloc in allocations:
+                store.add_allocation(relief_camp_name, alloc)
+
+        return allocations, 200
+
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+def allocate_camp_many(calls):
+    """
+    allocate_camp for many /allocate payloads at once, in one pass per
+    resource: every request for a resource is served back to back, in
+    arrival order, under that resource's lock. Resources do not draw on
+    each other's stock, so each call gets what it would have got on its
+    own. An invalid or failing call is answered on its own without
+    holding up the others. Returns one (body, status) per call.
+    """
+    results = [None] * len(calls)
+    by_resource, camps = {}, {}
+    for k, req_data in enumerate(calls):
+        try:
+            relief_camp_name = req_data.get("relief_camp")
+            location = req_data.get("location")
+            requests = req_data.get("requests", [])
+            if not relief_camp_name or not location or not requests:
+                results[k] = {"error": "Invalid request data"}, 400
                 continue
+            camps[k] = relief_camp_name, len(requests)
+            for j, req in enumerate(requests):
+                resource, units_needed = req.get("resource"), req.get("units")
+                if resource and isinstance(units_needed, int) and units_needed > 0:
+                    by_resource.setdefault(resource, []).append((k, j, relief_camp_name, location, units_needed))
+        except Exception as e:
+            results[k] = {"error": str(e)}, 500
+
+    shipped = {}
+    for resource in sorted(by_resource, key=str):
+        with store.locked([resource]), span("allocate.camp"):
+            for k, j, relief_camp_name, location, units_needed in by_resource[resource]:
+                if results[k] is not None:
+                    continue
+                try:
+                    shipped[k, j] = serve_nearest(relief_camp_name, location, resource, units_needed)
+                except Exception as e:
+                    results[k] = {"error": str(e)}, 500
+
+    for k, (relief_camp_name, count) in camps.items():
+        if results[k] is not None:
+            continue
+        allocations = [alloc for j in range(count) for alloc in shipped.get((k, j), ())]
+        for alloc in allocations:
+            store.add_allocation(relief_camp_name, alloc)
+        results[k] = allocations, 200
+    return results
+
+def ship_to_shard(req_data, shard):
+    """
+    Sharded spillover (see shards.py): serve a camp held by shard `shard`
+    from this shard's hubs, nearest first, leaving nothing recorded if any
+    request stays short, as with allocate_camp's `defer_shortfall`. What
+    ships is recorded here as "shipped_out" entries, in one transaction
+    with the stock it draws, so this shard's books reconcile on their own;
+    the camp's shard records the allocations. Returns (body, status).
+    """
+    resources = {req.get("resource") for req in req_data.get("requests", []) if req.get("resource")}
+    with store.locked(resources), store.transaction():
+        body, status = allocate_camp(req_data, defer_shortfall=True)
+        if status == 200:
+            for alloc in body:
+                if alloc["hub"] != "N/A" and alloc["allocated_units"]:
+                    store.add_shipment(dict(alloc, shard=shard))
+    return body, status
+
+@app.route('/allocate', methods=['POST'])
+def allocate_to_relief_camp():
+    body, status = allocate_camp(json_body())
+    return jsonify(body), status
 
-            available_hubs = [hub for hub in HUBS if hub["resources"].get(resource, 0) > 0]
-            available_hubs.sort(key=lambda hub: calculate_distance(location, hub["location"]))
+def process_pending_allocations(resources=None):
+    """
+    Attempts to fill pending allocation requests for the given resources
+    (all of them by default) from any hub now holding stock, most urgent
+    request first. Only requests waiting on those resources are touched.
+    """
+    released = []
+    with store.locked(resources), span("pending.process"):
+        hubs = store.hubs
 
-            total_allocated = 0
-            for hub in available_hubs:
-                if total_allocated >= units_needed:
+        for resource in (pending.resources() if resources is None else resources):
+            while stock.count(resource) > 0:
+                entry = pending.peek(resource)
+                if entry is None:
                     break
+                camp_name, index = entry
+                alloc = store.camp(camp_name)["allocations"][index]
+                if alloc.get("status") != "Pending" or alloc.get("units_remaining", 0) <= 0:
+                    pending.pop(resource)
+                    continue
+                units_remaining = alloc["units_remaining"]
+
+                # Try to allocate remaining units from any hub with available resources.
+                for position in stock.cycle(resource):
+                    if units_remaining <= 0:
+                        break
+                    hub = hubs[position]
+                    alloc_units = min(units_remaining, hub["resources"][resource])
+                    store.adjust_inventory(hub, resource, -alloc_units)
+                    units_remaining -= alloc_units
+
+                    new_alloc = {
+                        "resource": resource,
+                        "allocated_to": camp_name,
+                        "hub": hub["name"],
+                        "allocated_units": alloc_units,
+                        "status": "Allocated"
+                    }
+                    store.add_allocation(camp_name, new_alloc)
+                    released.append(new_alloc)
+                # Update the pending allocation record.
+                if units_remaining <= 0:
+                    store.update_allocation(camp_name, index, units_remaining=units_remaining,
+                                            status="Allocated", hub="Multiple",
+                                            allocated_units="Allocated across hubs")
+                    pending.pop(resource)
+                else:
+                    store.update_allocation(camp_name, index, units_remaining=units_remaining)
+    record_session(released)
+    log_sampled(log, log_sample, logging.DEBUG, "released from pending: %s", released)
+    return released
+
+def sort_by_priority(requests):
+    """Most critical camp first (see CampPriorities); camps not in hubs.json go last."""
+    now = time.time()
+    scores = {name: priorities.score(name, now) for name in {req.get("relief_camp") for req in requests}}
+    requests.sort(
+        key=lambda req: (
+            scores[req.get("relief_camp")] is None,
+            -(scores[req.get("relief_camp")] or 0),
+            PRIORITY_ORDER.get(req.get("priority", "men"), 4),
+            -req.get("time_since_last_request", 0)
+        )
+    )
+    return requests
+
+def shipment_record(req, hub, units):
+    alloc = {
+        "resource": req.get("resource"),
+        "allocated_to": req.get("relief_camp"),
+        "hub": hub["name"],
+        "allocated_units": units,
+        "status": "Allocated"
+    }
+    if req.get("relief_camp") in distances:
+        alloc["distance_km"] = round(distances.get(req.get("relief_camp"), hub["name"]), 2)
+    return alloc
+
+def pending_record(req, units_needed):
+    """The "Pending" record for what no hub could supply, queued until stock arrives."""
+    return {
+        "resource": req.get("resource"),
+        "allocated_to": req.get("relief_camp"),
+        "hub": "N/A",
+        "allocated_units": 0,
+        "units_remaining": units_needed,
+        "status": "Pending",
+        "priority": req.get("priority", "men")
+    }
+
+def record_allocations(allocations, session=True):
+    """
+    Add allocations made elsewhere to their camps' histories, queueing the
+    pending ones, and to this session's list unless `session` is False.
+    """
+    resources = {alloc["resource"] for alloc in allocations}
+    with store.locked(resources):
+        for alloc in allocations:
+            index = store.add_allocation(alloc["allocated_to"], alloc)
+            if index is not None and alloc.get("status") == "Pending":
+                pending.push(alloc["allocated_to"], index, alloc)
+    if session:
+        record_session(allocations)
+    return allocations
+
+def round_robin(requests, errors=None):
+    """
+    The allocate_round_robin pass over `requests`, already in priority
+    order (their resources locked): one list of allocation records per
+    request, ending with a "Pending" record for what no hub could supply.
+    Given an `errors` dict, a request that raises gets an empty list and
+    its exception under its position, and the pass goes on.
+    """
+    HUBS = store.hubs
+    hub_index = 0
+
+    def serve(req):
+        nonlocal hub_index
+        allocations = []
+        resource = req.get("resource")
+        units_needed = req.get("units")
+
+        if not resource or not isinstance(units_needed, int) or units_needed <= 0:
+            return allocations
+
+        # Round-robin over the hubs holding this resource only
+        start = hub_index
+        for position in stock.cycle(resource, hub_index):
+            hub = HUBS[position]
+            hub_index = (position + 1) % len(HUBS)
+
+            available_units = hub["resources"].get(resource, 0)
+            alloc_units = min(units_needed, available_units)
+            units_needed -= alloc_units
+            store.adjust_inventory(hub, resource, -alloc_units)
+            allocations.append(shipment_record(req, hub, alloc_units))
+
+            if units_needed <= 0:
+                break
+        else:
+            # A full lap leaves the pointer where it started
+            hub_index = start
 
-                available_units = hub["resources"].get(resource, 0)
-                alloc_units = min(units_needed - total_allocated, available_units)
-                total_allocated += alloc_units
-                hub["resources"][resource] -= alloc_units
-
-                allocations.append({
-                    "resource": resource,
-                    "allocated_to": relief_camp_name,
-                    "hub": hub["name"],
-                    "allocated_units": alloc_units
-                })
-
-            if total_allocated < units_needed:
-                allocations.append({
-                    "resource": resource,
-                    "allocated_to": relief_camp_name,
-                    "hub": "N/A",
-                    "allocated_units": "Not fully allocated"
-                })
-
-        for camp in RELIEF_CAMPS:
-            if camp["name"] == relief_camp_name:
-                if "allocations" not in camp:
-                    camp["allocations"] = []
-                camp["allocations"].extend(allocations)
-
-        save_data({"hubs": HUBS, "relief_camps": RELIEF_CAMPS})
-        pr
-
-        return jsonify(allocations)
+        if units_needed > 0:
+            UNITS_UNFILLED.inc(units_needed, resource=resource)
+            allocations.append(pending_record(req, units_needed))
+        return allocations
+
+    served = []
+    for i, req in enumerate(requests):
+        try:
+            served.append(serve(req))
+        except Exception as e:
+            if errors is None:
+                raise
+            errors[i] = e
+            served.append([])
+    return served
+
+def allocate_round_robin(req_data, defer_shortfall=False):
+    """
+    /allocate_hub: serve requests by priority, round-robin over hubs.
+    Returns (body, status). `defer_shortfall` works as for allocate_camp:
+    if any request would be left pending, nothing is recorded or queued.
+    """
+    try:
+        relief_camp_requests = req_data.get("requests", [])
+
+        if not relief_camp_requests:
+            return {"error": "Invalid request data"}, 400
+
+
+        sort_by_priority(relief_camp_requests)
+
+        resources = {req.get("resource") for req in relief_camp_requests if req.get("resource")}
+
+        with store.locked(resources), span("allocate.round_robin"):
+            allocations = [alloc for served in round_robin(relief_camp_requests) for alloc in served]
+
+            if defer_shortfall and any(alloc["status"] == "Pending" for alloc in allocations):
+                return allocations, 200
+            record_allocations(allocations, session=False)
+        record_session(allocations)
+        log_sampled(log, log_sample, logging.DEBUG, "allocations: %s", allocations)
+        return allocations, 200
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-def process_pending_allocations():
+        return {"error": str(e)}, 500
+
+def allocate_round_robin_many(calls):
     """
-    This function scans through each relief camp's allocations and
-    attempts to process any pending allocation requests using any newly
-    available resources from the hubs.
+    allocate_round_robin for many /allocate_hub payloads at once: their
+    requests are put in priority order together and served in a single
+    round-robin pass, so the most critical camps go first whichever call
+    they came in. An invalid call is answered 400 on its own. Returns one
+    (body, status) per call.
     """
-    data = load_data()
-    hubs = data["hubs"]
-    relief_camps = data["relief_camps"]
+    results = [None] * len(calls)
+    merged, owner = [], {}
+    for k, req_data in enumerate(calls):
+        requests = req_data.get("requests") if isinstance(req_data, dict) else None
+        if not requests or not isinstance(requests, list) or not all(isinstance(req, dict) for req in requests):
+            results[k] = {"error": "Invalid request data"}, 400
+            continue
+        merged.extend(requests)
+        owner.update((id(req), k) for req in requests)
+    if not merged:
+        return results
 
-    for camp in relief_camps:
-        if "allocations" in camp:
-            # Iterate over a copy of the allocations list to avoid modification issues.
-            for alloc in list(camp["allocations"]):
-                if alloc.get("status") == "Pending" and alloc.get("units_remaining", 0) > 0:
-                    resource = alloc["resource"]
-                    units_remaining = alloc["units_remaining"]
-
-                    # Try to allocate remaining units from any hub with available resources.
-                    for hub in hubs:
-                        if units_remaining <= 0:
-                            break
-                        available_units = hub["resources"].get(resource, 0)
-                        if available_units > 0:
-                            alloc_units = min(units_remaining, available_units)
-                            hub["resources"][resource] -= alloc_units
-                            units_remaining -= alloc_units
-
-                            new_alloc = {
-                                "resource": resource,
-                                "allocated_to": camp["name"],
-                                "hub": hub["name"],
-                                "allocated_units": alloc_units,
-                                "status": "Allocated"
-                            }
-                            camp["allocations"].append(new_alloc)
-                            allocations_data.append(new_alloc)
-                    # Update the pending allocation record.
-                    alloc["units_remaining"] = units_remaining
-                    if units_remaining <= 0:
-                        alloc["status"] = "Allocated"
-                        alloc["hub"] = "Multiple"
-                        alloc["allocated_units"] = "Allocated across hubs"
-    print(relief_camps)
-    save_data({"hubs": hubs, "relief_camps": relief_camps})
+    sort_by_priority(merged)
+    resources = {req.get("resource") for req in merged if req.get("resource")}
+    allocations, errors = {k: [] for k in set(owner.values())}, {}
+    with store.locked(resources), span("allocate.round_robin"):
+        for req, served in zip(merged, round_robin(merged, errors)):
+            allocations[owner[id(req)]].extend(served)
+        # As on its own, a call that failed part way records nothing
+        for i, e in errors.items():
+            k = owner[id(merged[i])]
+            results[k] = {"error": str(e)}, 500
+            allocations.pop(k, None)
+        record_allocations([alloc for served in allocations.values() for alloc in served], session=False)
+    for k, served in sorted(allocations.items()):
+        record_session(served)
+        results[k] = served, 200
+    return results
 
 @app.route('/allocate_hub', methods=['POST'])
 def allocate_to_hub():
-    try:
-        data = load_data()
-        HUBS, RELIEF_CAMPS = data["hubs"], data["relief_camps"]
+    """?async=1 plans in the process pool and answers 202 with the job to poll at /jobs/<id>."""
+    req_data = json_body()
+    if request.args.get("async") == "1" and isinstance(req_data, dict) and req_data.get("requests"):
+        return jsonify(offload_round_robin(req_data["requests"])), 202
+    body, status = allocate_round_robin(req_data)
+    return jsonify(body), status
 
-        req_data = request.json
+@app.route('/allocate_batch', methods=['POST'])
+def allocate_batch():
+    """
+    Allocate all outstanding camp requests in one optimization instead of
+    the greedy round-robin in /allocate_hub.
+    Expected JSON payload:
+    {
+        "requests": [
+            {"relief_camp": "Camp X", "resource": "water", "units": 100, "priority": "children"},
+            ...
+        ],
+        "dry_run": false  # optional, plan without touching inventory
+    }
+    Every request names its relief_camp; camps not listed in hubs.json
+    also need a "location". The response carries the allocations plus
+    solve time and total unit-km next to what the greedy allocation would
+    have produced.
+    """
+    try:
+        req_data = json_body()
         relief_camp_requests = req_data.get("requests", [])
+        dry_run = bool(req_data.get("dry_run", False))
 
         if not relief_camp_requests:
             return jsonify({"error": "Invalid request data"}), 400
-        
-
-        priority_order = {"children": 1, "elderly": 2, "women": 3, "men": 4}
-        relief_camp_requests.sort(
-            key=lambda req: (
-                priority_order.get(req.get("priority", "men"), 4),
-                -req.get("time_since_last_request", 0)
-            )
-        )
+        if not all(isinstance(req, dict) and req.get("relief_camp") for req in relief_camp_requests):
+            return jsonify({"error": "Every request needs a relief_camp"}), 400
+
+        valid = batch_requests(relief_camp_requests)
+        if request.args.get("async") == "1":
+            return jsonify(offload_batch(valid, dry_run)), 202
+
+        with store.locked({req["resource"] for req in valid}):
+            with span("allocate.batch"):
+                shipments, unmet, stats = plan_batch(valid, store.hubs, distances, stock.cycle)
+            allocations = apply_batch(valid, shipments, unmet, dry_run)
+        if not dry_run:
+            record_session(allocations)
 
+        return jsonify({"allocations": allocations, "stats": stats})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def batch_requests(relief_camp_requests):
+    """The requests /allocate_batch can plan: a camp name, a resource, whole units and a known camp or a location."""
+    return [
+        req for req in relief_camp_requests
+        if req.get("relief_camp") and req.get("resource") and isinstance(req.get("units"), int) and req["units"] > 0
+        and (req["relief_camp"] in distances or req.get("location"))
+    ]
+
+def apply_batch(valid, shipments, unmet, dry_run=False):
+    """Turn a batch plan into allocation records, shipping and recording them unless `dry_run` (store locked)."""
+    HUBS = store.hubs
+    allocations = []
+    for k, position, units, distance in shipments:
+        req = valid[k]
+        if not dry_run:
+            store.adjust_inventory(HUBS[position], req["resource"], -units)
+        allocations.append({
+            "resource": req["resource"],
+            "allocated_to": req["relief_camp"],
+            "hub": HUBS[position]["name"],
+            "allocated_units": units,
+            "status": "Allocated",
+            "distance_km": round(distance, 2)
+        })
+    for k, units in unmet.items():
+        req = valid[k]
+        if not dry_run:
+            UNITS_UNFILLED.inc(units, resource=req["resource"])
+        allocations.append(pending_record(req, units))
+    if not dry_run:
+        record_allocations(allocations, session=False)
+    return allocations
+
+def check_stock(draws):
+    """Raise Conflict unless every hub still holds the units drawn: {(hub position, resource): units}."""
+    HUBS = store.hubs
+    for (position, resource), units in draws.items():
+        if position >= len(HUBS) or HUBS[position]["resources"].get(resource, 0) < units:
+            raise Conflict(f"{HUBS[position]['name'] if position < len(HUBS) else position} is short of {resource}")
+
+def offload_batch(valid, dry_run=False):
+    """/allocate_batch?async=1: solve in the process pool and apply the plan when it returns."""
+    resources = {req["resource"] for req in valid}
+
+    def prepare():
+        with store.locked(resources):
+            shared, columns = shared_inventory(inventory)
+            rows = SharedArray(distance_rows(valid, store.hubs, range(len(store.hubs)), distances))
+        return (shared.spec, rows.spec, valid, columns), [shared, rows], None
+
+    def apply(plan, context):
+        shipments, unmet, stats = plan
+        with store.locked(resources):
+            if not dry_run:
+                draws = {}
+                for k, position, units, distance in shipments:
+                    key = (position, valid[k]["resource"])
+                    draws[key] = draws.get(key, 0) + units
+                check_stock(draws)
+            allocations = apply_batch(valid, shipments, unmet, dry_run)
+        if not dry_run:
+            record_session(allocations)
+        return {"allocations": allocations, "stats": stats}
+
+    def inline():
+        with store.locked(resources):
+            shipments, unmet, stats = plan_batch(valid, store.hubs, distances, stock.cycle)
+            allocations = apply_batch(valid, shipments, unmet, dry_run)
+        if not dry_run:
+            record_session(allocations)
+        return {"allocations": allocations, "stats": stats}
+
+    return jobs.submit("allocate_batch", prepare, offload.plan_batch, apply, inline)
+
+def offload_round_robin(relief_camp_requests):
+    """/allocate_hub?async=1: plan the round-robin in the process pool and apply it when it returns."""
+    ordered = [req for req in sort_by_priority(list(relief_camp_requests))
+               if req.get("resource") and isinstance(req.get("units"), int) and req["units"] > 0]
+    resources = {req["resource"] for req in ordered}
+
+    def prepare():
+        with store.locked(resources):
+            shared, columns = shared_inventory(inventory)
+        return (shared.spec, [(columns.get(req["resource"], -1), req["units"]) for req in ordered]), [shared], None
+
+    def apply(plan, context):
+        shipments, unmet = plan
+        by_request = {}
+        draws = {}
+        for k, position, units in shipments:
+            by_request.setdefault(k, []).append((position, units))
+            key = (position, ordered[k]["resource"])
+            draws[key] = draws.get(key, 0) + units
+        unmet = dict(unmet)
         allocations = []
-        hub_index = 0
+        with store.locked(resources):
+            check_stock(draws)
+            HUBS = store.hubs
+            for k, req in enumerate(ordered):
+                for position, units in by_request.get(k, ()):
+                    store.adjust_inventory(HUBS[position], req["resource"], -units)
+                    allocations.append(shipment_record(req, HUBS[position], units))
+                if k in unmet:
+                    UNITS_UNFILLED.inc(unmet[k], resource=req["resource"])
+                    allocations.append(pending_record(req, unmet[k]))
+            record_allocations(allocations, session=False)
+        record_session(allocations)
+        return allocations
 
-        for req in relief_camp_requests:
-            resource = req.get("resource")
-            units_needed = req.get("units")
-            relief_camp_name = req.get("relief_camp")
+    def inline():
+        body, status = allocate_round_robin({"requests": list(relief_camp_requests)})
+        if status != 200:
+            raise RuntimeError(body.get("error"))
+        return body
 
-            if not resource or not isinstance(units_needed, int) or units_needed <= 0:
-                continue
+    return jobs.submit("allocate_hub", prepare, offload.plan_round_robin, apply, inline)
+
+def settle_pending(resource):
+    """Drop queue entries at the head that are no longer pending."""
+    while True:
+        entry = pending.peek(resource)
+        if entry is None:
+            return
+        alloc = store.camp(entry[0])["allocations"][entry[1]]
+        if alloc.get("status") == "Pending" and alloc.get("units_remaining", 0) > 0:
+            return
+        pending.pop(resource)
 
-            for _ in range(len(HUBS)):
-                hub = HUBS[hub_index]
-                hub_index = (hub_index + 1) % len(HUBS)
+def offload_pending(resources=None):
+    """process_pending_allocations as a job: the sweep is planned in the pool, then applied."""
+    def prepare():
+        with store.locked(resources):
+            shared, columns = shared_inventory(inventory)
+            queues, entries = {}, {}
+            for resource in (pending.resources() if resources is None else resources):
+                if resource not in columns:
+                    continue
+                live = []
+                for camp_name, index in pending.ordered(resource):
+                    alloc = store.camp(camp_name)["allocations"][index]
+                    if alloc.get("status") == "Pending" and alloc.get("units_remaining", 0) > 0:
+                        live.append((camp_name, index, alloc["units_remaining"]))
+                queues[columns[resource]] = [units for _, _, units in live]
+                entries[columns[resource]] = (resource, live)
+        return (shared.spec, queues), [shared], entries
 
-                available_units = hub["resources"].get(resource, 0)
-                if available_units > 0:
-                    alloc_units = min(units_needed, available_units)
-                    units_needed -= alloc_units
-                    hub["resources"][resource] -= alloc_units
+    def apply(fills, entries):
+        released = []
+        with store.locked(resources):
+            HUBS = store.hubs
+            draws = {}
+            for column, triples in fills.items():
+                resource, live = entries[column]
+                for k, position, units in triples:
+                    draws[(position, resource)] = draws.get((position, resource), 0) + units
+            check_stock(draws)
+            for column, (resource, live) in entries.items():
+                for camp_name, index, units_remaining in live:
+                    alloc = store.camp(camp_name)["allocations"][index]
+                    if alloc.get("status") != "Pending" or alloc.get("units_remaining") != units_remaining:
+                        raise Conflict(f"pending request {camp_name}#{index} changed")
 
-                    allocations.append({
+            for column, triples in fills.items():
+                resource, live = entries[column]
+                remaining = {}
+                for k, position, units in triples:
+                    camp_name, index, units_remaining = live[k]
+                    hub = HUBS[position]
+                    store.adjust_inventory(hub, resource, -units)
+                    new_alloc = {
                         "resource": resource,
-                        "allocated_to": relief_camp_name,
+                        "allocated_to": camp_name,
                         "hub": hub["name"],
-                        "allocated_units": alloc_units,
+                        "allocated_units": units,
                         "status": "Allocated"
-                    })
+                    }
+                    store.add_allocation(camp_name, new_alloc)
+                    released.append(new_alloc)
+                    remaining[k] = remaining.get(k, units_remaining) - units
+                for k, units_remaining in remaining.items():
+                    camp_name, index, _ = live[k]
+                    if units_remaining <= 0:
+                        store.update_allocation(camp_name, index, units_remaining=units_remaining,
+                                                status="Allocated", hub="Multiple",
+                                                allocated_units="Allocated across hubs")
+                    else:
+                        store.update_allocation(camp_name, index, units_remaining=units_remaining)
+                settle_pending(resource)
+        record_session(released)
+        return released
 
-                if units_needed <= 0:
-                    break
+    def inline():
+        return process_pending_allocations(resources)
 
-            if units_needed > 0:
-                allocations.append({
-                    "resource": resource,
-                    "allocated_to": relief_camp_name,
-                    "hub": "N/A",
-                    "allocated_units": "Not fully allocated",
-                    "allocated_units": 0,
-                    "units_remaining": units_needed,
-                    "status": "Pending"
-                })
-        allocations_data.extend(allocations)    
-
-        for camp in RELIEF_CAMPS:
-            for alloc in allocations:
-                if camp["name"] == alloc["allocated_to"]:
-                    if "allocations" not in camp:
-                        camp["allocations"] = []
-                    camp["allocations"].append(alloc)
+    return jobs.submit("pending_sweep", prepare, offload.plan_pending, apply, inline)
+
+@app.route('/pending/sweep', methods=['POST'])
+def sweep_pending():
+    """
+    Fill pending requests from current stock in the background. Optional
+    JSON {"resources": [...]}; answers 202 with the job to poll at /jobs/<id>.
+    """
+    req_data = json_body() or {}
+    resources = req_data.get("resources") if isinstance(req_data, dict) else None
+    if resources is not None and (not isinstance(resources, list)
+                                  or not all(isinstance(resource, str) for resource in resources)):
+        return jsonify({"error": "resources must be a list of resource names"}), 400
+    return jsonify(offload_pending(resources)), 202
 
-        save_data({"hubs": HUBS, "relief_camps": RELIEF_CAMPS})
-        print(allocations)
-        return jsonify(allocations)
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """An offloaded job: status "running", "done" (with "result") or "failed" (with "error")."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
 
+def plan_hub_routes(req_data):
+    """
+    /plan_routes: vehicle runs delivering what one hub has allocated. Returns (body, status).
+    Expected JSON payload:
+    {
+        "hub": "Hub A",
+        "capacity": 500,        # units per vehicle
+        "time_budget": 1.0,     # optional, seconds spent improving the routes
+        "speed_kmh": 40,        # optional, for travel_time_h
+        "allocations": [...]    # optional, this session's allocations from the hub by default
+    }
+    Units are summed per camp across resources. Allocations to camps not in
+    hubs.json need a "location", otherwise they are listed under "skipped".
+    """
+    try:
+        hub_name = req_data.get("hub")
+        capacity = req_data.get("capacity")
+        time_budget = min(float(req_data.get("time_budget", 1.0)), 30.0)
+        speed = float(req_data.get("speed_kmh", 40))
+
+        if not hub_name or not isinstance(capacity, int) or capacity <= 0 or speed <= 0:
+            return {"error": "hub and a positive integer capacity are required"}, 400
+        hub = store.hub(hub_name)
+        if hub is None:
+            return {"error": "Hub not found"}, 404
+
+        allocations = req_data.get("allocations")
+        if allocations is None:
+            with allocations_data.lock:
+                allocations = allocations_data.items()
+        units, locations, skipped = {}, {}, []
+        for alloc in allocations:
+            amount = alloc.get("allocated_units")
+            if (alloc.get("hub") != hub_name or alloc.get("status", "Allocated") != "Allocated"
+                    or not isinstance(amount, int) or amount <= 0):
+                continue
+            camp_name = alloc.get("allocated_to")
+            camp = store.camp(camp_name)
+            location = camp["location"] if camp is not None else alloc.get("location")
+            if not location:
+                skipped.append(camp_name)
+                continue
+            units[camp_name] = units.get(camp_name, 0) + amount
+            locations[camp_name] = location
+
+        names = list(units)
+        with span("routes.plan"):
+            routes, stats = plan_routes(hub["location"], [(locations[name], units[name]) for name in names],
+                                        capacity, time_budget, route_matrices)
+        for route in routes:
+            route["stops"] = [{"camp": names[k], "units": load} for k, load in route["stops"]]
+            route["travel_time_h"] = round(route["distance_km"] / speed, 2)
+        return {"hub": hub_name, "routes": routes, "stats": stats, "skipped": sorted(set(skipped))}, 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    
-@app.route('/update_inventory', methods=['POST'])
-def update_inventory():
+        return {"error": str(e)}, 500
+
+@app.route('/plan_routes', methods=['POST'])
+def plan_delivery_routes():
+    body, status = plan_hub_routes(json_body())
+    return jsonify(body), status
+
+def block_roads(req_data):
     """
-    Update the inventory of a specific hub.
+    /roads/block: close or reopen roads of the loaded road graph. Returns (body, status).
+    Expected JSON payload:
+    {
+        "roads": [["n1", "n2"], ...],   # node id pairs from the graph file
+        "blocked": true                 # optional, false reopens them
+    }
+    Cached distances are recomputed on next use.
+    """
+    try:
+        if roads is None:
+            return {"error": "No road graph loaded (set DISASTRO_ROAD_GRAPH)"}, 404
+        pairs = req_data.get("roads")
+        blocked = bool(req_data.get("blocked", True))
+        if not pairs or not all(isinstance(pair, list) and len(pair) == 2 for pair in pairs):
+            return {"error": "roads must be a list of [from, to] node id pairs"}, 400
+
+        unknown = [pair for pair in pairs if not roads.block(pair[0], pair[1], blocked)]
+        distances.invalidate()
+        rebalancer.invalidate()
+        route_matrices.clear()
+        return {"message": "Roads updated", "unknown": unknown, "blocked": roads.blocked_roads()}, 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+@app.route('/roads/block', methods=['POST'])
+def update_roads():
+    body, status = block_roads(json_body())
+    return jsonify(body), status
+
+@app.route('/roads', methods=['GET'])
+def road_graph():
+    """The loaded road graph: size, blocked roads and cache counters."""
+    if roads is None:
+        return jsonify({"error": "No road graph loaded (set DISASTRO_ROAD_GRAPH)"}), 404
+    return jsonify(roads.summary())
+
+@app.route('/priorities', methods=['GET'])
+def camp_priorities():
+    """
+    The most critical camps, highest score first, with the terms behind
+    each score: ?limit=<k> (default 10), or ?camp=<name> for one camp.
+    """
+    now = time.time()
+    camp = request.args.get("camp")
+    if camp is not None:
+        if camp not in priorities:
+            return jsonify({"error": "Camp not found"}), 404
+        return jsonify(priorities.describe(camp, now))
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 1000)
+    return jsonify([priorities.describe(name, now) for name, _ in priorities.top(limit, now)])
+
+@app.route('/forecast', methods=['GET'])
+def demand_forecast():
+    """
+    Expected demand over ?horizon=<periods> (default 1; a period is
+    DISASTRO_FORECAST_PERIOD seconds): per resource across all camps, or
+    level, trend and forecast for ?camp=<name>.
+    """
+    horizon = min(max(request.args.get("horizon", 1, type=int), 1), 365)
+    camp = request.args.get("camp")
+    if camp is not None:
+        if camp not in forecast:
+            return jsonify({"error": "Camp not found"}), 404
+        return jsonify(forecast.describe(camp, horizon))
+    totals = forecast.forecast(horizon).sum(axis=0)
+    return jsonify({"horizon_periods": horizon, "period_seconds": forecast.period,
+                    "periods_observed": forecast.periods,
+                    "resources": {resource: round(float(totals[column]), 3)
+                                  for column, resource in enumerate(forecast.resources.names)}})
+
+def preposition_plan(horizon=1, min_units=1):
+    """
+    Hub-to-hub transfers that would cover the demand forecast over
+    `horizon` periods plus what pending requests still wait for, each
+    camp served by its nearest hub (see forecast.plan_transfers). Only a
+    recommendation: nothing is moved. Returns (body, status).
+    """
+    if not len(forecast) or not len(inventory.hubs):
+        return {"horizon_periods": horizon, "transfers": [], "resources": {}}, 200
+    with span("forecast.plan"):
+        demand = forecast.forecast(horizon)
+        hub_rows = [inventory.hubs.get(name) for name in distances.hub_names]
+        # Camps without a location have no nearest hub, their demand is left out
+        located = [i for i, name in enumerate(forecast.names) if name in distances]
+        nearest = [hub_rows[j] for j in distances.rows([forecast.names[i] for i in located]).argmin(axis=1).tolist()]
+        with store.locked():
+            for resource in pending.resources():
+                column = inventory.resources.get(resource)
+                if column < 0:
+                    continue
+                for camp_name, index in pending.ordered(resource):
+                    alloc = store.camp(camp_name)["allocations"][index]
+                    if alloc.get("status") == "Pending" and camp_name in forecast:
+                        demand[forecast.index(camp_name), column] += alloc.get("units_remaining", 0)
+            hub_names = list(inventory.hubs.names)
+            units = inventory.units.copy()
+            locations = [store.hub(name)["location"] for name in hub_names]
+        # A resource first seen between the two reads is left out
+        columns = min(demand.shape[1], units.shape[1])
+        transfers, summary = plan_transfers(demand[located, :columns], nearest, units[:, :columns], hub_names,
+                                            locations, inventory.resources.names[:columns], min_units)
+    return {"horizon_periods": horizon, "transfers": transfers, "resources": summary}, 200
+
+@app.route('/preposition', methods=['GET'])
+def preposition():
+    """Recommended transfers: ?horizon=<periods> (default 1), ?min_units=<n> to drop small ones."""
+    horizon = min(max(request.args.get("horizon", 1, type=int), 1), 365)
+    body, status = preposition_plan(horizon, max(request.args.get("min_units", 1, type=int), 1))
+    return jsonify(body), status
+
+def fastest_hubs(resource, location):
+    """
+    Hubs holding `resource` as (hours, distance, name), the one whose
+    delivery reaches `location` first leading: its dispatch hours plus the
+    drive. stock.nearest is walked only until no farther hub could arrive
+    sooner.
+    """
+    ready = []
+    for distance, hub_name in stock.nearest(resource, location):
+        heapq.heappush(ready, (rebalancer.hours(hub_name, distance), distance, hub_name))
+        while ready[0][0] <= distance / rebalancer.speed_kmh:
+            yield heapq.heappop(ready)
+            if not ready:
+                break
+    while ready:
+        yield heapq.heappop(ready)
+
+def rebalance_pending(resources=None):
+    """
+    Serve the pending requests waiting on stock that just arrived, most
+    urgent first, each from the hubs whose deliveries reach the camp
+    soonest. Stock is first moved between hubs where a transfer plus the
+    delivery arrives before shipping directly (see rebalance.py). Only
+    resources whose stock rose while requests waited are handled, and of
+    those only `resources` when given. Returns (transfers, released).
+    """
+    transfers, released = [], []
+    dirty = rebalancer.take(resources)
+    if not dirty:
+        return transfers, released
+    with store.locked(dirty), span("rebalance.run"):
+        for resource in sorted(dirty):
+            settle_pending(resource)
+            if stock.count(resource) == 0:
+                continue
+            # Only the most urgent requests the stock on hand can cover
+            waiting, covered, on_hand = [], 0, inventory.column(resource).sum()
+            for camp_name, index in pending.iter_ordered(resource):
+                if covered >= on_hand:
+                    break
+                # A camp without a location has no fastest hub to be served from
+                if camp_name not in distances:
+                    continue
+                alloc = store.camp(camp_name)["allocations"][index]
+                if alloc.get("status") == "Pending" and alloc.get("units_remaining", 0) > 0:
+                    waiting.append((camp_name, index, alloc["units_remaining"]))
+                    covered += alloc["units_remaining"]
+            if not waiting:
+                continue
+
+            moves = rebalancer.plan(list(inventory.hubs.names), inventory.column(resource),
+                                    [(camp_name, rebalancer.fastest(camp_name, distances), units)
+                                     for camp_name, _, units in waiting],
+                                    distances.get)
+            for source, sink, units, km in moves:
+                store.adjust_inventory(store.hub(source), resource, -units)
+                store.adjust_inventory(store.hub(sink), resource, units)
+                transfer = {"resource": resource, "from": source, "to": sink, "units": units,
+                            "distance_km": round(km, 2)}
+                transfers.append(transfer)
+                events.publish("transfer", transfer)
+
+            for camp_name, index, units_remaining in waiting:
+                if stock.count(resource) == 0:
+                    break
+                for _, distance, hub_name in fastest_hubs(resource, store.camp(camp_name)["location"]):
+                    if units_remaining <= 0:
+                        break
+                    hub = store.hub(hub_name)
+                    alloc_units = min(units_remaining, hub["resources"].get(resource, 0))
+                    if alloc_units <= 0:
+                        continue
+                    store.adjust_inventory(hub, resource, -alloc_units)
+                    new_alloc = shipment_record({"resource": resource, "relief_camp": camp_name}, hub, alloc_units)
+                    store.add_allocation(camp_name, new_alloc)
+                    released.append(new_alloc)
+                    units_remaining -= alloc_units
+                if units_remaining <= 0:
+                    store.update_allocation(camp_name, index, units_remaining=units_remaining,
+                                            status="Allocated", hub="Multiple",
+                                            allocated_units="Allocated across hubs")
+                else:
+                    store.update_allocation(camp_name, index, units_remaining=units_remaining)
+            settle_pending(resource)
+        # The transfers marked these resources again
+        rebalancer.take(dirty)
+    rebalancer.logged(len(dirty), transfers, released)
+    record_session(released)
+    log_sampled(log, log_sample, logging.DEBUG, "rebalanced: %s, released: %s", transfers, released)
+    return transfers, released
+
+@app.route('/rebalance', methods=['GET'])
+def rebalance_status():
+    """Rebalancing counters, resources waiting for a run and the last ?limit=<k> transfers (default 50)."""
+    limit = min(max(request.args.get("limit", 50, type=int), 0), 1000)
+    return jsonify(dict(rebalancer.summary(limit), enabled=REBALANCE))
+
+@app.route('/rebalance', methods=['POST'])
+def rebalance_now():
+    """Rebalance every resource with pending requests now, whether or not its stock changed."""
+    for resource in pending.resources():
+        rebalancer.touch(resource)
+    transfers, released = rebalance_pending()
+    return jsonify({"transfers": transfers, "released": released}), 200
+
+def inventory_update_error(hub_name, resources_update, update_type):
+    """What is wrong with one hub's inventory update, or None (whether the hub exists is not checked)."""
+    if not hub_name or not resources_update or not isinstance(resources_update, dict):
+        return "hub_name and resources are required"
+    if update_type not in ("set", "add"):
+        return "update_type must be either 'set' or 'add'"
+    for resource, value in resources_update.items():
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return f"Value for resource '{resource}' must be numeric"
+    return None
+
+def update_hub_inventory(req_data):
+    """
+    Update the inventory of a specific hub. Returns (body, status).
     Expected JSON payload:
     {
         "hub_name": "Hub A",
@@ -256,41 +1239,219 @@ def update_inventory():
     }
     """
     try:
-        data = load_data()
-        hubs = data["hubs"]
-
-        req_data = request.json
         hub_name = req_data.get("hub_name")
         resources_update = req_data.get("resources")
         update_type = req_data.get("update_type", "set")  # default is "set"
 
-        if not hub_name or not resources_update:
-            return jsonify({"error": "hub_name and resources are required"}), 400
-
-        if update_type not in ("set", "add"):
-            return jsonify({"error": "update_type must be either 'set' or 'add'"}), 400
-
-        # Find the hub by name
-        hub = next((h for h in hubs if h.get("name") == hub_name), None)
-        if not hub:
-            return jsonify({"error": "Hub not found"}), 404
-
-        # Update the inventory for each resource
-        for resource, value in resources_update.items():
-            if not isinstance(value, (int, float)):
-                return jsonify({"error": f"Value for resource '{resource}' must be numeric"}), 400
-            if update_type == "set":
-                hub["resources"][resource] = value
-            elif update_type == "add":
-                hub["resources"][resource] = hub["resources"].get(resource, 0) + value
-
-        save_data(data)
-        process_pending_allocations()
-        return jsonify({"message": "Hub inventory updated successfully", "hub": hub})
+        error = inventory_update_error(hub_name, resources_update, update_type)
+        if error:
+            return {"error": error}, 400
+
+        with store.locked(resources_update):
+            # Find the hub by name
+            hub = store.hub(hub_name)
+            if not hub:
+                return {"error": "Hub not found"}, 404
+
+            # Update the inventory for each resource
+            for resource, value in resources_update.items():
+                if update_type == "set":
+                    store.set_inventory(hub, resource, value)
+                elif update_type == "add":
+                    store.adjust_inventory(hub, resource, value)
+
+            transfers = rebalance_pending(list(resources_update))[0] if REBALANCE else []
+            process_pending_allocations(list(resources_update))
+            # Other resources of this hub may change as soon as the lock is released
+            hub = dict(hub, resources=dict(hub["resources"]))
+        body = {"message": "Hub inventory updated successfully", "hub": hub}
+        if transfers:
+            body["transfers"] = transfers
+        return body, 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
+
+def update_hub_inventory_many(calls):
+    """
+    update_hub_inventory for many /update_inventory payloads at once: the
+    valid updates are applied back to back and the pending requests
+    waiting on what they touched are resolved in one pass afterwards,
+    rather than once per update. An invalid or failing update is answered
+    on its own and the others still apply. Returns one (body, status) per
+    call; "transfers" lists the moves of the resources each one touched.
+    """
+    results = [None] * len(calls)
+    checked = []
+    for k, req_data in enumerate(calls):
+        try:
+            hub_name, resources_update = req_data.get("hub_name"), req_data.get("resources")
+            update_type = req_data.get("update_type", "set")
+            error = inventory_update_error(hub_name, resources_update, update_type)
+        except Exception as e:
+            results[k] = {"error": str(e)}, 500
+            continue
+        if error:
+            results[k] = {"error": error}, 400
+        else:
+            checked.append((k, hub_name, resources_update, update_type))
+    if not checked:
+        return results
+
+    resources = sorted({resource for _, _, resources_update, _ in checked for resource in resources_update})
+    with store.locked(resources):
+        applied = []
+        for k, hub_name, resources_update, update_type in checked:
+            hub = store.hub(hub_name)
+            if not hub:
+                results[k] = {"error": "Hub not found"}, 404
+                continue
+            try:
+                for resource, value in resources_update.items():
+                    if update_type == "set":
+                        store.set_inventory(hub, resource, value)
+                    elif update_type == "add":
+                        store.adjust_inventory(hub, resource, value)
+            except Exception as e:
+                results[k] = {"error": str(e)}, 500
+                continue
+            applied.append((k, hub, resources_update))
+        transfers = rebalance_pending(resources)[0] if REBALANCE else []
+        process_pending_allocations(resources)
+        for k, hub, resources_update in applied:
+            body = {"message": "Hub inventory updated successfully",
+                    "hub": dict(hub, resources=dict(hub["resources"]))}
+            moved = [transfer for transfer in transfers if transfer["resource"] in resources_update]
+            if moved:
+                body["transfers"] = moved
+            results[k] = body, 200
+    return results
+
+@app.route('/update_inventory', methods=['POST'])
+def update_inventory():
+    body, status = update_hub_inventory(json_body())
+    return jsonify(body), status
+
+def bulk_update_inventory(updates):
+    """
+    Apply many hub updates, (where, update) pairs shaped like the
+    /update_inventory payload and possibly still being read (see
+    manifest.py), in one store transaction. Every update is checked
+    first, so a bad one leaves all inventory untouched; pending requests
+    are then resolved once for every resource touched. Returns (body, status).
+    """
+    try:
+        checked, errors = [], []
+        try:
+            for where, update in updates:
+                hub_name, resources_update = update.get("hub_name"), update.get("resources")
+                error = inventory_update_error(hub_name, resources_update, update.get("update_type"))
+                if error is None and store.hub(hub_name) is None:
+                    error = f"Hub not found: {hub_name}"
+                if error:
+                    errors.append({"at": where, "error": error})
+                else:
+                    checked.append((hub_name, resources_update, update["update_type"]))
+        except ManifestError as e:
+            errors.append({"at": e.where, "error": e.message})
+        if errors:
+            return {"error": "No inventory was changed", "errors": errors[:100], "error_count": len(errors)}, 400
+
+        resources = sorted({resource for _, resources_update, _ in checked for resource in resources_update})
+        with store.locked(resources), span("inventory.bulk"):
+            with store.transaction():
+                for hub_name, resources_update, update_type in checked:
+                    hub = store.hub(hub_name)
+                    for resource, value in resources_update.items():
+                        if update_type == "set":
+                            store.set_inventory(hub, resource, value)
+                        else:
+                            store.adjust_inventory(hub, resource, value)
+            transfers, released = rebalance_pending(resources) if REBALANCE else ([], [])
+            released = released + process_pending_allocations(resources)
+        return {
+            "message": "Inventory updated",
+            "updates": len(checked),
+            "hubs": len({hub_name for hub_name, _, _ in checked}),
+            "changes": sum(len(resources_update) for _, resources_update, _ in checked),
+            "transfers": transfers,
+            "released": len(released),
+        }, 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+@app.route('/update_inventory/bulk', methods=['POST'])
+def update_inventory_bulk():
+    """
+    Many hub updates in one call: a JSON list (or {"updates": [...]}) of
+    /update_inventory payloads, NDJSON with one per line, or CSV with
+    hub_name,resource,units[,update_type] columns; see manifest.py. NDJSON
+    and CSV are read from the request stream a line at a time.
+    ?update_type=set|add is the default for updates that do not say.
+    """
+    update_type = request.args.get("update_type", "set")
+    try:
+        updates = read_manifest(request.stream, request.content_type, update_type)
+    except ManifestError as e:
+        return jsonify({"error": str(e)}), 415
+    body, status = bulk_update_inventory(updates)
+    return jsonify(body), status
+
+def record_session(allocations):
+    """Append to this session's allocations and publish them as one "session" event."""
+    if not allocations:
+        return
+    with allocations_data.lock:
+        start = allocations_data.extend(allocations)
+        events.publish("session", {"start": start, "allocations": allocations})
+
+def session_allocations():
+    """(retained allocations, id of the last event they reflect)"""
+    with allocations_data.lock:
+        allocations_data.expire()
+        return allocations_data.items(), events.event_id()
+
 @app.route('/session_allocations',methods=['GET'])
 def session_all():
-    return jsonify(allocations_data)
+    """
+    This session's retained allocations (see SessionAllocations), with an
+    ETag that changes only when they do; long lists are streamed in chunks. ?cursor=<n>&limit=<k> returns a
+    page instead, positions counting from the start of the session:
+    {"allocations": [...], "first": oldest retained, "next_cursor": ..., "total": ...}.
+    X-Session-First is the session position of the first entry retained,
+    the base for the positions in "session" events.
+    """
+    cursor = request.args.get("cursor", type=int)
+    limit = min(max(request.args.get("limit", 500, type=int), 1), 5000)
+    with allocations_data.lock:
+        allocations_data.expire()
+        etag = f"{events.epoch}-{allocations_data.version}"
+        event_id = events.event_id()
+        first = allocations_data.first
+        if cursor is not None:
+            body = allocations_data.page(cursor, limit)
+        elif etag in request.if_none_match:
+            return not_modified(etag)
+        elif len(allocations_data) >= SESSION_STREAM_MIN:
+            # The parts are immutable strings, so they can be joined after the lock is released
+            body = serialize.iter_array(allocations_data.parts())
+        else:
+            body = allocations_data.body()
+    response = app.response_class(body, mimetype="application/json")
+    response.headers["X-Event-Id"] = event_id
+    response.headers["X-Session-First"] = str(first)
+    if cursor is None:
+        response.set_etag(etag)
+    return response
+
+@app.route('/session_allocations/rollup', methods=['GET'])
+def session_rollup():
+    """
+    Allocation count, numeric units and open pending requests this session,
+    evicted entries included: for ?camp=<name> or ?resource=<name>, or for
+    every camp and resource.
+    """
+    with allocations_data.lock:
+        rollup = allocations_data.rollup(request.args.get("camp"), request.args.get("resource"))
+        return jsonify(rollup)
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,276 @@
+"""
+asyncio serving mode for the allocation API.
+
+Serves /allocate, /allocate_hub, /update_inventory, /session_allocations
+and the /events change stream with the same handlers and state as app.py,
+from a single event loop and without a thread per request. Mutating
+requests that arrive within a short window are coalesced and run on one
+worker thread, so the loop keeps accepting and parsing while inventory is
+being changed. Consecutive requests to the same endpoint are merged into
+a single pass (see the *_many handlers in app.py): /allocate requests
+are served one resource at a time, /allocate_hub requests are put in
+priority order together and share one round-robin pass, and
+/update_inventory updates are applied together before one pending pass.
+Each request still gets its own answer; one that is invalid or fails
+does not fail the rest. Persistence stays on the store's background
+flusher, and reading the session list is done off the loop as well.
+
+    python async_app.py --port 5001 --window 0.001
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import app as disastro
+import serialize
+
+# Each takes a list of payloads and returns one (body, status) per payload
+ROUTES = {
+    "/allocate": disastro.allocate_camp_many,
+    "/allocate_hub": disastro.allocate_round_robin_many,
+    "/update_inventory": disastro.update_hub_inventory_many,
+}
+
+REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error"}
+
+MAX_BODY = 16 * 1024 * 1024
+
+
+def _run_batch(batch):
+    """
+    (body, status) for each coalesced (path, payload), in order. Runs of
+    requests to the same endpoint go to its handler as one merged pass; if
+    that pass itself fails, only the requests of that run are answered 500.
+    """
+    results = []
+    start = 0
+    while start < len(batch):
+        path = batch[start][0]
+        end = start
+        while end < len(batch) and batch[end][0] == path:
+            end += 1
+        try:
+            results.extend(ROUTES[path]([req_data for _, req_data in batch[start:end]]))
+        except Exception as e:
+            results.extend([({"error": str(e)}, 500)] * (end - start))
+        start = end
+    return results
+
+
+class Coalescer:
+    """
+    Queue of mutating requests drained in batches. After the first request
+    of a batch arrives, others are collected for `window` seconds (or until
+    `max_batch`); requests arriving while a batch runs wait for the next.
+    """
+
+    def __init__(self, window=0.001, max_batch=256):
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="allocator")
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def stop(self):
+        self._task.cancel()
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, path, req_data):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((future, path, req_data))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            work = [(path, req_data) for _, path, req_data in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, _run_batch, work)
+            except Exception as e:
+                results = [({"error": str(e)}, 500)] * len(batch)
+            self.batches += 1
+            self.requests += len(batch)
+            for (future, _, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class Server:
+    """Minimal HTTP/1.1 front end with keep-alive, JSON bodies and permissive CORS like flask_cors."""
+
+    def __init__(self, coalescer, heartbeat=15.0):
+        self.coalescer = coalescer
+        self.heartbeat = heartbeat
+        self._changed = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._waker = lambda: loop.call_soon_threadsafe(self._wake)
+        disastro.events.add_waker(self._waker)
+
+    def close(self):
+        """Stop being woken by events, once the loop is about to go away."""
+        disastro.events.remove_waker(self._waker)
+
+    def _wake(self):
+        # A fresh Event per change, so every waiting stream sees the set.
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def stream_events(self, writer, event_id):
+        """Write the /events stream until the client goes away (see app.event_stream)."""
+        log = disastro.events
+        writer.write(("HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                      "Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n").encode("latin-1"))
+        since = log.offset(event_id)
+        if since is None:
+            since = log.seq
+            writer.write(log.reset_message(since).encode("utf-8"))
+        while True:
+            changed = self._changed
+            events = log.read(since)
+            if events is None:
+                since = log.seq
+                writer.write(log.reset_message(since).encode("utf-8"))
+            elif events:
+                since = events[-1][0]
+                writer.write("".join(log.format(*event) for event in events).encode("utf-8"))
+            else:
+                try:
+                    await asyncio.wait_for(changed.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+            await writer.drain()
+
+    async def handle(self, method, path, body):
+        """(payload, status, extra headers) for one request."""
+        path = path.split("?", 1)[0]
+        if method == "OPTIONS":
+            return None, 204, {}
+        if path == "/session_allocations":
+            if method != "GET":
+                return {"error": "Method not allowed"}, 405, {}
+            # Takes the session lock, which allocating threads hold too
+            loop = asyncio.get_running_loop()
+            allocations, event_id = await loop.run_in_executor(None, disastro.session_allocations)
+            return allocations, 200, {"X-Event-Id": event_id}
+        if path not in ROUTES:
+            return {"error": "Not found"}, 404, {}
+        if method != "POST":
+            return {"error": "Method not allowed"}, 405, {}
+        try:
+            req_data = serialize.loads(body) if body else None
+        except ValueError:
+            return {"error": "Invalid JSON"}, 400, {}
+        payload, status = await self.coalescer.submit(path, req_data)
+        return payload, status, {}
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # Without a length the body cannot be told from the next request
+                    writer.write(self._response({"error": "Invalid Content-Length"}, 400, False, {}))
+                    await writer.drain()
+                    break
+                if length > MAX_BODY:
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                if method == "GET" and path.split("?", 1)[0] == "/events":
+                    query = parse_qs(path.partition("?")[2])
+                    await self.stream_events(writer, headers.get("last-event-id") or query.get("since", [None])[0])
+                    break
+                payload, status, extra = await self.handle(method, path, body)
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version == "HTTP/1.1")
+                writer.write(self._response(payload, status, keep_alive, extra))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _response(payload, status, keep_alive, extra):
+        data = b"" if payload is None else serialize.dumps(payload)
+        head = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(data)}",
+            "Access-Control-Allow-Origin: *",
+            "Access-Control-Allow-Headers: Content-Type",
+            "Access-Control-Allow-Methods: GET, POST, OPTIONS",
+            "Connection: " + ("keep-alive" if keep_alive else "close"),
+            *(f"{name}: {value}" for name, value in extra.items()),
+        ]
+        return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data
+
+
+async def serve(host="127.0.0.1", port=5001, window=0.001, max_batch=256):
+    coalescer = Coalescer(window, max_batch)
+    coalescer.start()
+    front = Server(coalescer)
+    server = await asyncio.start_server(front.serve_client, host, port)
+    print(f"Serving on http://{host}:{port} (coalescing window {window * 1e3:g} ms)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        front.close()
+        await coalescer.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--window", type=float, default=0.001, help="seconds to collect a batch")
+    parser.add_argument("--max-batch", type=int, default=256)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.window, args.max_batch))
+    except KeyboardInterrupt:
+        pass
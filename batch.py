@@ -0,0 +1,118 @@
+import time
+
+import numpy as np
+
+from distance import distance_matrix
+from pending import PRIORITY_ORDER
+from transport import solve_transportation
+
+
+def _priority_key(req):
+    return (PRIORITY_ORDER.get(req.get("priority", "men"), 4), -req.get("time_since_last_request", 0))
+
+
+def distance_rows(requests, hubs, positions, distances):
+    """(len(requests), len(positions)) distances, from the cache where the camp is known."""
+    hub_names = [hubs[p]["name"] for p in positions]
+    rows = np.empty((len(requests), len(positions)))
+    known = [k for k, req in enumerate(requests) if req["relief_camp"] in distances]
+    other = [k for k, req in enumerate(requests) if req["relief_camp"] not in distances]
+    if known:
+        rows[known] = distances.block([requests[k]["relief_camp"] for k in known], hub_names)
+    if other:
+        rows[other] = distance_matrix([hubs[p]["location"] for p in positions],
+                                      [requests[k]["location"] for k in other]).T
+    return rows
+
+
+def _greedy(requests, order, units, rows):
+    """What /allocate_hub's priority sort plus round-robin would ship for the same requests."""
+    shipped, distance, cursor = 0, 0.0, 0
+    for k in order:
+        needed = requests[k]["units"]
+        for step in range(len(units)):
+            column = (cursor + step) % len(units)
+            if units[column] <= 0:
+                continue
+            sent = int(min(needed, units[column]))
+            units[column] -= sent
+            needed -= sent
+            shipped += sent
+            distance += sent * float(rows[k, column])
+            if needed <= 0:
+                cursor = column + 1
+                break
+    return shipped, distance
+
+
+def plan_batch(requests, hubs, distances, stocked):
+    """
+    Plan many camp requests at once. For each resource the hubs holding it
+    and the requests for it form a transportation problem whose cost is the
+    distance shipped, with unmet demand charged by priority group so that
+    under shortage children are served before elderly, women and men.
+
+    `stocked(resource)` returns hub positions with stock of that resource.
+    Returns shipments (request index, hub position, units, distance_km),
+    the units left unmet per request index, and solve statistics compared
+    with the greedy round-robin used by /allocate_hub; distances there are
+    unit-km, each unit shipped times the distance it travels.
+    """
+    def supply(resource):
+        positions = list(stocked(resource))
+        return positions, np.array([hubs[p]["resources"][resource] for p in positions], dtype=np.int64)
+
+    def rows(indexes, positions):
+        return distance_rows([requests[k] for k in indexes], hubs, positions, distances)
+
+    return solve_batch(requests, supply, rows)
+
+
+def solve_batch(requests, supply, rows_for):
+    """
+    plan_batch over plain arrays: `supply(resource)` gives (hub positions,
+    units held) and `rows_for(request indexes, positions)` the
+    distances between them, so the solve can run where the hubs are not.
+    """
+    start = time.perf_counter()
+    by_resource = {}
+    for k, req in enumerate(requests):
+        by_resource.setdefault(req["resource"], []).append(k)
+
+    shipments, unmet = [], {}
+    stats = {"units_requested": 0, "units_allocated": 0, "total_unit_km": 0.0,
+             "greedy_units_allocated": 0, "greedy_total_unit_km": 0.0}
+    for resource, indexes in by_resource.items():
+        batch = [requests[k] for k in indexes]
+        demand = np.array([req["units"] for req in batch], dtype=np.int64)
+        stats["units_requested"] += int(demand.sum())
+        positions, supply_units = supply(resource)
+        if not len(positions):
+            unmet.update((k, req["units"]) for k, req in zip(indexes, batch))
+            continue
+        rows = rows_for(indexes, positions)
+
+        # One priority group outweighs any difference in shipping distance.
+        band = float(rows.max()) + 1.0
+        shortage = np.array([band * (5 - _priority_key(req)[0]) for req in batch])
+        flow, left = solve_transportation(supply_units, demand, rows.T, shortage)
+
+        for h, c in zip(*np.nonzero(flow)):
+            h, c = int(h), int(c)
+            units = int(flow[h, c])
+            shipments.append((indexes[c], int(positions[h]), units, float(rows[c, h])))
+            stats["units_allocated"] += units
+            stats["total_unit_km"] += units * float(rows[c, h])
+        for c in np.nonzero(left)[0]:
+            unmet[indexes[int(c)]] = int(left[c])
+
+        order = sorted(range(len(batch)), key=lambda c: _priority_key(batch[c]))
+        shipped, distance = _greedy(batch, order, supply_units.copy(), rows)
+        stats["greedy_units_allocated"] += shipped
+        stats["greedy_total_unit_km"] += distance
+
+    stats["total_unit_km"] = round(stats["total_unit_km"], 2)
+    stats["greedy_total_unit_km"] = round(stats["greedy_total_unit_km"], 2)
+    stats["solve_ms"] = round((time.perf_counter() - start) * 1e3, 2)
+    shipments.sort(key=lambda s: (_priority_key(requests[s[0]]), s[0], s[3]))
+    return shipments, unmet, stats
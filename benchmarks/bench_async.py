@@ -0,0 +1,148 @@
+"""
+Latency under concurrent load: the threaded Flask app against the asyncio
+serving mode (async_app.py), each started as its own process on a fresh
+copy of the same dataset and driven by the same mix of /allocate_hub,
+/allocate and /update_inventory calls over keep-alive connections.
+
+    python benchmarks/bench_async.py --requests 4000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import RESOURCES, make_dataset, make_requests, write_dataset
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def make_calls(data, n, seed=0):
+    rng = random.Random(seed)
+    calls = []
+    for i in range(n):
+        kind = rng.random()
+        if kind < 0.4:
+            calls.append(("/allocate_hub", {"requests": make_requests(data, rng.randint(1, 4), seed=i)}))
+        elif kind < 0.7:
+            camp = rng.choice(data["relief_camps"])
+            calls.append(("/allocate", {
+                "relief_camp": camp["name"], "location": camp["location"],
+                "requests": [{"resource": rng.choice(RESOURCES), "units": rng.randint(1, 60)}]}))
+        else:
+            calls.append(("/update_inventory", {
+                "hub_name": rng.choice(data["hubs"])["name"],
+                "resources": {rng.choice(RESOURCES): rng.randint(1, 80)}, "update_type": "add"}))
+    return calls
+
+
+async def request(conn, port, path, body):
+    """One POST; reconnects when the server closed the previous connection."""
+    if conn[0] is None:
+        conn[0] = await asyncio.open_connection("127.0.0.1", port)
+    reader, writer = conn[0]
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n").encode() + body)
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").lower()
+    length = 0
+    for line in head.split("\r\n"):
+        if line.startswith("content-length:"):
+            length = int(line.split(":", 1)[1])
+    await reader.readexactly(length)
+    status = int(head.split(" ", 2)[1])
+    if head.startswith("http/1.0") or "connection: close" in head:
+        writer.close()
+        conn[0] = None
+    return status
+
+
+async def drive(port, calls, concurrency):
+    queue = list(reversed(calls))
+    latencies, failures = [], [0]
+
+    async def client():
+        conn = [None]
+        while queue:
+            path, payload = queue.pop()
+            start = time.perf_counter()
+            status = await request(conn, port, path, json.dumps(payload).encode())
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                failures[0] += 1
+        if conn[0] is not None:
+            conn[0][1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start, failures[0]
+
+
+def run_server(cmd, data, calls, concurrency, env):
+    path = os.path.join(tempfile.mkdtemp(), "hubs.json")
+    write_dataset(path, data)
+    port = free_port()
+    env = dict(env, DISASTRO_DATA_PATH=path)
+    proc = subprocess.Popen([sys.executable, *[c.format(port=port) for c in cmd]], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(port)
+        return asyncio.run(drive(port, calls, concurrency))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=200)
+    parser.add_argument("--camps", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--window", type=float, default=0.001)
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    args = parser.parse_args()
+
+    data = make_dataset(args.hubs, args.camps)
+    calls = make_calls(data, args.requests)
+    env = dict(os.environ, DISASTRO_STORAGE=args.storage)
+    servers = {
+        "flask": ["-c", "import app; app.app.run(port={port}, threaded=True)"],
+        "async": ["async_app.py", "--port", "{port}", "--window", str(args.window)],
+    }
+
+    print(f"{'server':>6} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for concurrency in args.concurrency:
+        for name, cmd in servers.items():
+            latencies, elapsed, failures = run_server(cmd, data, calls, concurrency, env)
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2] * 1e3
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3
+            print(f"{name:>6} {concurrency:>5} {len(latencies) / elapsed:>8.0f} {p50:>8.2f} {p99:>8.2f} {failures:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+A warehouse manifest restocking every hub while requests are pending:
+one /update_inventory call per hub against a single
+/update_inventory/bulk upload as JSON, NDJSON and CSV. Reports wall
+time, journal records written and pending-resolution passes.
+
+    python benchmarks/bench_bulk.py --hubs 500 --camps 2000 --backlog 2000
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import RESOURCES, make_dataset, make_requests, write_dataset
+
+
+def manifest(data, seed_units=37):
+    return [{"hub_name": hub["name"], "update_type": "add",
+             "resources": {r: (i * seed_units + k * 11) % 90 + 10 for k, r in enumerate(RESOURCES)}}
+            for i, hub in enumerate(data["hubs"])]
+
+
+def as_csv(updates):
+    out = io.StringIO()
+    out.write("hub_name,resource,units,update_type\n")
+    for update in updates:
+        for resource, units in update["resources"].items():
+            out.write(f"{update['hub_name']},{resource},{units},{update['update_type']}\n")
+    return out.getvalue().encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=500)
+    parser.add_argument("--camps", type=int, default=2000)
+    parser.add_argument("--backlog", type=int, default=2000, help="requests left pending before the upload")
+    args = parser.parse_args()
+
+    data = make_dataset(args.hubs, args.camps, stock=(0, 0))
+    backlog = make_requests(data, args.backlog, seed=1, max_units=40)
+    updates = manifest(data)
+    bodies = {
+        "bulk json": ("application/json", json.dumps({"updates": updates}).encode("utf-8")),
+        "bulk ndjson": ("application/x-ndjson", b"".join(json.dumps(u).encode("utf-8") + b"\n" for u in updates)),
+        "bulk csv": ("text/csv", as_csv(updates)),
+    }
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "hubs.json")
+    os.environ["DISASTRO_DATA_PATH"] = path
+    write_dataset(path, data)
+    import app as disastro
+
+    passes = [0]
+    resolve = disastro.process_pending_allocations
+
+    def counted(resources=None):
+        passes[0] += 1
+        return resolve(resources)
+
+    disastro.process_pending_allocations = counted
+    appends = [0]
+    print(f"{args.hubs} hubs x {len(RESOURCES)} resources, {args.backlog} pending requests")
+    print(f"{'':>12} {'seconds':>8} {'journal records':>14} {'pending passes':>15} {'left pending':>13}")
+    try:
+        final = None
+        for name in ("per hub", *bodies):
+            disastro.store.close()
+            disastro.store.storage.journal.reset()
+            write_dataset(path, data)
+            disastro.init_store(path, "json")
+            disastro.allocate_round_robin({"requests": backlog})
+            disastro.store.flush()
+            storage = disastro.store.storage
+            append = storage.append
+
+            def counted_append(record, append=append):
+                appends[0] += 1
+                return append(record)
+
+            # Compaction resets the journal, so records are counted as they are written
+            storage.append = counted_append
+            client = disastro.app.test_client()
+            passes[0] = appends[0] = 0
+
+            start = time.perf_counter()
+            if name == "per hub":
+                for update in updates:
+                    client.post("/update_inventory", json=update)
+            else:
+                content_type, body = bodies[name]
+                response = client.post("/update_inventory/bulk", data=body, content_type=content_type)
+                assert response.status_code == 200, response.get_json()
+            disastro.store.flush()
+            elapsed = time.perf_counter() - start
+            del storage.append
+
+            hubs = {hub["name"]: dict(hub["resources"]) for hub in disastro.store.hubs}
+            if name != "per hub":
+                # The same manifest must leave every mode with the same stock in total
+                assert sum(sum(r.values()) for r in hubs.values()) == final, name
+            final = sum(sum(r.values()) for r in hubs.values())
+            print(f"{name:>12} {elapsed:>8.3f} {appends[0]:>14} "
+                  f"{passes[0]:>15} {len(disastro.pending):>13}")
+    finally:
+        disastro.process_pending_allocations = resolve
+        disastro.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
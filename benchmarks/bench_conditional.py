@@ -0,0 +1,93 @@
+"""
+Cost of a dashboard refresh against /hubs.json and /session_allocations:
+serializing everything on each hit (the old handlers) versus the cached
+body, a 304 for an unchanged ETag, a ?since= delta after one change and a
+cursor page of new session allocations.
+
+    python benchmarks/bench_conditional.py --camps 200 --history 200
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_dataset, make_requests, write_dataset
+
+
+def per_call(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=100)
+    parser.add_argument("--camps", type=int, default=200)
+    parser.add_argument("--history", type=int, default=200, help="allocations per camp")
+    parser.add_argument("--session", type=int, default=5000, help="allocations made this session")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    data = make_dataset(args.hubs, args.camps, history=args.history)
+    path = os.path.join(tempfile.mkdtemp(), "hubs.json")
+    write_dataset(path, data)
+    os.environ["DISASTRO_DATA_PATH"] = path
+    import app as disastro
+    from flask import jsonify
+
+    client = disastro.app.test_client()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(0, args.session, 50):
+            client.post("/allocate_hub", json={"requests": make_requests(data, 50, seed=i, max_units=5)})
+    session_total = disastro.allocations_data.total
+
+    def legacy_hubs():
+        with disastro.app.app_context(), disastro.store.lock:
+            return jsonify(disastro.store.data).get_data()
+
+    def legacy_session():
+        with disastro.app.app_context():
+            return jsonify(disastro.session_allocations()[0]).get_data()
+
+    full = client.get("/hubs.json")
+    etag, version = full.headers["ETag"], full.headers["X-Event-Id"]
+    session = client.get("/session_allocations")
+    session_etag = session.headers["ETag"]
+    hubs_rows = [
+        ("serialize every hit (old)", legacy_hubs, len(legacy_hubs())),
+        ("cached body", lambda: client.get("/hubs.json"), len(full.data)),
+        ("If-None-Match -> 304", lambda: client.get("/hubs.json", headers={"If-None-Match": etag}), 0),
+    ]
+    session_rows = [
+        ("serialize every hit (old)", legacy_session, len(legacy_session())),
+        ("cached body", lambda: client.get("/session_allocations"), len(session.data)),
+        ("If-None-Match -> 304", lambda: client.get("/session_allocations",
+                                                    headers={"If-None-Match": session_etag}), 0),
+    ]
+
+    # One more allocation, then what a client holding the previous version fetches
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.post("/allocate_hub", json={"requests": make_requests(data, 1, seed=-1, max_units=5)})
+    delta = client.get(f"/hubs.json?since={version}")
+    hubs_rows.append(("?since= after one change", lambda: client.get(f"/hubs.json?since={version}"), len(delta.data)))
+    page_url = f"/session_allocations?cursor={session_total}"
+    session_rows.append(("cursor page after one change", lambda: client.get(page_url), len(client.get(page_url).data)))
+
+    for title, rows in ((f"/hubs.json ({args.camps * args.history} allocations on record)", hubs_rows),
+                        (f"/session_allocations ({session_total} this session)", session_rows)):
+        print(title)
+        for name, fn, size in rows:
+            print(f"  {name:<30} {per_call(fn, args.repeat):9.3f} ms  {size / 1024:10.1f} KB")
+    disastro.store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Camps x hubs distances: scalar calculate_distance in a Python loop against
+one vectorized haversine_matrix pass, and the cost of refreshing the cached
+matrix after a single hub moves.
+
+    python benchmarks/bench_distance.py --camps 500 --hubs 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_dataset
+from distance import DistanceMatrix, haversine_matrix
+from geo import calculate_distance
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--camps", type=int, default=500)
+    parser.add_argument("--hubs", type=int, default=500)
+    args = parser.parse_args()
+
+    data = make_dataset(args.hubs, args.camps)
+    camp_locs = [camp["location"] for camp in data["relief_camps"]]
+    hub_locs = [hub["location"] for hub in data["hubs"]]
+
+    start = time.perf_counter()
+    [[calculate_distance(c, h) for h in hub_locs] for c in camp_locs]
+    scalar_ms = (time.perf_counter() - start) * 1e3
+
+    start = time.perf_counter()
+    haversine_matrix(camp_locs, hub_locs)
+    vector_ms = (time.perf_counter() - start) * 1e3
+
+    matrix = DistanceMatrix.from_state(data["hubs"], data["relief_camps"])
+    matrix.matrix
+    start = time.perf_counter()
+    for hub in data["hubs"][:100]:
+        matrix.set_hub(hub["name"], [hub["location"][0] + 0.01, hub["location"][1]])
+        matrix.matrix
+    moved_ms = (time.perf_counter() - start) * 1e3 / 100
+
+    print(f"{args.camps} camps x {args.hubs} hubs")
+    print(f"scalar loop:        {scalar_ms:9.2f} ms")
+    print(f"haversine_matrix:   {vector_ms:9.2f} ms  ({scalar_ms / vector_ms:.0f}x)")
+    print(f"one hub moved:      {moved_ms:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
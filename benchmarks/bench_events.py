@@ -0,0 +1,74 @@
+"""
+What a dashboard costs per change: re-fetching /hubs.json and
+/session_allocations after every update (what the pages did) versus the
+/events messages that update produces, in bytes and server time, as the
+state grows.
+
+    python benchmarks/bench_events.py --camps 200 --steps 0,50,200
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import RESOURCES, make_dataset, make_requests, write_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=100)
+    parser.add_argument("--camps", type=int, default=200)
+    parser.add_argument("--steps", default="0,50,200", help="allocations per camp already on record")
+    parser.add_argument("--updates", type=int, default=100)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "hubs.json")
+    write_dataset(path, make_dataset(1, 1))
+    os.environ["DISASTRO_DATA_PATH"] = path
+    import app as disastro
+
+    print(f"{'history':>10} {'poll KB/upd':>12} {'poll ms/upd':>12} {'sse KB/upd':>11} {'sse ms/upd':>11}")
+    for history in (int(s) for s in args.steps.split(",")):
+        data = make_dataset(args.hubs, args.camps, history=history)
+        write_dataset(path, data)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + ".journal")
+        disastro.init_store(path)
+        client = disastro.app.test_client()
+        rng = random.Random(0)
+
+        first = disastro.events.seq
+        poll_bytes, poll_time = 0, 0.0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(args.updates):
+                if i % 2:
+                    client.post("/allocate_hub", json={"requests": make_requests(data, 2, seed=i)})
+                else:
+                    client.post("/update_inventory", json={
+                        "hub_name": rng.choice(data["hubs"])["name"],
+                        "resources": {rng.choice(RESOURCES): rng.randint(1, 50)}, "update_type": "add"})
+
+                start = time.perf_counter()
+                poll_bytes += len(client.get("/hubs.json").data) + len(client.get("/session_allocations").data)
+                poll_time += time.perf_counter() - start
+
+        # Everything the updates published, as a client resuming from before them receives it
+        start = time.perf_counter()
+        stream = "".join(disastro.events.format(*event) for event in disastro.events.read(first))
+        sse_time = time.perf_counter() - start
+        sse_bytes = len(stream.encode("utf-8"))
+        disastro.store.close()
+
+        print(f"{history * args.camps:>10} {poll_bytes / args.updates / 1024:>12.1f} "
+              f"{poll_time / args.updates * 1e3:>12.3f} {sse_bytes / args.updates / 1024:>11.2f} "
+              f"{sse_time / args.updates * 1e3:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
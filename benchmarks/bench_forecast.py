@@ -0,0 +1,119 @@
+"""
+Pre-positioning from the demand forecast (forecast.py). Camps draw with
+skewed, persistent rates: a few camps near one corner of the map ask for
+most of the stock. The forecast is fitted over --periods periods of
+/allocate calls, then the same kind of traffic is replayed from a fresh
+copy of the dataset twice: as is, and after moving stock along the
+/preposition transfers. Reports km travelled per unit delivered, handler
+latency and units left unfilled.
+
+    python benchmarks/bench_forecast.py --hubs 100 --camps 1000 --calls 3000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import RESOURCES, make_dataset, write_dataset
+
+
+def demand_stream(data, n, seed):
+    """/allocate payloads; camps are drawn with weight falling off away from the dataset's south-west corner."""
+    rng = random.Random(seed)
+    camps = data["relief_camps"]
+    corner = np.array([min(c["location"][0] for c in camps), min(c["location"][1] for c in camps)])
+    reach = np.array([np.hypot(*(np.array(c["location"]) - corner)) for c in camps])
+    weights = np.exp(-reach / 0.8).tolist()
+    mix = dict(zip(RESOURCES, (4, 3, 2, 1)))
+    calls = []
+    for camp in rng.choices(camps, weights, k=n):
+        calls.append({"relief_camp": camp["name"], "location": camp["location"],
+                      "requests": [{"resource": rng.choices(list(mix), list(mix.values()))[0],
+                                    "units": rng.randint(5, 60)}]})
+    return calls
+
+
+def replay(disastro, calls):
+    shipped = wanted = 0
+    km = 0.0
+    latencies = []
+    for payload in calls:
+        start = time.perf_counter()
+        body, _ = disastro.allocate_camp(payload)
+        latencies.append(time.perf_counter() - start)
+        wanted += payload["requests"][0]["units"]
+        for alloc in body:
+            if isinstance(alloc.get("allocated_units"), int):
+                shipped += alloc["allocated_units"]
+                km += alloc["allocated_units"] * alloc["distance_km"]
+    ms = np.array(latencies) * 1e3
+    return km / max(shipped, 1), np.percentile(ms, 50), np.percentile(ms, 99), wanted - shipped
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=100)
+    parser.add_argument("--camps", type=int, default=1000)
+    parser.add_argument("--calls", type=int, default=3000, help="/allocate calls per period and in the replay")
+    parser.add_argument("--periods", type=int, default=4, help="periods observed before planning")
+    parser.add_argument("--stock", type=int, default=600, help="most units of a resource per hub")
+    args = parser.parse_args()
+
+    data = make_dataset(args.hubs, args.camps, stock=(0, args.stock))
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "hubs.json")
+    os.environ["DISASTRO_DATA_PATH"] = path
+    write_dataset(path, data)
+    import app as disastro
+
+    def fresh():
+        disastro.store.close()
+        disastro.store.storage.journal.reset()
+        write_dataset(path, data)
+        disastro.init_store(path, "json")
+
+    try:
+        # Fit: each period starts from the same stock, as if restocked overnight
+        trained = disastro.forecast
+        for period in range(args.periods):
+            if period:
+                fresh()
+                disastro.forecast = trained
+            replay(disastro, demand_stream(data, args.calls, seed=period))
+            trained.step()
+        calls = demand_stream(data, args.calls, seed=args.periods)
+
+        print(f"{args.hubs} hubs, {args.camps} camps, {args.calls} calls per period, "
+              f"{args.periods} periods observed")
+        print(f"{'':>14} {'km/unit':>8} {'p50 ms':>7} {'p99 ms':>7} {'unfilled':>9} {'moved':>7}")
+        for name in ("as stocked", "pre-positioned"):
+            fresh()
+            disastro.forecast = trained
+            moved = 0
+            if name == "pre-positioned":
+                start = time.perf_counter()
+                plan, _ = disastro.preposition_plan()
+                planned = time.perf_counter() - start
+                for transfer in plan["transfers"]:
+                    disastro.update_hub_inventory({"hub_name": transfer["from"], "update_type": "add",
+                                                   "resources": {transfer["resource"]: -transfer["units"]}})
+                    disastro.update_hub_inventory({"hub_name": transfer["to"], "update_type": "add",
+                                                   "resources": {transfer["resource"]: transfer["units"]}})
+                    moved += transfer["units"]
+            km, p50, p99, unfilled = replay(disastro, calls)
+            print(f"{name:>14} {km:>8.2f} {p50:>7.3f} {p99:>7.3f} {unfilled:>9} {moved:>7}")
+        print(f"plan: {len(plan['transfers'])} transfers in {planned:.2f} s")
+    finally:
+        disastro.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
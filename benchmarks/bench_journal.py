@@ -0,0 +1,65 @@
+"""
+Cost of persisting one allocation as the incident history grows: rewriting
+the whole hubs.json (the old save_data) versus appending a journal record.
+
+    python benchmarks/bench_journal.py --camps 200 --steps 0,50,200,800
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_dataset, write_dataset
+from state import StateStore
+
+
+def per_write(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=50)
+    parser.add_argument("--camps", type=int, default=200)
+    parser.add_argument("--steps", default="0,50,200,800", help="allocations per camp already on record")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'history':>10} {'rewrite ms':>12} {'journal ms':>12}")
+    for history in (int(s) for s in args.steps.split(",")):
+        tmp = tempfile.mkdtemp()
+        path = os.path.join(tmp, "hubs.json")
+        write_dataset(path, make_dataset(args.hubs, args.camps, history=history))
+        store = StateStore(path, compact_every=10 ** 9)
+        hub, camp = store.hubs[0], store.relief_camps[0]
+
+        def allocate(i):
+            store.adjust_inventory(hub, "water", -1)
+            store.add_allocation(camp["name"], {
+                "resource": "water", "allocated_to": camp["name"],
+                "hub": hub["name"], "allocated_units": 1, "status": "Allocated"})
+
+        def rewrite(i):
+            allocate(i)
+            with open(path, "w", encoding="utf-8") as f:
+                # Camp histories are CampAllocations (model.py), lists once iterated
+                json.dump(store.data, f, indent=4, default=list)
+
+        def journal(i):
+            allocate(i)
+            store.storage.flush()
+
+        rewrite_ms = per_write(rewrite, args.repeat)
+        journal_ms = per_write(journal, args.repeat)
+        print(f"{history * args.camps:>10} {rewrite_ms:>12.3f} {journal_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
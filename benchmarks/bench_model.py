@@ -0,0 +1,84 @@
+"""
+Memory held by the hubs.json state as nested dicts from json.load versus
+the compact model (model.py): slotted hubs and camps, a hubs x resources
+inventory array and a columnar allocation table, and the form StateStore
+keeps (JSON-schema dicts with every camp's history in one allocation
+table, model.CampAllocations). Also checks the round trip back to the
+JSON schema and times a units-per-resource rollup both ways.
+
+    python benchmarks/bench_model.py --camps 1000 --history 100
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import AllocationTable, Model, compact_allocations
+from synthetic import make_dataset
+
+
+def traced(build):
+    """(result, bytes still allocated by build once it returns)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, memory
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=200)
+    parser.add_argument("--camps", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=100, help="allocations per camp")
+    args = parser.parse_args()
+
+    text = json.dumps(make_dataset(args.hubs, args.camps, history=args.history))
+    data, dict_bytes = traced(lambda: json.loads(text))
+    model, model_bytes = traced(lambda: Model.from_state(json.loads(text)))
+
+    def store_form():
+        state = json.loads(text)
+        compact_allocations(state["relief_camps"], AllocationTable())
+        return state
+
+    stored, store_bytes = traced(store_form)
+    assert stored == data, "the store's form changed the state"
+
+    start = time.perf_counter()
+    Model.from_state(data)
+    convert_s = time.perf_counter() - start
+    start = time.perf_counter()
+    assert model.to_state() == data, "round trip changed the state"
+    back_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    totals = {}
+    for camp in data["relief_camps"]:
+        for alloc in camp["allocations"]:
+            totals[alloc["resource"]] = totals.get(alloc["resource"], 0) + alloc["allocated_units"]
+    dict_query_ms = (time.perf_counter() - start) * 1e3
+    start = time.perf_counter()
+    by_resource = model.allocations.units_by("resource")
+    model_query_ms = (time.perf_counter() - start) * 1e3
+    assert {model.resources.name(i): int(u) for i, u in enumerate(by_resource)} == totals
+
+    n = len(model.allocations)
+    print(f"{n} allocations, {args.hubs} hubs, {args.camps} camps")
+    print(f"  nested dicts   {dict_bytes / 2 ** 20:8.1f} MB  {dict_bytes / n:7.0f} B/allocation  "
+          f"units by resource {dict_query_ms:8.2f} ms")
+    print(f"  compact model  {model_bytes / 2 ** 20:8.1f} MB  {model_bytes / n:7.0f} B/allocation  "
+          f"units by resource {model_query_ms:8.2f} ms")
+    print(f"  state store    {store_bytes / 2 ** 20:8.1f} MB  {store_bytes / n:7.0f} B/allocation")
+    print(f"  from_state {convert_s:.2f} s, to_state {back_s:.2f} s (round trip identical)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Latency of small requests while a large /allocate_batch runs, with the
+solve in the request thread against ?async=1 (solved in the process pool
+over a shared-memory inventory snapshot, then applied as a delta set).
+One thread keeps sending single-camp /allocate calls while the batch is
+in flight.
+
+    python benchmarks/bench_offload.py --hubs 200 --camps 2000 --batch 1500
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_dataset, make_requests, write_dataset
+
+
+def run(disastro, batch, small, offload):
+    client = disastro.app.test_client()
+    done = threading.Event()
+    latencies = []
+
+    def background():
+        i = 0
+        while not done.is_set():
+            req = small[i % len(small)]
+            start = time.perf_counter()
+            client.post("/allocate", json={"relief_camp": req["relief_camp"], "location": req["location"],
+                                           "requests": [{"resource": req["resource"], "units": req["units"]}]})
+            latencies.append(time.perf_counter() - start)
+            i += 1
+
+    worker = threading.Thread(target=background)
+    start = time.perf_counter()
+    worker.start()
+    attempts = 1
+    if offload:
+        job = client.post("/allocate_batch?async=1", json={"requests": batch}).get_json()
+        while job["status"] == "running":
+            time.sleep(0.005)
+            job = client.get(f"/jobs/{job['id']}").get_json()
+        attempts = job["attempts"]
+    else:
+        client.post("/allocate_batch", json={"requests": batch})
+    elapsed = time.perf_counter() - start
+    done.set()
+    worker.join()
+    return elapsed, attempts, np.array(latencies) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=200)
+    parser.add_argument("--camps", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1500, help="requests in the large batch")
+    args = parser.parse_args()
+
+    data = make_dataset(args.hubs, args.camps, stock=(0, 300))
+    batch = make_requests(data, args.batch, seed=1, max_units=40)
+    small = make_requests(data, 1000, seed=2, max_units=5)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "hubs.json")
+    os.environ["DISASTRO_DATA_PATH"] = path
+    write_dataset(path, data)
+    import app as disastro
+
+    # Start the pool before timing, as a long-running server would have
+    disastro.offload_pending([])
+    print(f"{args.hubs} hubs, {args.camps} camps, batch of {args.batch}, {os.cpu_count()} CPUs")
+    print(f"{'mode':>8} {'batch s':>8} {'plans':>6} {'small calls':>12} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    try:
+        for name, offload in (("inline", False), ("offload", True)):
+            disastro.store.close()
+            disastro.store.storage.journal.reset()
+            write_dataset(path, data)
+            disastro.init_store(path, "json")
+            elapsed, attempts, ms = run(disastro, batch, small, offload)
+            print(f"{name:>8} {elapsed:>8.2f} {attempts:>6} {len(ms):>12} {np.percentile(ms, 50):>8.2f} "
+                  f"{np.percentile(ms, 99):>8.2f} {ms.max():>8.2f}")
+    finally:
+        disastro.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
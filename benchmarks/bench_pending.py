@@ -0,0 +1,81 @@
+"""
+Inventory update that releases a handful of pending requests, with a long
+allocation history on record: the old sweep over every camp and every
+allocation against the per-resource pending queue.
+
+    python benchmarks/bench_pending.py --camps 500 --history 200 --pending 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import RESOURCES, make_dataset, write_dataset
+
+
+def legacy_sweep(hubs, relief_camps):
+    """The scan process_pending_allocations used to do on every update."""
+    for camp in relief_camps:
+        for alloc in list(camp.get("allocations", [])):
+            if alloc.get("status") == "Pending" and alloc.get("units_remaining", 0) > 0:
+                resource = alloc["resource"]
+                for hub in hubs:
+                    if hub["resources"].get(resource, 0) > 0:
+                        break
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=100)
+    parser.add_argument("--camps", type=int, default=500)
+    parser.add_argument("--history", type=int, default=200, help="allocations per camp")
+    parser.add_argument("--pending", type=int, default=50, help="pending requests per resource")
+    parser.add_argument("--updates", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    data = make_dataset(args.hubs, args.camps, history=args.history, stock=(0, 0))
+    for resource in RESOURCES:
+        for _ in range(args.pending):
+            camp = rng.choice(data["relief_camps"])
+            camp["allocations"].append({
+                "resource": resource, "allocated_to": camp["name"], "hub": "N/A",
+                "allocated_units": 0, "units_remaining": 10, "status": "Pending"})
+    path = os.path.join(tempfile.mkdtemp(), "hubs.json")
+    write_dataset(path, data)
+    os.environ["DISASTRO_DATA_PATH"] = path
+
+    import app as disastro
+
+    start = time.perf_counter()
+    for _ in range(args.updates):
+        legacy_sweep(data["hubs"], data["relief_camps"])
+    sweep_ms = (time.perf_counter() - start) / args.updates * 1e3
+
+    hub = disastro.store.hubs[0]
+    released = len(disastro.pending)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(args.updates):
+            resource = RESOURCES[i % len(RESOURCES)]
+            disastro.store.adjust_inventory(hub, resource, 20)
+            with disastro.store.lock:
+                disastro.process_pending_allocations([resource])
+    queue_ms = (time.perf_counter() - start) / args.updates * 1e3
+    released -= len(disastro.pending)
+    disastro.store.close()
+
+    total = sum(len(c["allocations"]) for c in data["relief_camps"])
+    print(f"{total} allocations on record, {args.pending * len(RESOURCES)} pending")
+    print(f"full sweep (scan only):  {sweep_ms:8.3f} ms/update")
+    print(f"pending queue:           {queue_ms:8.3f} ms/update  ({released} requests released)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Picking the next most critical camp after every delivery: re-scoring and
+re-sorting every camp in Python, one vectorized re-score plus argmax,
+and the incremental heap in CampPriorities. All three must pick the same
+camps.
+
+    python benchmarks/bench_priority.py --camps 1000,10000,100000 --deliveries 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import priority
+from priority import CampPriorities
+from synthetic import make_dataset
+
+NOW = 1_700_000_000.0
+
+
+def python_resort(camps, deliveries):
+    # Same arithmetic as CampPriorities (last delivery in hours), so exact ties break the same way
+    state = {camp["name"]: {"delivered": 0.0, "last": NOW / 3600} for camp in camps}
+    picks = []
+    start = time.perf_counter()
+    for t, units in deliveries:
+        def score(camp):
+            s = state[camp["name"]]
+            needs = sum(camp["needs"].values())
+            population = sum(priority.GROUP_WEIGHTS[g] * n for g, n in camp["population"].items())
+            unmet = min(max(1 - s["delivered"] / needs, 0), 1) if needs else 0
+            return (priority.static_scores(camp["severity"], population, unmet)
+                    - priority.TIME_WEIGHT * s["last"] + priority.TIME_WEIGHT * t / 3600)
+        best = sorted(camps, key=score, reverse=True)[0]["name"]
+        state[best]["delivered"] += units
+        state[best]["last"] = t / 3600
+        picks.append(best)
+    return picks, time.perf_counter() - start
+
+
+def vectorized(camps, deliveries):
+    index = CampPriorities(camps, now=NOW)
+    picks = []
+    start = time.perf_counter()
+    for t, units in deliveries:
+        scores = (priority.static_scores(index.severity, index.population, index._unmet())
+                  - priority.TIME_WEIGHT * index.last + priority.TIME_WEIGHT * t / 3600)
+        best = int(np.argmax(scores))
+        index.delivered[best] += units
+        index.last[best] = t / 3600
+        picks.append(index.names[best])
+    return picks, time.perf_counter() - start
+
+
+def heap(camps, deliveries):
+    index = CampPriorities(camps, now=NOW)
+    picks = []
+    start = time.perf_counter()
+    for t, units in deliveries:
+        best = index.top(1, t)[0][0]
+        index.delivered_to(best, units, t)
+        picks.append(best)
+    return picks, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--camps", default="1000,10000,100000")
+    parser.add_argument("--deliveries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # One delivery every few minutes; units as a fraction of a camp's needs
+    deliveries, t = [], NOW
+    for _ in range(args.deliveries):
+        t += rng.uniform(60, 600)
+        deliveries.append((t, rng.randint(50, 400)))
+
+    print(f"{'camps':>8} {'python re-sort':>15} {'vectorized':>12} {'heap':>10}   (per pick, after setup)")
+    for n in (int(s) for s in args.camps.split(",")):
+        camps = make_dataset(0, n)["relief_camps"]
+        row, picks = [], []
+        for name, fn in (("python", python_resort), ("vectorized", vectorized), ("heap", heap)):
+            # The Python re-sort is O(N log N) per pick; time a slice of it at large N
+            count = min(args.deliveries, max(20, 2_000_000 // n)) if name == "python" else args.deliveries
+            chosen, seconds = fn(camps, deliveries[:count])
+            picks.append(chosen)
+            row.append(seconds / count)
+        shortest = min(len(p) for p in picks)
+        assert all(p[:shortest] == picks[0][:shortest] for p in picks), "strategies picked different camps"
+        print(f"{n:>8} {row[0] * 1e3:>12.3f} ms {row[1] * 1e3:>9.3f} ms {row[2] * 1e6:>7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Restocking against a pending backlog: every hub starts empty, --backlog
+requests go pending, then --restocks inventory updates add stock at
+random hubs, --per-update hubs at a time (/update_inventory/bulk when
+more than one). With one hub restocked at a time it is the only stocked
+hub while requests wait, so every mode ships from it. --staging of the
+hubs are staging hubs (ports, airfields) whose last-mile deliveries only
+leave after --dispatch-hours. Compared:
+
+    off          the default: process_pending_allocations ships from
+                 whichever hubs hold stock, in hub-list order
+    incremental  DISASTRO_REBALANCE=1: waiting requests are served from
+                 the stocked hubs that deliver soonest, stock at staging
+                 hubs is moved on where that arrives sooner; only the
+                 restocked resource is solved
+    full         every resource with pending requests is re-solved on
+                 every restock
+
+Reports update latency, km from the releasing hub to the camp per unit
+released, hours until the released units arrive (the releasing hub's
+dispatch hours plus the drive, and the transfer drive for units that
+were moved first), and hub-to-hub km per unit moved.
+
+    python benchmarks/bench_rebalance.py --hubs 100 --camps 1000 --backlog 3000 --restocks 2000 --per-update 10
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import RESOURCES, make_dataset, make_requests, write_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=100)
+    parser.add_argument("--camps", type=int, default=1000)
+    parser.add_argument("--backlog", type=int, default=3000, help="requests left pending before restocking")
+    parser.add_argument("--restocks", type=int, default=2000)
+    parser.add_argument("--per-update", type=int, default=10, help="hubs restocked by each update")
+    parser.add_argument("--staging", type=int, default=10, help="hubs that only dispatch after --dispatch-hours")
+    parser.add_argument("--dispatch-hours", type=float, default=12)
+    args = parser.parse_args()
+
+    data = make_dataset(args.hubs, args.camps, stock=(0, 0))
+    for hub in data["hubs"][:args.staging]:
+        hub["dispatch_hours"] = args.dispatch_hours
+    backlog = make_requests(data, args.backlog, seed=1, max_units=40)
+    rng = random.Random(2)
+    restocks = [{"hub_name": rng.choice(data["hubs"])["name"], "update_type": "add",
+                 "resources": {rng.choice(RESOURCES): rng.randint(10, 80)}} for _ in range(args.restocks)]
+    updates = [restocks[k:k + args.per_update] for k in range(0, len(restocks), args.per_update)]
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "hubs.json")
+    os.environ["DISASTRO_DATA_PATH"] = path
+    os.environ["DISASTRO_SESSION_LIMIT"] = str(10 * (args.backlog + args.restocks) + 10000)
+    write_dataset(path, data)
+    import app as disastro
+
+    print(f"{args.hubs} hubs, {args.camps} camps, {args.backlog} pending requests, "
+          f"{args.restocks} restocks, {args.per_update} per update, {args.staging} staging hubs")
+    print(f"{'mode':>12} {'p50 ms':>7} {'p99 ms':>7} {'released':>9} {'km/unit':>8} {'h/unit':>7} {'moved':>7} "
+          f"{'hub km/unit':>12}")
+    try:
+        for mode in ("off", "incremental", "full"):
+            disastro.store.close()
+            disastro.store.storage.journal.reset()
+            write_dataset(path, data)
+            disastro.init_store(path, "json")
+            disastro.REBALANCE = mode != "off"
+            disastro.allocate_round_robin({"requests": backlog})
+            first = disastro.allocations_data.total
+
+            latencies = []
+            for update in updates:
+                start = time.perf_counter()
+                if mode == "full":
+                    for resource in disastro.pending.resources():
+                        disastro.rebalancer.touch(resource)
+                if len(update) == 1:
+                    disastro.update_hub_inventory(update[0])
+                else:
+                    disastro.bulk_update_inventory((k, payload) for k, payload in enumerate(update))
+                latencies.append(time.perf_counter() - start)
+
+            items = disastro.allocations_data.items()
+            released = [alloc for alloc in items[len(items) - (disastro.allocations_data.total - first):]
+                        if isinstance(alloc.get("allocated_units"), int)]
+            units = sum(alloc["allocated_units"] for alloc in released)
+            km = sum(alloc["allocated_units"] * disastro.distances.get(alloc["allocated_to"], alloc["hub"])
+                     for alloc in released)
+            moved = disastro.rebalancer.stats["units_moved"]
+            # Over the transfers still in the log
+            logged = disastro.rebalancer.transfers
+            hub_km = sum(t["units"] * t["distance_km"] for t in logged) / max(sum(t["units"] for t in logged), 1)
+            hours = sum(alloc["allocated_units"] * disastro.rebalancer.hours(
+                alloc["hub"], disastro.distances.get(alloc["allocated_to"], alloc["hub"])) for alloc in released)
+            hours += sum(t["units"] * t["distance_km"] for t in logged) / disastro.rebalancer.speed_kmh
+            ms = np.array(latencies) * 1e3
+            print(f"{mode:>12} {np.percentile(ms, 50):>7.3f} {np.percentile(ms, 99):>7.3f} {units:>9} "
+                  f"{km / max(units, 1):>8.2f} {hours / max(units, 1):>7.2f} {moved:>7} {hub_km:>12.2f}")
+    finally:
+        disastro.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
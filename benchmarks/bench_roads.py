@@ -0,0 +1,81 @@
+"""
+Road distances on a synthetic street grid: point-to-point queries by
+Dijkstra (stopping at the target) against A* with landmark (ALT) bounds,
+the LRU-cached repeat, a hubs x camps matrix from one tree per hub, and
+what blocking a road costs the caches.
+
+    python benchmarks/bench_roads.py --rows 200 --cols 200 --queries 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roads import RoadNetwork, grid_graph
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--cols", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--landmarks", type=int, default=8)
+    parser.add_argument("--hubs", type=int, default=20)
+    parser.add_argument("--camps", type=int, default=500)
+    args = parser.parse_args()
+
+    graph = grid_graph(args.rows, args.cols)
+    start = time.perf_counter()
+    plain = RoadNetwork(graph["nodes"], graph["edges"], landmarks=0)
+    load_plain = time.perf_counter() - start
+    start = time.perf_counter()
+    alt = RoadNetwork(graph["nodes"], graph["edges"], landmarks=args.landmarks)
+    load_alt = time.perf_counter() - start
+    print(f"{len(alt.ids)} nodes, {len(alt._heads)} arcs; load {load_plain:.2f} s, "
+          f"with {args.landmarks} landmarks {load_alt:.2f} s")
+
+    rng = random.Random(0)
+    n = len(alt.ids)
+    pairs = [(rng.randrange(n), rng.randrange(n)) for _ in range(args.queries)]
+    rows = []
+    for name, network in (("dijkstra (no landmarks)", plain), (f"A* + ALT ({args.landmarks})", alt)):
+        start = time.perf_counter()
+        costs = [network.node_distance(a, b) for a, b in pairs]
+        rows.append((name, (time.perf_counter() - start) / len(pairs), costs))
+    start = time.perf_counter()
+    for a, b in pairs:
+        alt.node_distance(a, b)
+    rows.append(("LRU cache hit", (time.perf_counter() - start) / len(pairs), costs))
+    assert all(abs(x - y) < 1e-9 for x, y in zip(rows[0][2], rows[1][2])), "A* disagrees with Dijkstra"
+    for name, seconds, _ in rows:
+        print(f"  {name:<26} {seconds * 1e3:9.3f} ms/query")
+
+    lat = [alt.coords[:, 0].min(), alt.coords[:, 0].max()]
+    lon = [alt.coords[:, 1].min(), alt.coords[:, 1].max()]
+    point = lambda: (rng.uniform(*lat), rng.uniform(*lon))
+    hubs = [point() for _ in range(args.hubs)]
+    camps = [point() for _ in range(args.camps)]
+    start = time.perf_counter()
+    alt.matrix(hubs, camps)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    alt.matrix(hubs, camps)
+    warm = time.perf_counter() - start
+    print(f"  {args.hubs}x{args.camps} matrix: {cold * 1e3:.1f} ms cold, {warm * 1e3:.2f} ms from cached trees")
+
+    # Block one road on a cached path: only the entries using it are dropped
+    cached = len(alt._pairs)
+    arc = next(arc for entry in alt._pairs.values() for arc in entry[1])
+    u, v = alt.ids[alt._tails[arc]], alt.ids[alt._heads[arc]]
+    start = time.perf_counter()
+    alt.block(u, v)
+    block_ms = (time.perf_counter() - start) * 1e3
+    print(f"  block one road: {block_ms:.3f} ms, {cached - len(alt._pairs)} of {cached} cached pairs "
+          f"and {args.hubs - len(alt._trees)} of {args.hubs} trees dropped")
+
+
+if __name__ == "__main__":
+    main()
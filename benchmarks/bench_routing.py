@@ -0,0 +1,57 @@
+"""
+Delivery runs from one hub to N camps: total distance of the
+nearest-neighbour routes against the improved ones (relocate, 2-opt,
+Or-opt) within the time budget, against one out-and-back trip per camp
+(what sorting hubs by straight-line distance amounts to), and the cost of
+replanning the same stops (nearest neighbour only) with the distance
+matrix cached.
+
+    python benchmarks/bench_routing.py --camps 10,100,1000,5000 --budget 2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo import calculate_distance
+from routing import MatrixCache, plan_routes
+from synthetic import make_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--camps", default="10,100,1000,5000")
+    parser.add_argument("--capacity", type=int, default=1000)
+    parser.add_argument("--budget", type=float, default=2.0, help="seconds of improvement per plan")
+    args = parser.parse_args()
+
+    print(f"{'camps':>6} {'vehicles':>9} {'one trip each km':>17} {'nearest nbr km':>15} "
+          f"{'improved km':>12} {'gain':>6} {'plan ms':>9} {'replan ms':>10}")
+    for n in (int(s) for s in args.camps.split(",")):
+        camps = make_dataset(0, n, seed=n)["relief_camps"]
+        rng = random.Random(n)
+        stops = [(camp["location"], rng.randint(10, 300)) for camp in camps]
+        depot = (12.9716, 77.5946)
+
+        cache = MatrixCache()
+        routes, stats = plan_routes(depot, stops, args.capacity, args.budget, cache)
+        start = time.perf_counter()
+        plan_routes(depot, stops, args.capacity, 0.0, cache)
+        cached_ms = (time.perf_counter() - start) * 1e3
+        trips = sum(2 * calculate_distance(depot, location) * -(-units // args.capacity)
+                    for location, units in stops)
+
+        served = sum(load for route in routes for _, load in route["stops"])
+        assert served == sum(units for _, units in stops), "units lost"
+        assert all(route["load"] <= args.capacity for route in routes), "vehicle over capacity"
+        gain = 1 - stats["total_distance_km"] / stats["nearest_neighbour_km"]
+        print(f"{n:>6} {stats['vehicles']:>9} {trips:>17.0f} {stats['nearest_neighbour_km']:>15.0f} "
+              f"{stats['total_distance_km']:>12.0f} {gain:>6.1%} {stats['solve_ms']:>9.0f} {cached_ms:>10.1f}"
+              + ("  (budget hit)" if stats["timed_out"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Serialization of a large state file: the old indented json.dump against
+the compact encoding through serialize.py (orjson when installed), for
+loading hubs.json, writing a snapshot, encoding the /hubs.json body and
+the session list, and the time to the first byte of a streamed list.
+
+    python benchmarks/bench_serialize.py --size-mb 50
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serialize
+from storage import write_snapshot
+from synthetic import make_dataset
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def first_chunk(parts):
+    chunks = serialize.iter_array(parts)
+    next(chunks)  # "["
+    return next(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=float, default=50.0, help="size of the indented hubs.json")
+    parser.add_argument("--hubs", type=int, default=200)
+    parser.add_argument("--camps", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Scale the allocation history so the indented file comes out near --size-mb
+    sample = make_dataset(args.hubs, args.camps, history=10)
+    per_entry = (len(json.dumps(sample, indent=4)) - len(json.dumps(make_dataset(args.hubs, args.camps), indent=4))) \
+        / (10 * args.camps)
+    history = max(int(args.size_mb * 1e6 / per_entry / args.camps), 1)
+    data = make_dataset(args.hubs, args.camps, history=history)
+    allocations = [alloc for camp in data["relief_camps"] for alloc in camp["allocations"]]
+
+    directory = tempfile.mkdtemp()
+    old_path, new_path = os.path.join(directory, "old.json"), os.path.join(directory, "new.json")
+    print(f"{args.hubs} hubs, {args.camps} camps, {len(allocations)} allocations; encoder: {serialize.BACKEND}")
+
+    rows = []
+
+    def row(name, old, new, repeat=args.repeat):
+        old_s, old_result = best(old, repeat)
+        new_s, new_result = best(new, repeat)
+        rows.append((name, old_s, new_s))
+        return old_result, new_result
+
+    row("save snapshot (indent=4 -> compact)",
+        lambda: write_snapshot(old_path, json.dumps(data, indent=4)),
+        lambda: write_snapshot(new_path, serialize.dumps(data)), repeat=1)
+    old_size, new_size = os.path.getsize(old_path), os.path.getsize(new_path)
+
+    def old_load():
+        with open(old_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    old, new = row("load hubs.json", old_load, lambda: serialize.load(new_path))
+    assert old == new, "round trip differs"
+    row("/hubs.json body (sorted keys)",
+        lambda: json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8"),
+        lambda: serialize.dumps(data, sort_keys=True))
+    row("session list, one body",
+        lambda: json.dumps(allocations, sort_keys=True, separators=(",", ":")),
+        lambda: serialize.dumps_str(allocations, sort_keys=True))
+
+    parts = [serialize.dumps_str(alloc, sort_keys=True) for alloc in allocations]
+    row("pre-serialized list: join vs first chunk",
+        lambda: "[" + ",".join(parts) + "]",
+        lambda: first_chunk(parts))
+    streamed, _ = best(lambda: sum(len(chunk) for chunk in serialize.iter_array(parts)), args.repeat)
+
+    print(f"file size: {old_size / 1e6:.1f} MB indented, {new_size / 1e6:.1f} MB compact")
+    print(f"{'':<42} {'old ms':>9} {'new ms':>9} {'speedup':>8}")
+    for name, old_s, new_s in rows:
+        print(f"{name:<42} {old_s * 1e3:>9.1f} {new_s * 1e3:>9.1f} {old_s / new_s:>7.1f}x")
+    print(f"whole list streamed in {streamed * 1e3:.1f} ms, never more than one "
+          f"{serialize.CHUNK_SIZE // 1024} KiB chunk at a time")
+
+
+if __name__ == "__main__":
+    main()
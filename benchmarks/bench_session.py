@@ -0,0 +1,88 @@
+"""
+Session allocation history over a long incident: the old unbounded list
+(serialized in full on every /session_allocations) against the bounded
+ring with spill-to-disk and rollup counters.
+
+    python benchmarks/bench_session.py --allocations 200000 --limit 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session import SessionAllocations
+from synthetic import RESOURCES
+
+
+def make_allocations(n, camps=500, seed=0):
+    rng = random.Random(seed)
+    return [{
+        "resource": rng.choice(RESOURCES),
+        "allocated_to": f"Camp {rng.randrange(camps)}",
+        "hub": f"Hub {rng.randrange(100)}",
+        "allocated_units": rng.randint(1, 100),
+        "status": "Allocated",
+    } for _ in range(n)]
+
+
+def measure(build):
+    """Build time untraced, then memory from a second, traced build."""
+    start = time.perf_counter()
+    build()
+    build_s = time.perf_counter() - start
+    tracemalloc.start()
+    holder, serve = build()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    size = len(serve())
+    serve_ms = (time.perf_counter() - start) * 1e3
+    return build_s, memory, serve_ms, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--allocations", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=5)
+    args = parser.parse_args()
+
+    spill = os.path.join(tempfile.mkdtemp(), "hubs.session.ndjson")
+    dumps = lambda obj: json.dumps(obj, separators=(",", ":"), sort_keys=True)
+
+    def unbounded():
+        data = []
+        for alloc in make_allocations(args.allocations):
+            data.append(alloc)
+        return data, lambda: dumps(data)
+
+    def ring():
+        if os.path.exists(spill):
+            os.remove(spill)
+        session = SessionAllocations(dumps, capacity=args.limit, spill_path=spill)
+        allocations = make_allocations(args.allocations)
+        for k in range(0, len(allocations), args.batch):
+            session.extend(allocations[k:k + args.batch])
+        session.flush()
+        # The ring keeps rollups for everything; time a per-camp lookup too
+        start = time.perf_counter()
+        for i in range(1000):
+            session.rollup(camp=f"Camp {i % 500}")
+        ring.rollup_us = (time.perf_counter() - start) / 1000 * 1e6
+        return session, session.body
+
+    print(f"{'history':>16} {'build s':>8} {'memory MB':>10} {'serve ms':>9} {'body KB':>9}")
+    for name, build in (("unbounded list", unbounded), (f"ring of {args.limit}", ring)):
+        build_s, memory, serve_ms, size = measure(build)
+        print(f"{name:>16} {build_s:>8.2f} {memory / 2 ** 20:>10.1f} {serve_ms:>9.2f} {size / 1024:>9.1f}")
+    print(f"rollup lookup: {ring.rollup_us:.2f} us; spilled {os.path.getsize(spill) / 2 ** 20:.1f} MB to disk")
+
+
+if __name__ == "__main__":
+    main()
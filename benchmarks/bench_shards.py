@@ -0,0 +1,78 @@
+"""
+Throughput of the sharded deployment (shards.py) with 1..N worker
+processes: client threads send /allocate and /allocate_hub calls straight
+to the coordinator, which routes them over pipes to the shards. Also
+reports the share of calls their home shard left short and the units
+other shards filled.
+
+    python benchmarks/bench_shards.py --workers 1,2,4,8 --hubs 200 --camps 2000 --calls 4000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shards import Coordinator, write_shards
+from synthetic import make_dataset, make_requests
+
+
+def run(coordinator, requests, threads):
+    def client(chunk):
+        for i, req in enumerate(chunk):
+            if i % 2:
+                coordinator.allocate({"relief_camp": req["relief_camp"], "location": req["location"],
+                                      "requests": [{"resource": req["resource"], "units": req["units"]}]})
+            else:
+                coordinator.allocate_hub({"requests": [req]})
+
+    workers = [threading.Thread(target=client, args=(requests[i::threads],)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--hubs", type=int, default=200)
+    parser.add_argument("--camps", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=4000)
+    parser.add_argument("--threads", type=int, default=16, help="client threads")
+    parser.add_argument("--precision", type=int, default=4)
+    parser.add_argument("--stock", type=int, default=2000, help="most units of a resource per hub")
+    args = parser.parse_args()
+
+    data = make_dataset(args.hubs, args.camps, stock=(0, args.stock))
+    requests = make_requests(data, args.calls, max_units=100)
+    print(f"{args.hubs} hubs, {args.camps} camps, {args.calls} calls from {args.threads} threads, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'calls/s':>9} {'speedup':>8} {'short':>8} {'spilled units':>14} {'hubs per shard':>16}")
+    baseline = None
+    for n in (int(s) for s in args.workers.split(",")):
+        directory = tempfile.mkdtemp()
+        try:
+            write_shards(data, n, directory, args.precision)
+            coordinator = Coordinator(directory).start()
+            try:
+                elapsed = run(coordinator, requests, args.threads)
+                summary = coordinator.summary()
+            finally:
+                coordinator.stop()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        rate = args.calls / elapsed
+        baseline = baseline or rate
+        print(f"{n:>8} {rate:>9.0f} {rate / baseline:>7.2f}x {summary['short_requests'] / args.calls:>8.1%} "
+              f"{summary['spilled_units']:>14} {min(summary['hubs']):>7}-{max(summary['hubs'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Nearest-hub-with-stock lookups: the old filter-and-sort over every hub
+against the grid index, from 10 to 100k hubs.
+
+    python benchmarks/bench_spatial.py --sizes 10,100,1000,10000,100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_dataset
+from geo import calculate_distance
+from spatial import HubIndex
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3, help="hubs taken per lookup")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'hubs':>8} {'build ms':>10} {'sort ms/q':>10} {'index ms/q':>11} {'speedup':>8}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        data = make_dataset(n, 1, stock=(0, 3))
+        hubs = {hub["name"]: hub for hub in data["hubs"]}
+        queries = [([12.9716 + rng.uniform(-2, 2), 77.5946 + rng.uniform(-2, 2)], rng.choice(["water", "food"]))
+                   for _ in range(args.queries)]
+
+        def scan(q):
+            location, resource = q
+            available = [hub for hub in hubs.values() if hub["resources"].get(resource, 0) > 0]
+            available.sort(key=lambda hub: calculate_distance(location, hub["location"]))
+            return available[:args.k]
+
+        start = time.perf_counter()
+        index = HubIndex.from_hubs(data["hubs"])
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        def lookup(q):
+            location, resource = q
+            found = []
+            for _, name in index.nearest(location, accept=lambda name: hubs[name]["resources"].get(resource, 0) > 0):
+                found.append(name)
+                if len(found) == args.k:
+                    break
+            return found
+
+        scan_queries = queries[:max(5, args.queries * 1000 // max(n, 1000))]
+        scan_ms = timed(scan, scan_queries)
+        index_ms = timed(lookup, queries)
+        print(f"{n:>8} {build_ms:>10.1f} {scan_ms:>10.3f} {index_ms:>11.3f} {scan_ms / index_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
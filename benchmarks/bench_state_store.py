@@ -0,0 +1,92 @@
+"""
+Requests/sec through the Flask handlers with the in-memory state store,
+compared against the old behaviour of re-reading and rewriting hubs.json
+around every request.
+
+    python benchmarks/bench_state_store.py --hubs 200 --camps 500 --requests 500
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_dataset, make_requests, write_dataset
+
+
+def run(client, reqs):
+    start = time.perf_counter()
+    for i, req in enumerate(reqs):
+        if i % 5 == 4:
+            client.post("/update_inventory", json={
+                "hub_name": "Hub 0", "resources": {req["resource"]: 25}, "update_type": "add"})
+        elif i % 2:
+            client.post("/allocate", json={
+                "relief_camp": req["relief_camp"], "location": req["location"],
+                "requests": [{"resource": req["resource"], "units": req["units"]}]})
+        else:
+            client.post("/allocate_hub", json={"requests": [req]})
+    return len(reqs) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=200)
+    parser.add_argument("--camps", type=int, default=500)
+    parser.add_argument("--history", type=int, default=20, help="existing allocations per camp")
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "data", "hubs.json")
+    dataset = make_dataset(args.hubs, args.camps, history=args.history)
+    write_dataset(path, dataset)
+    os.environ["DISASTRO_DATA_PATH"] = path
+
+    import app as disastro
+    import state
+    from state import StateStore
+    from storage import write_snapshot
+
+    legacy = {"on": False}
+
+    @disastro.app.before_request
+    def legacy_load():
+        if legacy["on"]:
+            # Load/save per request kept the histories as plain lists
+            compact, state.compact_allocations = state.compact_allocations, lambda relief_camps, table: None
+            try:
+                disastro.store = StateStore(path)
+            finally:
+                state.compact_allocations = compact
+
+    @disastro.app.after_request
+    def legacy_save(response):
+        if legacy["on"]:
+            write_snapshot(path, json.dumps(disastro.store.data, indent=4))
+        return response
+
+    reqs = make_requests(dataset, args.requests)
+    client = disastro.app.test_client()
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy["on"] = True
+        before = run(client, reqs)
+        write_dataset(path, dataset)
+        legacy["on"] = False
+        disastro.store = None
+        disastro.init_store(path)
+        after = run(client, reqs)
+        disastro.store.close()
+
+    print(f"hubs={args.hubs} camps={args.camps} requests={args.requests}")
+    print(f"load/save per request: {before:10.1f} req/s")
+    print(f"in-memory state store: {after:10.1f} req/s  ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
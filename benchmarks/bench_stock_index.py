@@ -0,0 +1,59 @@
+"""
+A request larger than total stock, so the round-robin laps every hub with
+the resource: the old loop over every hub against StockIndex.cycle, which
+only visits the stocked ones.
+
+    python benchmarks/bench_stock_index.py --hubs 1000,10000,100000 --stocked 0.01
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory import StockIndex
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", default="1000,10000,100000")
+    parser.add_argument("--stocked", type=float, default=0.01, help="fraction of hubs holding the resource")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'hubs':>8} {'scan ms/req':>12} {'index ms/req':>13} {'speedup':>8}")
+    for n in (int(s) for s in args.hubs.split(",")):
+        rng = random.Random(0)
+        hubs = [{"name": f"Hub {i}", "location": [12.97, 77.59],
+                 "resources": {"water": 10 if rng.random() < args.stocked else 0}} for i in range(n)]
+        index = StockIndex.from_hubs(hubs)
+
+        def scan():
+            hub_index = 0
+            for _ in range(args.requests):
+                visited = 0
+                for _ in range(len(hubs)):
+                    hub = hubs[hub_index]
+                    hub_index = (hub_index + 1) % len(hubs)
+                    if hub["resources"].get("water", 0) > 0:
+                        visited += 1
+
+        def indexed():
+            hub_index = 0
+            for _ in range(args.requests):
+                visited = 0
+                for position in index.cycle("water", hub_index):
+                    visited += 1
+
+        timings = []
+        for fn in (scan, indexed):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) / args.requests * 1e3)
+        print(f"{n:>8} {timings[0]:>12.4f} {timings[1]:>13.4f} {timings[0] / timings[1]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
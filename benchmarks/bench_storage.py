@@ -0,0 +1,82 @@
+"""
+The two storage backends side by side as the allocation history grows:
+migration into SQLite, startup load, the cost of persisting one allocation
+(inventory change plus allocation record), compaction, and finding the
+pending allocations for one resource on disk.
+
+    python benchmarks/bench_storage.py --camps 200 --steps 0,50,200,800
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_dataset, write_dataset
+from state import StateStore
+from storage import migrate, open_storage
+
+
+def timed(fn, repeat=1):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def pending_from_json(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [alloc for camp in data["relief_camps"] for alloc in camp.get("allocations", [])
+            if alloc.get("resource") == "water" and alloc.get("status") == "Pending"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=50)
+    parser.add_argument("--camps", type=int, default=200)
+    parser.add_argument("--steps", default="0,50,200,800", help="allocations per camp already on record")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'history':>10} {'backend':>8} {'load ms':>10} {'write ms':>10} {'compact ms':>11} {'pending ms':>11}")
+    for history in (int(s) for s in args.steps.split(",")):
+        tmp = tempfile.mkdtemp()
+        path = os.path.join(tmp, "hubs.json")
+        data = make_dataset(args.hubs, args.camps, history=history)
+        for camp in data["relief_camps"][::10]:
+            camp["allocations"].append({"resource": "water", "allocated_to": camp["name"], "hub": "N/A",
+                                        "allocated_units": 0, "units_remaining": 5, "status": "Pending"})
+        write_dataset(path, data)
+        migrate_ms = timed(lambda i: migrate(path, os.path.join(tmp, "hubs.db")))
+
+        for kind in ("json", "sqlite"):
+            load_ms = timed(lambda i: StateStore(path, storage=open_storage(kind, path)).storage.close())
+            store = StateStore(path, compact_every=10 ** 9, storage=open_storage(kind, path))
+            hub, camp = store.hubs[0], store.relief_camps[0]
+
+            def persist(i):
+                store.adjust_inventory(hub, "water", -1)
+                store.add_allocation(camp["name"], {
+                    "resource": "water", "allocated_to": camp["name"],
+                    "hub": hub["name"], "allocated_units": 1, "status": "Allocated"})
+                store.flush()
+
+            write_ms = timed(persist, args.repeat)
+            compact_ms = timed(lambda i: store.compact())
+            if kind == "json":
+                pending_ms = timed(lambda i: pending_from_json(path))
+            else:
+                query = "SELECT record FROM allocations WHERE resource = 'water' AND status = 'Pending'"
+                pending_ms = timed(lambda i: store.storage.conn.execute(query).fetchall())
+            store.close()
+            print(f"{history * args.camps:>10} {kind:>8} {load_ms:>10.1f} {write_ms:>10.3f} "
+                  f"{compact_ms:>11.1f} {pending_ms:>11.3f}")
+        print(f"{'':>10} {'migrate':>8} {migrate_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Replay a seeded incident scenario (synthetic.make_scenario) against the
+allocation core and report throughput, latency percentiles per endpoint,
+allocations per second and fill rate. Each mode starts from a fresh copy
+of the same dataset:
+
+    inprocess   the handler functions (allocate_round_robin, allocate_camp,
+                update_hub_inventory, which runs process_pending_allocations)
+    client      the same calls through the Flask test client (routing, JSON)
+
+Results can be saved as JSON and compared with an earlier run; with
+--compare the exit status is 1 when throughput falls or p99 latency rises
+by more than --tolerance.
+
+    python benchmarks/simulate.py --hubs 50 --camps 500 --duration 600 --out results.json
+    python benchmarks/simulate.py --hubs 50 --camps 500 --duration 600 --compare results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import SCENARIO_RATES, make_scenario, write_dataset
+
+HANDLERS = {
+    "/allocate_hub": "allocate_round_robin",
+    "/allocate": "allocate_camp",
+    "/update_inventory": "update_hub_inventory",
+}
+
+
+def requested_units(path, payload):
+    if path == "/update_inventory":
+        return 0
+    return sum(req["units"] for req in payload["requests"])
+
+
+def shipped_units(allocations):
+    """Units actually sent from a hub in a list of allocation records."""
+    return sum(alloc["allocated_units"] for alloc in allocations
+               if alloc.get("hub") not in ("N/A", "Multiple") and isinstance(alloc.get("allocated_units"), int))
+
+
+def history(store):
+    records = [alloc for camp in store.relief_camps for alloc in camp.get("allocations", [])]
+    return len(records), shipped_units(records)
+
+
+def replay(disastro, calls, mode):
+    client = disastro.app.test_client()
+    latencies = {path: [] for path in HANDLERS}
+    errors = 0
+    requested = immediate = 0
+    before_records, before_units = history(disastro.store)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _, path, payload in calls:
+            payload = json.loads(json.dumps(payload))
+            t0 = time.perf_counter()
+            if mode == "client":
+                response = client.post(path, json=payload)
+                body, status = response.get_json(), response.status_code
+            else:
+                body, status = getattr(disastro, HANDLERS[path])(payload)
+            latencies[path].append(time.perf_counter() - t0)
+            if status != 200:
+                errors += 1
+                continue
+            requested += requested_units(path, payload)
+            if path != "/update_inventory":
+                immediate += shipped_units(body)
+    elapsed = time.perf_counter() - start
+
+    after_records, after_units = history(disastro.store)
+    endpoints = {}
+    for path, samples in latencies.items():
+        if not samples:
+            continue
+        ms = np.array(samples) * 1e3
+        endpoints[path] = {"calls": len(samples), "mean_ms": round(float(ms.mean()), 4),
+                           **{f"p{q}_ms": round(float(np.percentile(ms, q)), 4) for q in (50, 90, 99)},
+                           "max_ms": round(float(ms.max()), 4)}
+    all_ms = np.concatenate([np.array(samples) for samples in latencies.values() if samples]) * 1e3
+    shipped = after_units - before_units
+    return {
+        "elapsed_s": round(elapsed, 4),
+        "calls": len(calls),
+        "errors": errors,
+        "calls_per_s": round(len(calls) / elapsed, 2),
+        "allocations_per_s": round((after_records - before_records) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(all_ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(all_ms, 99)), 4),
+        "units_requested": requested,
+        "units_filled_immediately": immediate,
+        "units_filled_total": shipped,
+        "fill_rate_immediate": round(immediate / requested, 4) if requested else None,
+        # Includes pending requests released by later restocks
+        "fill_rate_total": round(shipped / requested, 4) if requested else None,
+        "pending_open": len(disastro.pending),
+        "endpoints": endpoints,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print changes against `baseline`; returns the regressions found."""
+    regressions = []
+    for mode, now in results["modes"].items():
+        then = baseline.get("modes", {}).get(mode)
+        if then is None:
+            continue
+        print(f"{mode} vs baseline:")
+        for key, higher_is_better in (("calls_per_s", True), ("allocations_per_s", True),
+                                      ("p50_ms", False), ("p99_ms", False), ("fill_rate_total", True)):
+            old, new = then.get(key), now.get(key)
+            if not old or new is None:
+                continue
+            change = new / old - 1
+            worse = -change if higher_is_better else change
+            flag = ""
+            if key in ("calls_per_s", "p99_ms") and worse > tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{mode} {key}")
+            print(f"  {key:<18} {old:>12} -> {new:>12}  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=50)
+    parser.add_argument("--camps", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=600.0, help="scenario seconds")
+    parser.add_argument("--rates", default=",".join(f"{p}={r}" for p, r in SCENARIO_RATES.items()),
+                        help="calls per scenario second, per endpoint")
+    parser.add_argument("--mix", default="", help="resource weights, e.g. water=3,food=2,medicine=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", nargs="+", choices=["inprocess", "client"], default=["inprocess", "client"])
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", help="results JSON of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rates = {path: float(rate) for path, rate in (item.split("=") for item in args.rates.split(","))}
+    mix = {r: float(w) for r, w in (item.split("=") for item in args.mix.split(","))} if args.mix else None
+    scenario = make_scenario(args.hubs, args.camps, args.seed, args.duration, rates, mix)
+
+    path = os.path.join(tempfile.mkdtemp(), "hubs.json")
+    os.environ["DISASTRO_DATA_PATH"] = path
+    write_dataset(path, scenario["dataset"])
+    import app as disastro
+
+    results = {
+        "scenario": {"hubs": args.hubs, "camps": args.camps, "duration": args.duration, "rates": rates,
+                     "mix": mix, "seed": args.seed, "calls": len(scenario["calls"])},
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "modes": {},
+    }
+    for mode in args.modes:
+        write_dataset(path, scenario["dataset"])
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + ".journal")
+        disastro.init_store(path, "json")
+        results["modes"][mode] = replay(disastro, scenario["calls"], mode)
+        disastro.store.close()
+
+    print(f"{len(scenario['calls'])} calls, {args.hubs} hubs, {args.camps} camps, seed {args.seed}")
+    print(f"{'mode':>10} {'calls/s':>9} {'allocs/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'fill now':>9} {'fill end':>9} {'pending':>8} {'errors':>7}")
+    for mode, r in results["modes"].items():
+        print(f"{mode:>10} {r['calls_per_s']:>9.0f} {r['allocations_per_s']:>9.0f} {r['p50_ms']:>8.3f} "
+              f"{r['p99_ms']:>8.3f} {r['fill_rate_immediate']:>9.1%} {r['fill_rate_total']:>9.1%} "
+              f"{r['pending_open']:>8} {r['errors']:>7}")
+        for endpoint, stats in r["endpoints"].items():
+            print(f"{'':>10} {endpoint:<18} {stats['calls']:>6} calls  p50 {stats['p50_ms']:.3f}  "
+                  f"p90 {stats['p90_ms']:.3f}  p99 {stats['p99_ms']:.3f}  max {stats['max_ms']:.3f} ms")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("regressed:", ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
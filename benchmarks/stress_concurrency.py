@@ -0,0 +1,172 @@
+"""
+Many threads calling /allocate, /allocate_hub and /update_inventory at once
+against one store. Afterwards every resource must balance:
+
+    initial stock + units added == units allocated + final stock
+
+no hub may hold a negative amount, and reloading the snapshot plus journal
+from disk must give the same inventory as memory. Exits non-zero if any
+check fails.
+
+    python benchmarks/stress_concurrency.py --calls 4000 --threads 1 2 4 8
+    python benchmarks/stress_concurrency.py --storage sqlite
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import RESOURCES, make_dataset, make_requests, write_dataset
+
+
+def totals(hubs):
+    return {r: sum(hub["resources"].get(r, 0) for hub in hubs) for r in RESOURCES}
+
+
+def allocated(relief_camps):
+    """Units shipped from hubs according to the camps' allocation history."""
+    shipped = dict.fromkeys(RESOURCES, 0)
+    for camp in relief_camps:
+        for alloc in camp.get("allocations", []):
+            if alloc["hub"] in ("N/A", "Multiple") or not isinstance(alloc["allocated_units"], int):
+                continue
+            shipped[alloc["resource"]] += alloc["allocated_units"]
+    return shipped
+
+
+def make_calls(data, n, seed):
+    rng = random.Random(seed)
+    hub_names = [hub["name"] for hub in data["hubs"]]
+    calls = []
+    for i in range(n):
+        kind = rng.random()
+        if kind < 0.4:
+            batch = make_requests(data, rng.randint(1, 4), seed=seed * 100003 + i)
+            calls.append(("/allocate_hub", {"requests": batch}))
+        elif kind < 0.7:
+            camp = rng.choice(data["relief_camps"])
+            calls.append(("/allocate", {
+                "relief_camp": camp["name"],
+                "location": camp["location"],
+                "requests": [{"resource": rng.choice(RESOURCES), "units": rng.randint(1, 60)}
+                             for _ in range(rng.randint(1, 3))],
+            }))
+        else:
+            resources = rng.sample(RESOURCES, rng.randint(1, 2))
+            calls.append(("/update_inventory", {
+                "hub_name": rng.choice(hub_names),
+                "resources": {r: rng.randint(1, 80) for r in resources},
+                "update_type": "add",
+            }))
+    return calls
+
+
+def run(disastro, calls, threads):
+    added = dict.fromkeys(RESOURCES, 0)
+    added_lock = threading.Lock()
+    errors = []
+    chunks = [calls[t::threads] for t in range(threads)]
+
+    def worker(chunk):
+        client = disastro.app.test_client()
+        for url, payload in chunk:
+            response = client.post(url, json=payload)
+            if response.status_code != 200:
+                errors.append((url, response.status_code, response.get_json()))
+            elif url == "/update_inventory":
+                with added_lock:
+                    for resource, units in payload["resources"].items():
+                        added[resource] += units
+
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    return time.perf_counter() - start, added, errors
+
+
+def check(disastro, initial, added, storage):
+    problems = []
+    store = disastro.store
+    final = totals(store.hubs)
+    shipped = allocated(store.relief_camps)
+    for resource in RESOURCES:
+        if initial[resource] + added[resource] != shipped[resource] + final[resource]:
+            problems.append(f"{resource}: {initial[resource]} + {added[resource]} added != "
+                            f"{shipped[resource]} allocated + {final[resource]} left")
+    for hub in store.hubs:
+        for resource, units in hub["resources"].items():
+            if units < 0:
+                problems.append(f"{hub['name']} holds {units} {resource}")
+
+    memory = {hub["name"]: dict(hub["resources"]) for hub in store.hubs}
+    history = sum(len(camp.get("allocations", [])) for camp in store.relief_camps)
+    store.close()
+    reloaded = disastro.StateStore(store.path, storage=disastro.open_storage(storage, store.path))
+    if {hub["name"]: hub["resources"] for hub in reloaded.hubs} != memory:
+        problems.append("inventory reloaded from disk differs from memory")
+    if sum(len(camp.get("allocations", [])) for camp in reloaded.relief_camps) != history:
+        problems.append("allocation history reloaded from disk differs from memory")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hubs", type=int, default=20)
+    parser.add_argument("--camps", type=int, default=300)
+    parser.add_argument("--calls", type=int, default=4000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    args = parser.parse_args()
+
+    data = make_dataset(args.hubs, args.camps, seed=args.seed, stock=(0, 200))
+    path = os.path.join(tempfile.mkdtemp(), "hubs.json")
+    write_dataset(path, data)
+    os.environ["DISASTRO_DATA_PATH"] = path
+    import app as disastro
+
+    # Switch threads far more often than the default 5 ms so that
+    # unprotected read-modify-write sequences actually interleave.
+    sys.setswitchinterval(1e-5)
+
+    failed = False
+    for threads in args.threads:
+        # A fresh copy of the dataset for every run. Short flush and compaction
+        # intervals keep the journal writer busy alongside the handlers.
+        write_dataset(path, data)
+        stem = os.path.splitext(path)[0]
+        for leftover in (path + ".journal", stem + ".db", stem + ".db-wal", stem + ".db-shm"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(leftover)
+        disastro.init_store(path, args.storage)
+        disastro.store.flush_interval = 0.05
+        disastro.store.compact_every = 2000
+        initial = totals(disastro.store.hubs)
+
+        calls = make_calls(data, args.calls, args.seed + threads)
+        elapsed, added, errors = run(disastro, calls, threads)
+        problems = check(disastro, initial, added, args.storage)
+        problems += [f"{url} returned {status}: {body}" for url, status, body in errors[:5]]
+
+        status = "ok" if not problems else f"{len(problems)} problem(s)"
+        print(f"{threads:2d} threads: {args.calls / elapsed:8.0f} calls/s  ({elapsed:6.2f} s)  {status}")
+        for problem in problems:
+            print("   ", problem)
+        failed = failed or bool(problems)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import json
+import os
+import random
+
+RESOURCES = ["water", "food", "medicine", "blankets"]
+PRIORITIES = ["children", "elderly", "women", "men"]
+
+
+def make_dataset(n_hubs, n_camps, seed=0, stock=(0, 500), history=0):
+    """Random hubs/camps around Bengaluru in the same shape as data/hubs.json."""
+    rng = random.Random(seed)
+
+    def location():
+        return [round(12.9716 + rng.uniform(-2.0, 2.0), 6), round(77.5946 + rng.uniform(-2.0, 2.0), 6)]
+
+    hubs = [{
+        "name": f"Hub {i}",
+        "location": location(),
+        "resources": {r: rng.randint(*stock) for r in RESOURCES},
+    } for i in range(n_hubs)]
+    camps = []
+    for i in range(n_camps):
+        camp = {
+            "name": f"Camp {i}",
+            "location": location(),
+            "population": {p: rng.randint(10, 300) for p in PRIORITIES},
+            "severity": rng.randint(1, 5),
+            "needs": {r: rng.randint(50, 400) for r in RESOURCES},
+            "allocations": [],
+        }
+        for _ in range(history):
+            camp["allocations"].append({
+                "resource": rng.choice(RESOURCES),
+                "allocated_to": camp["name"],
+                "hub": f"Hub {rng.randrange(max(n_hubs, 1))}",
+                "allocated_units": rng.randint(1, 100),
+                "status": "Allocated",
+            })
+        camps.append(camp)
+    return {"hubs": hubs, "relief_camps": camps}
+
+
+def make_requests(data, n, seed=0, max_units=50):
+    rng = random.Random(seed)
+    camps = data["relief_camps"]
+    return [{
+        "relief_camp": camp["name"],
+        "location": camp["location"],
+        "resource": rng.choice(RESOURCES),
+        "units": rng.randint(1, max_units),
+        "priority": rng.choice(PRIORITIES),
+        "time_since_last_request": rng.randint(0, 48),
+    } for camp in (rng.choice(camps) for _ in range(n))]
+
+
+def write_dataset(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+
+
+SCENARIO_RATES = {"/allocate_hub": 4.0, "/allocate": 3.0, "/update_inventory": 3.0}
+
+
+def make_scenario(n_hubs, n_camps, seed=0, duration=600.0, rates=None, resource_mix=None, stock=(0, 200)):
+    """
+    A seeded incident timeline: the dataset plus calls arriving as
+    independent Poisson streams, `rates` per endpoint in calls per second
+    of scenario time, over `duration` seconds. `resource_mix` weights how
+    often each resource is requested or restocked (uniform by default).
+    Returns {"dataset": ..., "calls": [(t, path, payload), ...]} in time
+    order; the same arguments always give the same scenario.
+    """
+    rates = dict(SCENARIO_RATES if rates is None else rates)
+    mix = resource_mix or dict.fromkeys(RESOURCES, 1.0)
+    resources, weights = list(mix), list(mix.values())
+    data = make_dataset(n_hubs, n_camps, seed=seed, stock=stock)
+    camps, hubs = data["relief_camps"], data["hubs"]
+    rng = random.Random(seed)
+
+    def resource():
+        return rng.choices(resources, weights)[0]
+
+    calls = []
+    for path in sorted(rates):
+        t = 0.0
+        while rates[path] > 0:
+            t += rng.expovariate(rates[path])
+            if t >= duration:
+                break
+            if path == "/allocate_hub":
+                payload = {"requests": [{
+                    "relief_camp": camp["name"], "location": camp["location"], "resource": resource(),
+                    "units": rng.randint(1, 50), "priority": rng.choice(PRIORITIES),
+                    "time_since_last_request": rng.randint(0, 48),
+                } for camp in (rng.choice(camps) for _ in range(rng.randint(1, 4)))]}
+            elif path == "/allocate":
+                camp = rng.choice(camps)
+                payload = {"relief_camp": camp["name"], "location": camp["location"],
+                           "requests": [{"resource": resource(), "units": rng.randint(1, 60)}
+                                        for _ in range(rng.randint(1, 3))]}
+            else:
+                restocked = dict.fromkeys(resource() for _ in range(2))
+                payload = {"hub_name": rng.choice(hubs)["name"],
+                           "resources": {r: rng.randint(10, 120) for r in restocked}, "update_type": "add"}
+            calls.append((round(t, 6), path, payload))
+    calls.sort(key=lambda call: (call[0], call[1]))
+    return {"dataset": data, "calls": calls}
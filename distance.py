@@ -0,0 +1,160 @@
+import threading
+
+import numpy as np
+
+from geo import EARTH_RADIUS_KM, get_distance_provider
+from metrics import span
+
+
+def haversine_matrix(origins, targets):
+    """Great-circle distances in km between every origin and every target, as an (n, m) array."""
+    origins = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+    targets = np.radians(np.asarray(targets, dtype=float).reshape(-1, 2))
+    lat1, lon1 = origins[:, 0:1], origins[:, 1:2]
+    lat2, lon2 = targets[:, 0], targets[:, 1]
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(np.clip(1 - a, 0, None)))
+
+
+def distance_matrix(origins, targets):
+    """
+    Distances in km from every origin to every target, as an (n, m) array:
+    great-circle, or from the provider set with geo.set_distance_provider.
+    """
+    provider = get_distance_provider()
+    if provider is None:
+        return haversine_matrix(origins, targets)
+    return provider.matrix(origins, targets)
+
+
+class DistanceMatrix:
+    """
+    Cached camps x hubs distance matrix. Rows and columns are keyed by name
+    and remember the location they were computed for; when a camp or hub is
+    added or moves only its row or column is recomputed, the rest is reused.
+    Reads from concurrent requests share one refresh.
+    """
+
+    def __init__(self):
+        self._camps = {}
+        self._hubs = {}
+        self._camp_locs = np.empty((0, 2))
+        self._hub_locs = np.empty((0, 2))
+        self._matrix = np.empty((0, 0))
+        self._moved_camps = {}
+        self._moved_hubs = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_state(cls, hubs, relief_camps):
+        """A matrix over the hubs and camps; a camp without a location gets no row."""
+        matrix = cls()
+        for camp in relief_camps:
+            if camp.get("location") is not None:
+                matrix.set_camp(camp["name"], camp["location"])
+        for hub in hubs:
+            matrix.set_hub(hub["name"], hub["location"])
+        return matrix
+
+    @property
+    def camp_names(self):
+        return list(self._camps)
+
+    @property
+    def hub_names(self):
+        return list(self._hubs)
+
+    @staticmethod
+    def _set(names, locs, moved, name, location):
+        location = (float(location[0]), float(location[1]))
+        index = names.get(name)
+        if index is None:
+            names[name] = len(names)
+        elif name in moved:
+            if moved[name] == location:
+                return
+        elif tuple(locs[index]) == location:
+            return
+        moved[name] = location
+
+    def set_camp(self, name, location):
+        with self._lock:
+            self._set(self._camps, self._camp_locs, self._moved_camps, name, location)
+
+    def set_hub(self, name, location):
+        with self._lock:
+            self._set(self._hubs, self._hub_locs, self._moved_hubs, name, location)
+
+    def invalidate(self):
+        """Recompute every distance on next use, e.g. after roads were blocked."""
+        with self._lock:
+            for name, index in self._camps.items():
+                if name not in self._moved_camps:
+                    self._moved_camps[name] = tuple(float(x) for x in self._camp_locs[index])
+
+    @staticmethod
+    def _grow(locs, size):
+        grown = np.zeros((size, 2))
+        grown[:len(locs)] = locs
+        return grown
+
+    def _refresh(self):
+        if not self._moved_camps and not self._moved_hubs:
+            return
+        with self._lock, span("distance.refresh"):
+            self._refresh_locked()
+
+    def _refresh_locked(self):
+        if not self._moved_camps and not self._moved_hubs:
+            return
+        n, m = len(self._camps), len(self._hubs)
+        if (n, m) != self._matrix.shape:
+            grown = np.empty((n, m))
+            old_n, old_m = self._matrix.shape
+            grown[:old_n, :old_m] = self._matrix
+            self._matrix = grown
+            self._camp_locs = self._grow(self._camp_locs, n)
+            self._hub_locs = self._grow(self._hub_locs, m)
+        rows = [self._camps[name] for name in self._moved_camps]
+        cols = [self._hubs[name] for name in self._moved_hubs]
+        for name, location in self._moved_camps.items():
+            self._camp_locs[self._camps[name]] = location
+        for name, location in self._moved_hubs.items():
+            self._hub_locs[self._hubs[name]] = location
+        self._moved_camps.clear()
+        self._moved_hubs.clear()
+        # Computed hub -> camp, the direction deliveries travel
+        if rows:
+            self._matrix[rows, :] = distance_matrix(self._hub_locs, self._camp_locs[rows]).T
+        if cols:
+            self._matrix[:, cols] = distance_matrix(self._hub_locs[cols], self._camp_locs).T
+
+    @property
+    def matrix(self):
+        """The full (camps, hubs) array, ordered like `camp_names` and `hub_names`."""
+        self._refresh()
+        return self._matrix
+
+    def row(self, camp_name):
+        """Distances from one camp to every hub, ordered like `hub_names`."""
+        self._refresh()
+        return self._matrix[self._camps[camp_name]]
+
+    def rows(self, camp_names):
+        self._refresh()
+        return self._matrix[[self._camps[name] for name in camp_names]]
+
+    def block(self, camp_names, hub_names):
+        """Distances between the given camps and hubs, as a (camps, hubs) array."""
+        self._refresh()
+        rows = [self._camps[name] for name in camp_names]
+        cols = [self._hubs[name] for name in hub_names]
+        return self._matrix[np.ix_(rows, cols)]
+
+    def get(self, camp_name, hub_name):
+        self._refresh()
+        return float(self._matrix[self._camps[camp_name], self._hubs[hub_name]])
+
+    def __contains__(self, camp_name):
+        return camp_name in self._camps
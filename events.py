@@ -0,0 +1,103 @@
+import itertools
+import os
+import threading
+from collections import deque
+
+import serialize
+
+
+class EventLog:
+    """
+    Recent state changes as numbered events for the /events stream. Each
+    event carries only what changed (one hub's stock of one resource, one
+    allocation), so a dashboard that applies them stays current without
+    re-downloading the whole state.
+
+    Event ids are "<epoch>-<seq>": seq counts up from 1 and epoch changes
+    with every process, so an id from before a restart is recognised as
+    stale. The last `capacity` events are kept for replay; a client asking
+    for anything older (or from another epoch) is told to reload instead.
+    """
+
+    def __init__(self, capacity=10000):
+        self.epoch = os.urandom(4).hex()
+        self.seq = 0
+        self._events = deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._wakers = []
+
+    def event_id(self, seq=None):
+        return f"{self.epoch}-{self.seq if seq is None else seq}"
+
+    def publish(self, kind, data):
+        with self._cond:
+            self.seq += 1
+            self._events.append((self.seq, kind, data))
+            self._cond.notify_all()
+            seq = self.seq
+        for waker in self._wakers:
+            waker()
+        return seq
+
+    def add_waker(self, waker):
+        """Call `waker()` after every publish, e.g. to wake an event loop."""
+        self._wakers.append(waker)
+
+    def remove_waker(self, waker):
+        self._wakers.remove(waker)
+
+    def offset(self, event_id):
+        """The seq an id refers to in this epoch, or None if it cannot be replayed from."""
+        if event_id is None or event_id == "":
+            return None
+        epoch, _, seq = str(event_id).rpartition("-")
+        if epoch and epoch != self.epoch:
+            return None
+        try:
+            seq = int(seq)
+        except ValueError:
+            return None
+        return seq if 0 <= seq <= self.seq else None
+
+    def read(self, since):
+        """
+        Events after seq `since` as (seq, kind, data), or None when some of
+        them are no longer retained and the client has to start over.
+        """
+        with self._cond:
+            if not self._events:
+                return [] if since == self.seq else None
+            first = self._events[0][0]
+            if since < first - 1:
+                return None
+            return list(itertools.islice(self._events, since - first + 1, None))
+
+    def wait(self, since, timeout):
+        """Block until there is an event after `since` or `timeout` seconds pass."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.seq > since, timeout)
+
+    def format(self, seq, kind, data):
+        return f"id: {self.event_id(seq)}\nevent: {kind}\ndata: {serialize.dumps_str(data)}\n\n"
+
+    def reset_message(self, seq):
+        """Tell the client to reload full state and continue after `seq`."""
+        return self.format(seq, "reset", {"id": self.event_id(seq)})
+
+    def stream(self, event_id, heartbeat=15.0):
+        """SSE text for a client resuming after `event_id`, then live events; blocks between them."""
+        since = self.offset(event_id)
+        if since is None:
+            since = self.seq
+            yield self.reset_message(since)
+        while True:
+            events = self.read(since)
+            if events is None:
+                since = self.seq
+                yield self.reset_message(since)
+                continue
+            if events:
+                since = events[-1][0]
+                yield "".join(self.format(*event) for event in events)
+            elif not self.wait(since, heartbeat):
+                yield ": keep-alive\n\n"
@@ -0,0 +1,208 @@
+import threading
+import time
+
+import numpy as np
+
+from distance import distance_matrix
+from model import Interner
+from priority import GROUP_WEIGHTS
+from transport import balance
+
+# Holt's linear smoothing: weight of the newest period in the level and in the trend
+ALPHA = 0.3
+BETA = 0.1
+# Periods folded in when the clock jumps; after this many empty ones the level is ~0 anyway
+MAX_CATCH_UP = 64
+
+
+def _delivered(allocations, resources):
+    """Units delivered by numeric, non-pending records, as {column: units}."""
+    totals = {}
+    for alloc in allocations:
+        units = alloc.get("allocated_units")
+        if alloc.get("status") == "Pending" or isinstance(units, bool) or not isinstance(units, (int, float)):
+            continue
+        if units > 0 and alloc.get("resource"):
+            column = resources.id(alloc["resource"])
+            totals[column] = totals.get(column, 0) + units
+    return totals
+
+
+class DemandForecast:
+    """
+    Units each camp is expected to draw of each resource per period,
+    smoothed with Holt's linear method over a camps x resources array:
+    every camp's level and trend move in one vectorized update when a
+    period closes, and deliveries in between only add to the open period.
+
+    The level starts from the camp's stated needs, read as needs per
+    period. A resource a camp does not list is estimated from the camps
+    that do, per unit of weighted population (GROUP_WEIGHTS) times
+    severity. The allocation history in hubs.json has no timestamps, so
+    a camp's delivered totals are folded in as a single observed period.
+
+    Columns follow `resources`, which may be shared with a
+    model.Inventory so both arrays line up; new resources add columns.
+    """
+
+    def __init__(self, camps, resources=None, period=86400.0, alpha=ALPHA, beta=BETA, now=None):
+        self._lock = threading.Lock()
+        self.resources = resources if resources is not None else Interner()
+        self.period = float(period)
+        self.alpha, self.beta = alpha, beta
+        self.names = [camp["name"] for camp in camps]
+        self._index = {name: i for i, name in enumerate(self.names)}
+        for camp in camps:
+            for resource in camp.get("needs") or {}:
+                self.resources.id(resource)
+        history = [_delivered(camp.get("allocations", []), self.resources) for camp in camps]
+
+        n, m = len(camps), len(self.resources)
+        needs = np.full((n, m), np.nan)
+        for i, camp in enumerate(camps):
+            for resource, units in (camp.get("needs") or {}).items():
+                if isinstance(units, (int, float)) and not isinstance(units, bool):
+                    needs[i, self.resources.get(resource)] = units
+        population = np.array([
+            sum(GROUP_WEIGHTS.get(group, 0.0) * count for group, count in (camp.get("population") or {}).items())
+            for camp in camps], dtype=float)
+        severity = np.array([camp.get("severity") or 1 for camp in camps], dtype=float)
+        exposure = (population * np.maximum(severity, 1)).reshape(-1, 1)
+        listed = ~np.isnan(needs)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.nansum(needs, axis=0) / (exposure * listed).sum(axis=0)
+        prior = np.where(listed, needs, np.nan_to_num(rate, nan=0.0, posinf=0.0) * exposure)
+
+        self.level = prior
+        self.trend = np.zeros((n, m))
+        observed = np.zeros((n, m))
+        for i, totals in enumerate(history):
+            for column, units in totals.items():
+                observed[i, column] = units
+        seen = np.array([bool(totals) for totals in history], dtype=bool)
+        self.level[seen] = alpha * observed[seen] + (1 - alpha) * prior[seen]
+        self._observed = np.zeros((n, m))
+        self._opened = time.time() if now is None else now
+        self.periods = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def index(self, name):
+        return self._index[name]
+
+    def _widen(self):
+        grow = len(self.resources) - self.level.shape[1]
+        if grow > 0:
+            pad = ((0, 0), (0, grow))
+            self.level = np.pad(self.level, pad)
+            self.trend = np.pad(self.trend, pad)
+            self._observed = np.pad(self._observed, pad)
+
+    def _close(self, observed):
+        level = self.alpha * observed + (1 - self.alpha) * (self.level + self.trend)
+        self.trend = self.beta * (level - self.level) + (1 - self.beta) * self.trend
+        self.level = level
+        self.periods += 1
+
+    def _advance(self, now):
+        elapsed = int((now - self._opened) // self.period)
+        if elapsed <= 0:
+            return 0
+        self._widen()
+        self._close(self._observed)
+        self._observed = np.zeros_like(self.level)
+        empty = np.zeros_like(self.level)
+        for _ in range(min(elapsed, MAX_CATCH_UP) - 1):
+            self._close(empty)
+        self._opened += elapsed * self.period
+        return elapsed
+
+    def advance(self, now=None):
+        """Close every period that has ended by `now`; returns how many did."""
+        with self._lock:
+            return self._advance(time.time() if now is None else now)
+
+    def step(self, now=None):
+        """Close the open period now, whatever its length, and start the next one."""
+        with self._lock:
+            self._widen()
+            self._close(self._observed)
+            self._observed = np.zeros_like(self.level)
+            self._opened = time.time() if now is None else now
+
+    def observe(self, name, resource, units, now=None):
+        """Count `units` of `resource` delivered to camp `name`; unknown camps are ignored."""
+        i = self._index.get(name)
+        if i is None:
+            return
+        with self._lock:
+            self._advance(time.time() if now is None else now)
+            column = self.resources.id(resource)
+            self._widen()
+            self._observed[i, column] += units
+
+    def forecast(self, horizon=1, now=None):
+        """Expected units over the next `horizon` periods, as a new (camps, resources) array."""
+        with self._lock:
+            self._advance(time.time() if now is None else now)
+            self._widen()
+            projected = horizon * self.level + self.trend * horizon * (horizon + 1) / 2
+        return np.clip(projected, 0, None)
+
+    def describe(self, name, horizon=1, now=None):
+        """Level, trend and forecast of every resource for camp `name`."""
+        i = self._index[name]
+        projected = self.forecast(horizon, now)[i]
+        return {
+            "camp": name,
+            "horizon_periods": horizon,
+            "resources": {
+                resource: {"level": round(float(self.level[i, column]), 3),
+                           "trend": round(float(self.trend[i, column]), 3),
+                           "forecast": round(float(projected[column]), 3)}
+                for column, resource in enumerate(self.resources.names)
+            },
+        }
+
+
+def plan_transfers(demand, nearest, units, hub_names, hub_locations, resource_names, min_units=1):
+    """
+    Hub-to-hub transfers that place stock where demand is expected.
+
+    demand:   (camps, resources) units expected at each camp
+    nearest:  (camps,) row of the hub nearest each camp
+    units:    (hubs, resources) stock, rows ordered like `hub_names`
+
+    Each camp's demand is charged to its nearest hub. For every resource,
+    hubs holding more than their charge ship the excess to hubs holding
+    less, at (close to) the least total hub-to-hub distance (transport.balance);
+    shipments under `min_units` are dropped. Returns (transfers, summary)
+    with transfers as {"resource", "from", "to", "units", "distance_km"}
+    and per resource {"demand", "stock", "moved", "short"}.
+    """
+    transfers, summary = [], {}
+    hub_locations = np.asarray(hub_locations, dtype=float).reshape(-1, 2)
+
+    def cost(sources, sinks):
+        return distance_matrix(hub_locations[sources], hub_locations[sinks])
+
+    for column, resource in enumerate(resource_names):
+        need = np.bincount(nearest, weights=demand[:, column], minlength=len(hub_names))
+        moves, short = balance(units[:, column], need, cost)
+        moved = 0
+        for source, sink, sent in moves:
+            if sent < min_units:
+                short += sent
+                continue
+            moved += sent
+            transfers.append({"resource": resource, "from": hub_names[source], "to": hub_names[sink],
+                              "units": sent, "distance_km": round(float(cost([source], [sink])[0, 0]), 2)})
+        summary[resource] = {"demand": int(np.ceil(need).sum()),
+                             "stock": int(np.floor(np.clip(units[:, column], 0, None)).sum()),
+                             "moved": moved, "short": short}
+    transfers.sort(key=lambda t: (t["resource"], -t["units"], t["from"], t["to"]))
+    return transfers, summary
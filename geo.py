@@ -0,0 +1,35 @@
+from math import radians, sin, cos, sqrt, atan2
+
+EARTH_RADIUS_KM = 6371.0
+
+# Object with distance(loc1, loc2) and matrix(origins, targets), e.g. a
+# roads.RoadNetwork; None means great-circle distance
+_provider = None
+
+
+def set_distance_provider(provider):
+    """Route calculate_distance (and distance.distance_matrix) through `provider`; None restores haversine."""
+    global _provider
+    _provider = provider
+
+
+def get_distance_provider():
+    return _provider
+
+
+def haversine_distance(loc1, loc2):
+    R = EARTH_RADIUS_KM
+    lat1, lon1 = radians(loc1[0]), radians(loc1[1])
+    lat2, lon2 = radians(loc2[0]), radians(loc2[1])
+
+    dlat, dlon = lat2 - lat1, lon2 - lon1
+    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+
+    return R * c
+
+
+def calculate_distance(loc1, loc2):
+    if _provider is not None:
+        return _provider.distance(loc1, loc2)
+    return haversine_distance(loc1, loc2)
@@ -0,0 +1,144 @@
+from spatial import HubIndex
+
+
+class FenwickTree:
+    """Counts over positions 0..size-1 with O(log n) update, prefix sum and k-th lookup."""
+
+    def __init__(self, size=0):
+        self.size = 0
+        self.total = 0
+        self._capacity = 0
+        self._tree = [0]
+        self._values = []
+        self.grow(size)
+
+    def grow(self, size):
+        """Extend to `size` positions; capacity doubles so appends stay amortized O(1)."""
+        if size <= self.size:
+            return
+        self._values.extend([0] * (size - self.size))
+        self.size = size
+        if size <= self._capacity:
+            return
+        self._capacity = max(size, 2 * self._capacity)
+        self._tree = [0] * (self._capacity + 1)
+        for i, value in enumerate(self._values, 1):
+            self._tree[i] += value
+            parent = i + (i & -i)
+            if parent <= self._capacity:
+                self._tree[parent] += self._tree[i]
+
+    def set(self, position, value):
+        delta = value - self._values[position]
+        if not delta:
+            return
+        self._values[position] = value
+        self.total += delta
+        i = position + 1
+        while i <= self._capacity:
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, position):
+        """Sum over positions before `position`."""
+        i = min(position, self._capacity)
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, k):
+        """Smallest position whose inclusive prefix sum reaches k (k >= 1)."""
+        position = 0
+        step = 1 << self._capacity.bit_length()
+        while step:
+            nxt = position + step
+            if nxt <= self._capacity and self._tree[nxt] < k:
+                position = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return position
+
+
+class StockIndex:
+    """
+    For each resource, the hubs currently holding a positive amount of it.
+    Hubs are identified by their position in the hubs list, so the same
+    index drives the round-robin in /allocate_hub (`cycle`) and, through a
+    per-resource grid of stocked hubs, the nearest-first walk in /allocate
+    (`nearest`). Each stock change costs O(log H).
+    """
+
+    def __init__(self):
+        self._positions = {}
+        self._locations = {}
+        self._trees = {}
+        self._grids = {}
+
+    @classmethod
+    def from_hubs(cls, hubs):
+        index = cls()
+        for hub in hubs:
+            index.add_hub(hub["name"], hub["location"], hub["resources"])
+        return index
+
+    def add_hub(self, name, location, resources):
+        """Register a hub (appended after existing ones) or refresh one that moved."""
+        if name not in self._positions:
+            self._positions[name] = len(self._positions)
+            for tree in self._trees.values():
+                tree.grow(len(self._positions))
+        self._locations[name] = location
+        for grid in self._grids.values():
+            if name in grid:
+                grid.add(name, location)
+        for resource, units in resources.items():
+            self.update(name, resource, units)
+
+    def update(self, name, resource, units):
+        tree = self._trees.get(resource)
+        if tree is None:
+            tree = self._trees[resource] = FenwickTree(len(self._positions))
+            self._grids[resource] = HubIndex()
+        stocked = units > 0
+        tree.set(self._positions[name], 1 if stocked else 0)
+        if stocked:
+            if name not in self._grids[resource]:
+                self._grids[resource].add(name, self._locations[name])
+        else:
+            self._grids[resource].remove(name)
+
+    def count(self, resource):
+        tree = self._trees.get(resource)
+        return tree.total if tree else 0
+
+    def cycle(self, resource, start=0):
+        """
+        Yield positions of hubs stocked with `resource` in list order,
+        starting at `start` and wrapping around once. Stock changes made
+        while iterating are seen by the following steps.
+        """
+        tree = self._trees.get(resource)
+        if tree is None:
+            return
+        position, wrapped = start, False
+        while True:
+            k = tree.prefix(position) + 1
+            if k > tree.total:
+                if wrapped or start == 0:
+                    return
+                position, wrapped = 0, True
+                continue
+            found = tree.find(k)
+            if wrapped and found >= start:
+                return
+            yield found
+            position = found + 1
+
+    def nearest(self, resource, location):
+        """Yield (distance_km, hub_name) over hubs stocked with `resource`, nearest first."""
+        grid = self._grids.get(resource)
+        if grid is None:
+            return iter(())
+        return grid.nearest(location)
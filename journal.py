@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+
+import serialize
+
+log = logging.getLogger("disastro.journal")
+
+
+def apply_record(record, data, hubs_by_name, camps_by_name):
+    """Re-apply one journal record to the in-memory hubs and camps."""
+    op = record.get("op")
+    if op == "batch":
+        # A transaction (StateStore.transaction): on disk whole or not at all
+        for inner in record["records"]:
+            apply_record(inner, data, hubs_by_name, camps_by_name)
+    elif op == "hub":
+        hub = hubs_by_name.get(record["hub"]["name"])
+        if hub is None:
+            hub = dict(record["hub"])
+            data["hubs"].append(hub)
+            hubs_by_name[hub["name"]] = hub
+        else:
+            hub.update(record["hub"])
+    elif op == "inventory":
+        hub = hubs_by_name.get(record["hub"])
+        if hub is None:
+            return
+        resources = hub.setdefault("resources", {})
+        if "value" in record:
+            resources[record["resource"]] = record["value"]
+        else:
+            resources[record["resource"]] = resources.get(record["resource"], 0) + record["delta"]
+    elif op == "alloc":
+        camp = camps_by_name.get(record["camp"])
+        if camp is not None:
+            camp.setdefault("allocations", []).append(record["alloc"])
+    elif op == "alloc_update":
+        camp = camps_by_name.get(record["camp"])
+        if camp is not None and record["index"] < len(camp.get("allocations", [])):
+            camp["allocations"][record["index"]].update(record["fields"])
+    elif op == "shipment":
+        data.setdefault("shipped_out", []).append(record["shipment"])
+
+
+class Journal:
+    """
+    Append-only log of state changes kept next to hubs.json. Records are
+    buffered in memory and written by the store's flusher thread in one
+    batch, so a request never pays for more than a list append.
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._pending = []
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def append(self, record):
+        with self._lock:
+            self._pending.append(record)
+
+    def flush(self):
+        """Write buffered records to disk. Returns how many were written."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        lines = b"".join(serialize.dumps(r) + b"\n" for r in pending)
+        with open(self.path, "ab") as f:
+            f.write(lines)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.size += len(pending)
+        return len(pending)
+
+    def read(self, after_seq=0):
+        """
+        Yield records newer than `after_seq`. A final line that does not
+        parse was torn by a crash: once read to the end it is cut off the
+        file, so records appended afterwards start on a line of their own.
+        A corrupt line with records after it is logged and skipped, and the
+        later records are still read.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        offset, torn, line = 0, None, b""
+        with f:
+            for line in f:
+                if torn is not None:
+                    log.error("Skipping corrupt journal record at byte %d of %s", torn, self.path)
+                    torn = None
+                try:
+                    record = serialize.loads(line)
+                except serialize.JSONDecodeError:
+                    torn = offset
+                    offset += len(line)
+                    continue
+                offset += len(line)
+                if record.get("seq", 0) > after_seq:
+                    yield record
+        if torn is not None:
+            self._truncate(torn)
+        elif line and not line.endswith(b"\n"):
+            # The last record is whole but its newline never made it to disk
+            with open(self.path, "ab") as f:
+                f.write(b"\n")
+
+    def _truncate(self, size):
+        dropped = os.path.getsize(self.path) - size
+        log.warning("Dropping %d bytes of torn journal at the end of %s", dropped, self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(size)
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def reset(self):
+        """Drop everything already on disk; called once a snapshot covers it."""
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+        self.size = 0
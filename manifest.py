@@ -0,0 +1,123 @@
+"""
+Inventory manifests for /update_inventory/bulk, read a line at a time so
+a large upload is never held as one body. Three formats, each giving
+hub updates shaped like the /update_inventory payload:
+
+    JSON    {"updates": [{"hub_name": ..., "resources": {...}, "update_type": ...}, ...]}
+            or the list alone
+    NDJSON  one such update object per line
+    CSV     a header naming hub_name, resource and units (update_type
+            optional), then one row per hub and resource; consecutive rows
+            for the same hub and update type are merged
+"""
+import csv
+import io
+import math
+
+import serialize
+
+JSON_TYPES = ("application/json",)
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+CSV_TYPES = ("text/csv", "application/csv")
+CSV_COLUMNS = ("hub_name", "resource", "units")
+
+
+class ManifestError(ValueError):
+    """A manifest that cannot be read; `where` is the line (or JSON list index) at fault."""
+
+    def __init__(self, message, where=None):
+        super().__init__(message if where is None else f"{where}: {message}")
+        self.message = message
+        self.where = where
+
+
+def _number(text, where):
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        value = float(text)
+    except ValueError:
+        value = None
+    if value is None or not math.isfinite(value):
+        raise ManifestError(f"units must be numeric, got {text!r}", where)
+    return value
+
+
+def iter_json(stream):
+    """(where, update) for a JSON body, which is parsed whole."""
+    try:
+        body = serialize.loads(stream.read())
+    except serialize.JSONDecodeError as e:
+        raise ManifestError(f"invalid JSON: {e}") from None
+    updates = body.get("updates") if isinstance(body, dict) else body
+    if not isinstance(updates, list):
+        raise ManifestError('expected a list of updates or {"updates": [...]}')
+    for i, update in enumerate(updates):
+        yield f"updates[{i}]", update
+
+
+def iter_ndjson(stream):
+    """(where, update) for each non-blank line of an NDJSON body."""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield f"line {number}", serialize.loads(line)
+        except serialize.JSONDecodeError as e:
+            raise ManifestError(f"invalid JSON: {e}", f"line {number}") from None
+
+
+def iter_csv(stream, default_type="set"):
+    """(where, update) for runs of CSV rows that share a hub and update type."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ManifestError(f"CSV header must name {', '.join(CSV_COLUMNS)}; missing {', '.join(missing)}", "line 1")
+    current, where = None, None
+    for row in reader:
+        line = f"line {reader.line_num}"
+        hub_name, resource = (row.get("hub_name") or "").strip(), (row.get("resource") or "").strip()
+        if not hub_name or not resource:
+            raise ManifestError("hub_name and resource are required", line)
+        update_type = (row.get("update_type") or "").strip() or default_type
+        units = _number((row.get("units") or "").strip(), line)
+        if current is not None and (current["hub_name"], current["update_type"]) == (hub_name, update_type):
+            resources = current["resources"]
+            # Merged rows must do what applying them one by one would
+            resources[resource] = resources.get(resource, 0) + units if update_type == "add" else units
+            continue
+        if current is not None:
+            yield where, current
+        current, where = {"hub_name": hub_name, "resources": {resource: units}, "update_type": update_type}, line
+    if current is not None:
+        yield where, current
+
+
+def _checked(updates, default_type):
+    for where, update in updates:
+        if not isinstance(update, dict):
+            raise ManifestError("each update must be an object", where)
+        if "update_type" not in update:
+            update = dict(update, update_type=default_type)
+        yield where, update
+
+
+def read_manifest(stream, content_type, default_type="set"):
+    """
+    (where, update) pairs, read lazily from a binary `stream` of the given
+    content type; updates without an update_type get `default_type`. An
+    unsupported content type raises ManifestError at once, a malformed
+    line or row while iterating.
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in CSV_TYPES:
+        updates = iter_csv(stream, default_type)
+    elif content_type in NDJSON_TYPES:
+        updates = iter_ndjson(stream)
+    elif content_type in JSON_TYPES or content_type.endswith("+json"):
+        updates = iter_json(stream)
+    else:
+        raise ManifestError(f"unsupported content type {content_type or '(none)'!r}; send JSON, NDJSON or CSV")
+    return _checked(updates, default_type)
@@ -0,0 +1,195 @@
+"""
+Counters, gauges and histograms rendered in the Prometheus text format,
+timing spans for the hot paths, and sampled, level-gated debug logging.
+"""
+import bisect
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans range from a dict lookup to a full snapshot write
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _labels(self.labels, key), value) for key, value in sorted(items, key=repr)]
+
+
+class Gauge:
+    """A value set directly, or read from `callback` at scrape time ({label tuple: value} when labelled)."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), callback=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.callback = callback
+        self._values = {}
+
+    def set(self, value, **labels):
+        self._values[tuple(labels[name] for name in self.labels)] = value
+
+    def samples(self):
+        if self.callback is None:
+            values = dict(self._values)
+        else:
+            value = self.callback()
+            values = value if self.labels else {(): value}
+        return [(self.name, _labels(self.labels, key), value) for key, value in sorted(values.items(), key=repr)]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label tuple -> [count per bucket (+Inf last), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels[name] for name in self.labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        samples = []
+        for key, counts, total in sorted(items, key=repr):
+            for bound, cumulative in zip(self.buckets + (float("inf"),), itertools.accumulate(counts)):
+                samples.append((self.name + "_bucket", _labels(self.labels, key, [("le", _number(bound))]),
+                                cumulative))
+            samples.append((self.name + "_sum", _labels(self.labels, key), total))
+            samples.append((self.name + "_count", _labels(self.labels, key), sum(counts)))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=(), callback=None):
+        return self.register(Gauge(name, help, labels, callback))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+SPANS = REGISTRY.histogram("disastro_span_seconds", "Time spent in instrumented sections.", ["span"])
+
+
+@contextmanager
+def span(name):
+    """Time the block into disastro_span_seconds{span=name}, also when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPANS.observe(time.perf_counter() - start, span=name)
+
+
+def configure_logging(level=None):
+    """Set the "disastro" loggers' level from DISASTRO_LOG_LEVEL (default WARNING)."""
+    level = level or os.environ.get("DISASTRO_LOG_LEVEL", "WARNING")
+    logger = logging.getLogger("disastro")
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+class Sampler:
+    """True for one call in `every` (the first of each run); every <= 1 samples all, 0 none."""
+
+    def __init__(self, every):
+        self.every = every
+        self._calls = itertools.count()
+
+    def __call__(self):
+        if self.every <= 0:
+            return False
+        return self.every == 1 or next(self._calls) % self.every == 0
+
+
+def log_sampled(logger, sampler, level, message, *args):
+    """
+    Log `message % args` if `level` is enabled and the sampler picks this
+    call. The level check comes first, so a disabled call costs neither
+    formatting nor I/O.
+    """
+    if logger.isEnabledFor(level) and sampler():
+        logger.log(level, message, *args)
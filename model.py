@@ -0,0 +1,420 @@
+import threading
+from array import array
+
+import numpy as np
+
+MISSING = -2 ** 63
+# allocated_units is an integer, a label ("Not fully allocated", "Allocated
+# across hubs") or something else kept in the row's extras
+UNITS_ABSENT, UNITS_INT, UNITS_LABEL = 0, 1, 2
+ALLOCATION_FIELDS = ("resource", "allocated_to", "hub", "allocated_units", "status",
+                     "distance_km", "units_remaining", "priority")
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and MISSING < value < 2 ** 63
+
+
+class Interner:
+    """
+    Names mapped to dense integer ids in order of first appearance. Safe to
+    share between threads holding different resource locks: assigning a
+    new id takes the interner's own lock.
+    """
+
+    __slots__ = ("names", "_ids", "_lock")
+
+    def __init__(self, names=()):
+        self.names = []
+        self._ids = {}
+        self._lock = threading.Lock()
+        for name in names:
+            self.id(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def id(self, name):
+        """Id of `name`, assigning the next one if it is new."""
+        i = self._ids.get(name)
+        if i is None:
+            with self._lock:
+                i = self._ids.get(name)
+                if i is None:
+                    self.names.append(name)
+                    i = self._ids[name] = len(self.names) - 1
+        return i
+
+    def get(self, name, default=-1):
+        return self._ids.get(name, default)
+
+    def name(self, i):
+        return self.names[i]
+
+
+class Inventory:
+    """
+    Units of every resource at every hub as one hubs x resources array,
+    rows in hub-list order and columns by resource id. A presence mask tells a
+    stocked 0 from a resource the hub never listed. Values are int64 until
+    a non-integral amount arrives, then the array becomes float64. Rows and
+    columns grow by doubling, so registering a hub or resource is amortized
+    O(1). Callers hold the lock of the resource they write, but growing or
+    converting the array replaces it for every resource, so writes also
+    take the inventory's own lock.
+    """
+
+    def __init__(self, resources=None):
+        self.resources = resources if resources is not None else Interner()
+        self.hubs = Interner()
+        self._units = np.zeros((0, 0), dtype=np.int64)
+        self._present = np.zeros((0, 0), dtype=bool)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_hubs(cls, hubs, resources=None):
+        inventory = cls(resources)
+        for hub in hubs:
+            inventory.add_hub(hub["name"], hub.get("resources", {}))
+        return inventory
+
+    @property
+    def units(self):
+        """The live (hubs, resources) array; a view, so copy it to keep a snapshot."""
+        return self._units[:len(self.hubs), :len(self.resources)]
+
+    def _reserve(self, rows, cols):
+        have_rows, have_cols = self._units.shape
+        if rows <= have_rows and cols <= have_cols:
+            return
+        shape = (max(rows, 2 * have_rows if rows > have_rows else have_rows),
+                 max(cols, 2 * have_cols if cols > have_cols else have_cols))
+        units = np.zeros(shape, dtype=self._units.dtype)
+        present = np.zeros(shape, dtype=bool)
+        units[:have_rows, :have_cols] = self._units
+        present[:have_rows, :have_cols] = self._present
+        self._units, self._present = units, present
+
+    def add_hub(self, name, resources):
+        """Register a hub (or refresh one already known) with its resource amounts."""
+        row = self.hubs.id(name)
+        with self._lock:
+            self._reserve(len(self.hubs), len(self.resources))
+        for resource, units in resources.items():
+            self.set(name, resource, units)
+        return row
+
+    def set(self, hub, resource, units):
+        row = self.hubs.get(hub)
+        if row < 0:
+            raise KeyError(hub)
+        col = self.resources.id(resource)
+        with self._lock:
+            self._reserve(len(self.hubs), len(self.resources))
+            if self._units.dtype.kind == "i" and not _is_int(units):
+                self._units = self._units.astype(np.float64)
+            self._units[row, col] = units
+            self._present[row, col] = True
+
+    def get(self, hub, resource, default=0):
+        row, col = self.hubs.get(hub), self.resources.get(resource)
+        if row < 0 or col < 0 or not self._present[row, col]:
+            return default
+        return self._units[row, col].item()
+
+    def column(self, resource):
+        """Units of `resource` at every hub, as a view (zeros if it is unknown)."""
+        col = self.resources.get(resource)
+        if col < 0:
+            return np.zeros(len(self.hubs), dtype=self._units.dtype)
+        return self._units[:len(self.hubs), col]
+
+    def resources_of(self, row):
+        """Row `row` as the {"resource": units} dict of the JSON schema."""
+        units, present = self._units[row], self._present[row]
+        return {self.resources.names[col]: units[col].item()
+                for col in range(len(self.resources)) if present[col]}
+
+
+class Hub:
+    __slots__ = ("name", "location", "row", "extra")
+
+    def __init__(self, name, location, row, extra=None):
+        self.name = name
+        self.location = location
+        self.row = row
+        self.extra = extra
+
+
+class Camp:
+    __slots__ = ("name", "location", "population", "severity", "needs", "rows", "extra")
+
+    def __init__(self, name, location, population=None, severity=None, needs=None, rows=None, extra=None):
+        self.name = name
+        self.location = location
+        self.population = population
+        self.severity = severity
+        self.needs = needs
+        # Allocation table rows in history order; None if the camp has no "allocations" key
+        self.rows = rows
+        self.extra = extra
+
+
+class AllocationTable:
+    """
+    Allocation records stored column-wise in typed arrays: resource ids
+    (shared with the inventory), camp and hub names and status/priority
+    labels interned in `strings`, units as int64, distance as float64 (NaN
+    when absent). Fields outside that schema, or values of an unexpected
+    type, go to a per-row `extras` dict, so `row(i)` rebuilds the original
+    record. `column(name)` exposes a column as a numpy view for vectorized
+    queries.
+    """
+
+    def __init__(self, resources=None):
+        self.resources = resources if resources is not None else Interner()
+        self.strings = Interner()
+        self._resource = array("i")
+        self._camp = array("i")
+        self._hub = array("i")
+        self._status = array("i")
+        self._priority = array("i")
+        self._units_kind = array("b")
+        self._units = array("q")
+        self._remaining = array("q")
+        self._distance = array("d")
+        self.extras = {}
+
+    def __len__(self):
+        return len(self._resource)
+
+    def _string(self, alloc, key, extra):
+        value = alloc.get(key)
+        if value is None and key not in alloc:
+            return -1
+        if isinstance(value, str):
+            return self.strings.id(value)
+        extra[key] = value
+        return -1
+
+    def append(self, alloc):
+        """Store one record dict; returns its row."""
+        extra = {}
+        resource = alloc.get("resource")
+        if isinstance(resource, str):
+            self._resource.append(self.resources.id(resource))
+        else:
+            self._resource.append(-1)
+            if "resource" in alloc:
+                extra["resource"] = resource
+        self._camp.append(self._string(alloc, "allocated_to", extra))
+        self._hub.append(self._string(alloc, "hub", extra))
+        self._status.append(self._string(alloc, "status", extra))
+        self._priority.append(self._string(alloc, "priority", extra))
+
+        units = alloc.get("allocated_units")
+        if _is_int(units):
+            self._units_kind.append(UNITS_INT)
+            self._units.append(units)
+        elif isinstance(units, str):
+            self._units_kind.append(UNITS_LABEL)
+            self._units.append(self.strings.id(units))
+        else:
+            self._units_kind.append(UNITS_ABSENT)
+            self._units.append(0)
+            if "allocated_units" in alloc:
+                extra["allocated_units"] = units
+
+        remaining = alloc.get("units_remaining")
+        if _is_int(remaining):
+            self._remaining.append(remaining)
+        else:
+            self._remaining.append(MISSING)
+            if "units_remaining" in alloc:
+                extra["units_remaining"] = remaining
+
+        distance = alloc.get("distance_km")
+        if isinstance(distance, float) and distance == distance:
+            self._distance.append(distance)
+        else:
+            self._distance.append(np.nan)
+            if "distance_km" in alloc:
+                extra["distance_km"] = distance
+
+        for key, value in alloc.items():
+            if key not in ALLOCATION_FIELDS:
+                extra[key] = value
+        row = len(self._resource) - 1
+        if extra:
+            self.extras[row] = extra
+        return row
+
+    def row(self, i):
+        """Record `i` as a dict in the JSON schema."""
+        names = self.strings.names
+        alloc = {}
+        if self._resource[i] >= 0:
+            alloc["resource"] = self.resources.names[self._resource[i]]
+        if self._camp[i] >= 0:
+            alloc["allocated_to"] = names[self._camp[i]]
+        if self._hub[i] >= 0:
+            alloc["hub"] = names[self._hub[i]]
+        kind = self._units_kind[i]
+        if kind == UNITS_INT:
+            alloc["allocated_units"] = self._units[i]
+        elif kind == UNITS_LABEL:
+            alloc["allocated_units"] = names[self._units[i]]
+        if self._status[i] >= 0:
+            alloc["status"] = names[self._status[i]]
+        if self._distance[i] == self._distance[i]:
+            alloc["distance_km"] = self._distance[i]
+        if self._remaining[i] != MISSING:
+            alloc["units_remaining"] = self._remaining[i]
+        if self._priority[i] >= 0:
+            alloc["priority"] = names[self._priority[i]]
+        extra = self.extras.get(i)
+        if extra:
+            alloc.update(extra)
+        return alloc
+
+    def column(self, name):
+        """A numpy view of one column: resource, camp, hub, status, priority, units_kind, units, remaining, distance."""
+        return np.frombuffer(getattr(self, "_" + name), dtype=getattr(self, "_" + name).typecode)
+
+    def units_by(self, name):
+        """Integer allocated_units summed per id of column `name` ("resource", "camp" or "hub")."""
+        keys = self.column(name)
+        numeric = (self.column("units_kind") == UNITS_INT) & (keys >= 0)
+        size = len(self.resources) if name == "resource" else len(self.strings)
+        return np.bincount(keys[numeric], weights=self.column("units")[numeric], minlength=size)
+
+
+class CampAllocations:
+    """
+    One camp's allocation history as the store keeps it (state.py):
+    settled records are rows of an AllocationTable shared by every camp and
+    are rebuilt as dicts when read, while records still "Pending" stay the
+    dicts they were appended as, so they can be updated in place. Reads
+    like the list of the JSON schema (len, indexing, iteration, ==) and is
+    serialized as one through `tolist`.
+    """
+
+    __slots__ = ("table", "rows", "live")
+
+    def __init__(self, table, allocations=()):
+        self.table = table
+        # Table row of each record, -1 for one held in `live` by its index
+        self.rows = array("i")
+        self.live = {}
+        for alloc in allocations:
+            self.append(alloc)
+
+    def append(self, alloc):
+        if alloc.get("status") == "Pending":
+            self.live[len(self.rows)] = alloc
+            self.rows.append(-1)
+        else:
+            self.rows.append(self.table.append(alloc))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self.rows)))]
+        row = self.rows[i]
+        if row < 0:
+            return self.live[i if i >= 0 else i + len(self.rows)]
+        return self.table.row(row)
+
+    def __iter__(self):
+        for i in range(len(self.rows)):
+            yield self[i]
+
+    def __eq__(self, other):
+        if isinstance(other, (CampAllocations, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def tolist(self):
+        return list(self)
+
+
+def compact_allocations(relief_camps, table):
+    """Replace every camp's "allocations" list by a CampAllocations over `table`."""
+    for camp in relief_camps:
+        if "allocations" in camp:
+            camp["allocations"] = CampAllocations(table, camp["allocations"])
+
+
+class Model:
+    """
+    Compact in-memory form of the hubs.json state: slotted Hub and Camp
+    objects, inventory as one hubs x resources array (Inventory) and every
+    camp's allocation history in one AllocationTable, with resource names
+    interned once. `from_state` and `to_state` convert from and to the
+    JSON schema. The store keeps its state as JSON-schema dicts but holds
+    allocation histories in an AllocationTable too (CampAllocations).
+    """
+
+    def __init__(self):
+        self.resources = Interner()
+        self.inventory = Inventory(self.resources)
+        self.allocations = AllocationTable(self.resources)
+        self.hubs = []
+        self.camps = []
+        self.extra = None
+
+    @classmethod
+    def from_state(cls, data):
+        model = cls()
+        for hub in data.get("hubs", []):
+            row = model.inventory.add_hub(hub["name"], hub.get("resources", {}))
+            extra = {k: v for k, v in hub.items() if k not in ("name", "location", "resources")}
+            model.hubs.append(Hub(hub["name"], hub.get("location"), row, extra or None))
+        for camp in data.get("relief_camps", []):
+            rows = None
+            if "allocations" in camp:
+                rows = array("i", (model.allocations.append(alloc) for alloc in camp["allocations"]))
+            # An explicit null stays in extra; the slots use None for "absent"
+            extra = {k: v for k, v in camp.items()
+                     if k not in ("name", "location", "population", "severity", "needs", "allocations")
+                     or (v is None and k != "allocations")}
+            model.camps.append(Camp(camp["name"], camp.get("location"), camp.get("population"),
+                                    camp.get("severity"), camp.get("needs"), rows, extra or None))
+        extra = {k: v for k, v in data.items() if k not in ("hubs", "relief_camps")}
+        model.extra = extra or None
+        return model
+
+    def to_state(self):
+        hubs = []
+        for hub in self.hubs:
+            entry = {"name": hub.name, "location": hub.location,
+                     "resources": self.inventory.resources_of(hub.row)}
+            if hub.extra:
+                entry.update(hub.extra)
+            hubs.append(entry)
+        camps = []
+        for camp in self.camps:
+            entry = {"name": camp.name, "location": camp.location}
+            for key in ("population", "severity", "needs"):
+                value = getattr(camp, key)
+                if value is not None:
+                    entry[key] = value
+            if camp.extra:
+                entry.update(camp.extra)
+            if camp.rows is not None:
+                entry["allocations"] = [self.allocations.row(i) for i in camp.rows]
+            camps.append(entry)
+        state = {"hubs": hubs, "relief_camps": camps}
+        if self.extra:
+            state.update(self.extra)
+        return state
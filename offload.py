@@ -0,0 +1,257 @@
+"""
+CPU-heavy planning in a process pool. A job snapshots the inventory
+matrix (and any distance rows it needs) into shared memory, a pool
+process plans over it without the GIL of the serving process, and the
+plan comes back as a compact delta set: (request or queue entry, hub row,
+units) triples. The delta set is applied under the store locks only if the
+stock it draws on is still there; otherwise the job is planned again over
+a fresh snapshot, and after MAX_ATTEMPTS it runs inline instead. Plans are
+applied one at a time on an applier thread of their own, so taking the
+store locks, re-planning or the inline fallback never hold up the pool's
+delivery of other results.
+
+Callers get a job id at once and poll it (see /jobs/<id> in app.py).
+"""
+import bisect
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from batch import solve_batch
+
+MAX_ATTEMPTS = 3
+
+
+class Conflict(Exception):
+    """The state a plan was made from has changed under it."""
+
+
+class SharedArray:
+    """A copy of a numpy array in shared memory; pool processes attach to it by `spec`."""
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=self._shm.buf)[...] = array
+        self.spec = (self._shm.name, array.shape, array.dtype.str)
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+
+@contextmanager
+def attached(spec):
+    """The array behind a SharedArray spec; only valid inside the block."""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        yield np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+    finally:
+        shm.close()
+
+
+def _units(value):
+    """A numpy element as the int or float the hub dicts hold."""
+    value = value.item()
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def _stocked(column, start=0):
+    """Rows with stock in `column`, from `start` wrapping around, as StockIndex.cycle yields them."""
+    rows = np.flatnonzero(column > 0).tolist()
+    split = bisect.bisect_left(rows, start)
+    return rows[split:] + rows[:split]
+
+
+def plan_round_robin(inventory_spec, requests):
+    """
+    /allocate_hub's round-robin over a snapshot. `requests` are (column,
+    units) in priority order. Returns ([(request, hub row, units)],
+    [(request, units unmet)]).
+    """
+    shipments, unmet = [], []
+    with attached(inventory_spec) as shared:
+        units = shared.copy()
+    hub_index = 0
+    for k, (column, needed) in enumerate(requests):
+        if column >= 0:
+            start = hub_index
+            for row in _stocked(units[:, column], hub_index):
+                hub_index = (row + 1) % len(units)
+                sent = min(needed, _units(units[row, column]))
+                units[row, column] -= sent
+                needed -= sent
+                shipments.append((k, row, sent))
+                if needed <= 0:
+                    break
+            else:
+                # A full lap leaves the pointer where it started
+                hub_index = start
+        if needed > 0:
+            unmet.append((k, needed))
+    return shipments, unmet
+
+
+def plan_pending(inventory_spec, queues):
+    """
+    A pending sweep over a snapshot. `queues` maps a column to the units
+    still wanted by its waiting entries, most urgent first; each is filled
+    from the stocked hubs in list order. Returns {column: [(entry, hub row, units)]}.
+    """
+    with attached(inventory_spec) as shared:
+        units = shared.copy()
+    fills = {}
+    for column, wanted in queues.items():
+        rows = iter(_stocked(units[:, column]))
+        row = next(rows, None)
+        for k, remaining in enumerate(wanted):
+            while remaining > 0 and row is not None:
+                sent = min(remaining, _units(units[row, column]))
+                units[row, column] -= sent
+                remaining -= sent
+                fills.setdefault(column, []).append((k, row, sent))
+                if units[row, column] <= 0:
+                    row = next(rows, None)
+            if row is None:
+                break
+    return fills
+
+
+def plan_batch(inventory_spec, distances_spec, requests, columns):
+    """batch.plan_batch over a snapshot; `columns` gives each resource's inventory column."""
+    with attached(inventory_spec) as units, attached(distances_spec) as distances:
+        def supply(resource):
+            column = units[:, columns[resource]]
+            positions = np.flatnonzero(column > 0)
+            return positions, column[positions].astype(np.int64)
+
+        def rows(indexes, positions):
+            return distances[np.ix_(indexes, positions)]
+
+        return solve_batch(requests, supply, rows)
+
+
+class Jobs:
+    """
+    Offloaded jobs by id, the newest `keep` of them. A job is "running"
+    until its plan is applied ("done") or it fails ("failed"); "attempts"
+    counts the plans made. The pool starts on first use.
+    """
+
+    def __init__(self, workers=None, keep=1000):
+        self.workers = workers
+        self.keep = keep
+        self._pool = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._finished = queue.Queue()
+        self._applier = None
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            if self._applier is None:
+                self._applier = threading.Thread(target=self._run, args=(self._finished,),
+                                                 name="offload-applier", daemon=True)
+                self._applier.start()
+            return self._pool
+
+    def _run(self, finished_queue):
+        while True:
+            finished = finished_queue.get()
+            if finished is None:
+                return
+            self._finish(*finished)
+
+    def submit(self, kind, prepare, plan, apply, fallback):
+        """
+        Start a job. `prepare()` returns (plan args, shared arrays to release
+        after planning, context); `plan(*args)` runs in the pool;
+        `apply(result, context)` returns the job's result or raises Conflict;
+        `fallback()` produces the result inline once attempts run out.
+        """
+        job = {"id": f"job-{next(self._ids)}", "kind": kind, "status": "running",
+               "attempts": 0, "submitted": time.time()}
+        with self._lock:
+            self._jobs[job["id"]] = job
+            while len(self._jobs) > self.keep:
+                self._jobs.popitem(last=False)
+        self._start(job, prepare, plan, apply, fallback)
+        return dict(job)
+
+    def _start(self, job, prepare, plan, apply, fallback):
+        job["attempts"] += 1
+        try:
+            args, shared, context = prepare()
+        except Exception as e:
+            self._fail(job, e)
+            return
+        try:
+            future = self._executor().submit(plan, *args)
+        except Exception as e:
+            for array in shared:
+                array.close()
+            self._fail(job, e)
+            return
+
+        # The callback runs on the pool's own thread: only hand the result over
+        future.add_done_callback(
+            lambda future: self._finished.put((job, future, shared, context, prepare, plan, apply, fallback)))
+
+    def _finish(self, job, future, shared, context, prepare, plan, apply, fallback):
+        """Apply a returned plan, re-planning on Conflict; runs on the applier thread."""
+        for array in shared:
+            array.close()
+        try:
+            result = apply(future.result(), context)
+        except Conflict:
+            if job["attempts"] < MAX_ATTEMPTS:
+                self._start(job, prepare, plan, apply, fallback)
+                return
+            try:
+                result = fallback()
+            except Exception as e:
+                self._fail(job, e)
+                return
+            job["inline"] = True
+        except Exception as e:
+            self._fail(job, e)
+            return
+        job.update(result=result, status="done", finished=time.time())
+
+    @staticmethod
+    def _fail(job, error):
+        job.update(status="failed", error=str(error), finished=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else dict(job)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            if self._applier is not None:
+                # A pool started later gets an applier and queue of its own
+                self._finished.put(None)
+                self._finished, self._applier = queue.Queue(), None
+
+
+def shared_inventory(inventory):
+    """The inventory matrix in shared memory, with {resource: column}."""
+    columns = {name: column for column, name in enumerate(inventory.resources.names)}
+    return SharedArray(inventory.units), columns
+
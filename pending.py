@@ -0,0 +1,83 @@
+import heapq
+import itertools
+
+PRIORITY_ORDER = {"children": 1, "elderly": 2, "women": 3, "men": 4}
+
+
+class PendingQueue:
+    """
+    Outstanding "Pending" allocation records, one heap per resource ordered
+    by priority group, then arrival. Entries point at the record by (camp
+    name, index in the camp's allocations), so an inventory change for one
+    resource only looks at the demand waiting on it. A record filled out of
+    order stays in its heap until it reaches the head, but is no longer
+    counted once `resolve` is called for it.
+    """
+
+    def __init__(self):
+        self._heaps = {}
+        self._live = {}
+        self._counter = itertools.count()
+
+    @classmethod
+    def from_camps(cls, relief_camps):
+        queue = cls()
+        for camp in relief_camps:
+            for index, alloc in enumerate(camp.get("allocations", [])):
+                if alloc.get("status") == "Pending" and alloc.get("units_remaining", 0) > 0:
+                    queue.push(camp["name"], index, alloc)
+        return queue
+
+    def push(self, camp_name, index, alloc):
+        rank = PRIORITY_ORDER.get(alloc.get("priority", "men"), 4)
+        entry = (rank, next(self._counter), camp_name, index)
+        heapq.heappush(self._heaps.setdefault(alloc["resource"], []), entry)
+        self._live.setdefault(alloc["resource"], set()).add((camp_name, index))
+
+    def resolve(self, resource, camp_name, index):
+        """The record at (camp name, index) no longer waits, wherever its entry sits."""
+        self._live.get(resource, set()).discard((camp_name, index))
+
+    def peek(self, resource):
+        """(camp name, allocation index) of the most urgent entry, or None."""
+        heap = self._heaps.get(resource)
+        if not heap:
+            return None
+        return heap[0][2], heap[0][3]
+
+    def ordered(self, resource):
+        """Every (camp name, allocation index) waiting on `resource`, most urgent first."""
+        return [(entry[2], entry[3]) for entry in sorted(self._heaps.get(resource, ()))]
+
+    def iter_ordered(self, resource):
+        """
+        Like `ordered`, lazily: walks the heap down from its root, so taking
+        the k-th entry costs O(log k) and nothing is copied or sorted. The
+        queue must not change while it is walked.
+        """
+        heap = self._heaps.get(resource, ())
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            entry, i = heapq.heappop(frontier)
+            yield entry[2], entry[3]
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def pop(self, resource):
+        heap = self._heaps[resource]
+        entry = heapq.heappop(heap)
+        self._live[resource].discard((entry[2], entry[3]))
+        if not heap:
+            del self._heaps[resource]
+            del self._live[resource]
+
+    def count(self, resource):
+        """Records still waiting on `resource`."""
+        return len(self._live.get(resource, ()))
+
+    def resources(self):
+        return list(self._heaps)
+
+    def __len__(self):
+        return sum(len(live) for live in list(self._live.values()))
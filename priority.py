@@ -0,0 +1,132 @@
+import heapq
+import threading
+import time
+
+import numpy as np
+
+# Score = SEVERITY_WEIGHT * severity
+#       + POPULATION_WEIGHT * weighted population / 100
+#       + NEED_WEIGHT * share of stated needs not yet delivered
+#       + TIME_WEIGHT * hours since the last delivery
+SEVERITY_WEIGHT = 10.0
+POPULATION_WEIGHT = 5.0
+NEED_WEIGHT = 30.0
+TIME_WEIGHT = 2.0
+GROUP_WEIGHTS = {"children": 1.0, "elderly": 1.0, "women": 0.6, "men": 0.4}
+
+
+def static_scores(severity, population, unmet):
+    """The time-independent part of the score; works on arrays or scalars."""
+    return SEVERITY_WEIGHT * severity + POPULATION_WEIGHT * population / 100 + NEED_WEIGHT * unmet
+
+
+def _delivered(camp):
+    return sum(alloc["allocated_units"] for alloc in camp.get("allocations", [])
+               if alloc.get("status") != "Pending" and isinstance(alloc.get("allocated_units"), (int, float))
+               and not isinstance(alloc.get("allocated_units"), bool))
+
+
+class CampPriorities:
+    """
+    Priority score of every relief camp from its severity, its population
+    weighted by age group and its unmet needs, plus a term growing with
+    the hours since its last delivery. The terms are held as arrays over
+    all camps and scored in one vectorized pass.
+
+    The time term grows at the same rate for every camp, so a camp's rank
+    only changes when the camp itself changes. The heap is keyed on the
+    score minus TIME_WEIGHT * (last delivery, in hours), so advancing the
+    clock costs nothing. A delivery re-keys one camp in O(log N), and the
+    next most critical camp is read off the heap in O(log N) without
+    re-sorting; ties go to the camp listed first. Stale heap entries are
+    skipped lazily and the heap is rebuilt once they outnumber live ones.
+    """
+
+    def __init__(self, camps, now=None):
+        now = time.time() if now is None else now
+        self._lock = threading.Lock()
+        self.names = [camp["name"] for camp in camps]
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self.severity = np.array([camp.get("severity") or 0 for camp in camps], dtype=float)
+        self.population = np.array([
+            sum(GROUP_WEIGHTS.get(group, 0.0) * count for group, count in (camp.get("population") or {}).items())
+            for camp in camps], dtype=float)
+        self.needs = np.array([sum((camp.get("needs") or {}).values()) for camp in camps], dtype=float)
+        self.delivered = np.array([_delivered(camp) for camp in camps], dtype=float)
+        # Hours on the epoch clock; camps without a "last_delivery" (epoch seconds) start now
+        self.last = np.array([camp.get("last_delivery", now) for camp in camps], dtype=float) / 3600
+        self._versions = [0] * len(self.names)
+        self.rescore()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def _unmet(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.needs > 0, np.clip(1 - self.delivered / self.needs, 0, 1), 0.0)
+
+    def rescore(self):
+        """Recompute every key from the arrays and rebuild the heap."""
+        with self._lock:
+            self.keys = static_scores(self.severity, self.population, self._unmet()) - TIME_WEIGHT * self.last
+            self._versions = [v + 1 for v in self._versions]
+            self._heap = [(-key, i, self._versions[i]) for i, key in enumerate(self.keys.tolist())]
+            heapq.heapify(self._heap)
+
+    def _rekey(self, i):
+        needs = self.needs[i]
+        unmet = min(max(1 - self.delivered[i] / needs, 0.0), 1.0) if needs > 0 else 0.0
+        key = float(static_scores(self.severity[i], self.population[i], unmet) - TIME_WEIGHT * self.last[i])
+        self.keys[i] = key
+        self._versions[i] += 1
+        heapq.heappush(self._heap, (-key, i, self._versions[i]))
+        if len(self._heap) > 2 * len(self.names) + 64:
+            self._heap = [(-k, j, self._versions[j]) for j, k in enumerate(self.keys.tolist())]
+            heapq.heapify(self._heap)
+
+    def delivered_to(self, name, units, now=None):
+        """Record a delivery of `units` to camp `name`; unknown camps are ignored."""
+        i = self._index.get(name)
+        if i is None:
+            return
+        with self._lock:
+            self.delivered[i] += units
+            self.last[i] = (time.time() if now is None else now) / 3600
+            self._rekey(i)
+
+    def score(self, name, now=None):
+        """Current score of camp `name`, or None if it is unknown."""
+        i = self._index.get(name)
+        if i is None:
+            return None
+        return float(self.keys[i]) + TIME_WEIGHT * (time.time() if now is None else now) / 3600
+
+    def top(self, k=1, now=None):
+        """The `k` most critical camps as [(name, score)], highest first, in O(k log N)."""
+        offset = TIME_WEIGHT * (time.time() if now is None else now) / 3600
+        with self._lock:
+            found = []
+            while self._heap and len(found) < k:
+                entry = heapq.heappop(self._heap)
+                if entry[2] == self._versions[entry[1]]:
+                    found.append(entry)
+            for entry in found:
+                heapq.heappush(self._heap, entry)
+        return [(self.names[i], offset - neg_key) for neg_key, i, _ in found]
+
+    def describe(self, name, now=None):
+        """Score of camp `name` with the terms behind it."""
+        i = self._index[name]
+        now = time.time() if now is None else now
+        needs = self.needs[i]
+        return {
+            "camp": name,
+            "score": round(self.score(name, now), 3),
+            "severity": float(self.severity[i]),
+            "weighted_population": float(self.population[i]),
+            "unmet_share": round(float(min(max(1 - self.delivered[i] / needs, 0), 1)) if needs > 0 else 0.0, 4),
+            "hours_since_delivery": round(max(now / 3600 - float(self.last[i]), 0.0), 3),
+        }
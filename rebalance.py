@@ -0,0 +1,139 @@
+"""
+Hub-to-hub rebalancing against pending demand, minimizing when stock
+reaches the camps. A delivery from a hub arrives after the hub's
+"dispatch_hours" (how long a last-mile vehicle takes to leave it, e.g. a
+port or airfield that only receives bulk stock; 0 when not given) plus
+the drive at the fleet speed. Every request still waiting on a resource
+is charged to the hub whose delivery would reach its camp first; hubs
+holding more of the resource than the requests charged to them send the
+excess to hubs holding less, at (close to) the least total hub-to-hub
+distance (transport.balance). A transfer leaves at once, so it is kept
+when the transfer drive plus the delivery from its destination arrives
+before a delivery from its source would, for every camp charged to the
+destination. Without dispatch hours a detour through a hub never wins
+over the direct drive and stock stays where it is.
+
+The work is incremental: the store's change records mark a resource
+dirty when its stock rises while requests wait on it, and a run only
+solves the dirty resources. Hub-to-hub distances are kept in a
+DistanceMatrix with hubs on both sides, so only a hub that is added or
+moves is recomputed, and each camp's fastest hub is cached until the
+hubs or the roads change.
+"""
+import threading
+from collections import deque
+
+import numpy as np
+
+from distance import DistanceMatrix
+from transport import balance
+
+# Fleet speed for deliveries and transfers, km/h (the /plan_routes default)
+FLEET_SPEED_KMH = 40.0
+
+
+class Rebalancer:
+    """Dirty resources, cached distances and a log of the last `keep` transfers."""
+
+    def __init__(self, hubs, keep=1000, speed_kmh=FLEET_SPEED_KMH):
+        self.hub_distances = DistanceMatrix.from_state(hubs, hubs)
+        self.speed_kmh = speed_kmh
+        self.dispatch = {hub["name"]: float(hub.get("dispatch_hours", 0)) for hub in hubs}
+        self._fastest = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self.transfers = deque(maxlen=keep)
+        self.stats = {"runs": 0, "resources_solved": 0, "transfers": 0, "units_moved": 0,
+                      "releases": 0, "units_released": 0}
+
+    def set_hub(self, name, location, dispatch_hours=0):
+        """A hub was added, moved or changed its dispatch hours."""
+        self.hub_distances.set_camp(name, location)
+        self.hub_distances.set_hub(name, location)
+        with self._lock:
+            self.dispatch[name] = float(dispatch_hours)
+            self._fastest.clear()
+
+    def invalidate(self):
+        """Distances changed (roads blocked or reopened): recompute them on next use."""
+        self.hub_distances.invalidate()
+        with self._lock:
+            self._fastest.clear()
+
+    def touch(self, resource):
+        with self._lock:
+            self._dirty.add(resource)
+
+    def take(self, resources=None):
+        """The dirty resources among `resources` (all of them by default), no longer marked."""
+        with self._lock:
+            taken = set(self._dirty) if resources is None else self._dirty.intersection(resources)
+            self._dirty -= taken
+        return taken
+
+    def hours(self, hub_name, km):
+        """Hours until a delivery over `km` from hub `hub_name` arrives."""
+        return self.dispatch.get(hub_name, 0.0) + km / self.speed_kmh
+
+    def fastest(self, camp_name, distances):
+        """Name of the hub whose delivery reaches camp `camp_name` first, from the camps x hubs matrix `distances`."""
+        hub = self._fastest.get(camp_name)
+        if hub is None:
+            wait = np.array([self.dispatch.get(name, 0.0) for name in distances.hub_names])
+            hub = distances.hub_names[int((wait + distances.row(camp_name) / self.speed_kmh).argmin())]
+            with self._lock:
+                self._fastest[camp_name] = hub
+        return hub
+
+    def plan(self, hub_names, units, waiting, camp_km):
+        """
+        Transfers for one resource. `units` is what each hub holds, ordered
+        like `hub_names`; `waiting` is (camp, fastest hub, units) for each
+        waiting request, most urgent first, and `camp_km(camp, hub)` the
+        delivery distance. Only as many units as the hubs hold in all are
+        charged, so when stock is short it moves toward the urgent
+        requests. A transfer is dropped unless, for every camp charged to
+        its destination, it plus the delivery from there arrives before a
+        delivery from its source. Returns [(from, to, units, km)].
+        """
+        index = {name: i for i, name in enumerate(hub_names)}
+        need = np.zeros(len(hub_names))
+        served = {}
+        left = int(np.floor(np.clip(units, 0, None)).sum())
+        for camp, hub, wanted in waiting:
+            if left <= 0:
+                break
+            take = min(wanted, left)
+            need[index[hub]] += take
+            served.setdefault(hub, set()).add(camp)
+            left -= take
+
+        def cost(sources, sinks):
+            # The matrix runs from its hub columns to its rows
+            return self.hub_distances.block([hub_names[j] for j in sinks], [hub_names[i] for i in sources]).T
+
+        moves, _ = balance(units, need, cost)
+        transfers = []
+        for a, b, sent in moves:
+            source, sink = hub_names[a], hub_names[b]
+            km = self.hub_distances.get(sink, source)
+            drive = km / self.speed_kmh
+            if all(drive + self.hours(sink, camp_km(camp, sink)) < self.hours(source, camp_km(camp, source))
+                   for camp in served[sink]):
+                transfers.append((source, sink, sent, km))
+        return transfers
+
+    def logged(self, solved, transfers, released):
+        """Count a run over `solved` resources; its `transfers` are also kept in the log."""
+        with self._lock:
+            self.transfers.extend(transfers)
+            self.stats["runs"] += 1
+            self.stats["resources_solved"] += solved
+            self.stats["transfers"] += len(transfers)
+            self.stats["units_moved"] += sum(t["units"] for t in transfers)
+            self.stats["releases"] += len(released)
+            self.stats["units_released"] += sum(a["allocated_units"] for a in released)
+
+    def summary(self, limit=50):
+        with self._lock:
+            return dict(self.stats, dirty=sorted(self._dirty), recent=list(self.transfers)[-limit:])
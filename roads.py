@@ -0,0 +1,365 @@
+"""
+Road-network distances from a local graph file, for use in place of
+great-circle distance (see geo.set_distance_provider).
+
+The graph file is JSON:
+
+    {
+        "nodes": {"n1": [12.97, 77.59], "n2": [12.98, 77.60], ...},
+        "edges": [
+            {"from": "n1", "to": "n2", "km": 1.6},          # km defaults to the straight line
+            {"from": "n2", "to": "n3", "oneway": true},
+            {"from": "n3", "to": "n4", "blocked": true},
+            ...
+        ]
+    }
+
+Everything is computed locally; nothing is fetched.
+
+    python roads.py grid --rows 100 --cols 100 --out data/roads.json   # synthetic test graph
+    python roads.py route data/roads.json 12.97,77.59 13.05,77.70
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import threading
+from collections import OrderedDict
+from math import inf
+
+import numpy as np
+
+from distance import haversine_matrix
+from geo import haversine_distance
+
+# Stand-in for "no road connects these", large but finite so that sorting,
+# sums and the transportation solver keep working
+UNREACHABLE_KM = 1e6
+
+
+class RoadNetwork:
+    """
+    Shortest road distances over a graph of nodes (lat/lon) and roads
+    (edges, two-way unless "oneway"). A road's length is never taken as
+    shorter than the straight line between its ends, so a road distance
+    is never below the great-circle one and the spatial index's bounds
+    stay valid. Locations are snapped to their nearest node and the
+    straight-line legs to and from it are added.
+
+    Point-to-point queries run A* with ALT bounds: exact distances to and
+    from a few far-apart landmark nodes, computed once at load, give a
+    lower bound on the remaining distance from any node. Blocking roads
+    only makes paths longer, so the bounds stay valid. Whole rows of a
+    matrix use one Dijkstra tree per hub instead.
+
+    Pair costs and trees are kept in LRU caches. Blocking a road drops
+    the cached pairs whose path uses it and the trees that route through
+    it. Unblocking can shorten any path, so it clears both caches.
+    """
+
+    def __init__(self, nodes, edges, landmarks=8, cache_size=65536, tree_cache_size=64):
+        self.ids = list(nodes)
+        self._index = {node: i for i, node in enumerate(self.ids)}
+        self.coords = np.array([nodes[node] for node in self.ids], dtype=float).reshape(-1, 2)
+        self._out = [[] for _ in self.ids]
+        self._in = [[] for _ in self.ids]
+        self._heads, self._tails, self._weights, self._lengths = [], [], [], []
+        self._roads = {}
+        self.blocked = set()
+        self.directed = False
+        self._lock = threading.RLock()
+        self._snaps = {}
+        self._pairs = OrderedDict()
+        self._pairs_by_arc = {}
+        self._trees = OrderedDict()
+        self.cache_size = cache_size
+        self.tree_cache_size = tree_cache_size
+        self.hits = self.misses = 0
+        closed = [edge for edge in edges if self._add_road(edge)]
+        self._landmarks(landmarks)
+        for edge in closed:
+            self.block(edge["from"], edge["to"])
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(path, "r", encoding="utf-8") as f:
+            graph = json.load(f)
+        return cls(graph["nodes"], graph["edges"], **kwargs)
+
+    def _add_road(self, edge):
+        if isinstance(edge, dict):
+            u, v = edge["from"], edge["to"]
+            km, oneway, blocked = edge.get("km"), edge.get("oneway", False), edge.get("blocked", False)
+        else:
+            u, v = edge[0], edge[1]
+            km, oneway, blocked = (edge[2] if len(edge) > 2 else None), False, False
+        a, b = self._index[u], self._index[v]
+        straight = haversine_distance(self.coords[a], self.coords[b])
+        km = straight if km is None else max(float(km), straight)
+        arcs = []
+        for tail, head in ((a, b),) if oneway else ((a, b), (b, a)):
+            arc = len(self._heads)
+            self._tails.append(tail)
+            self._heads.append(head)
+            self._lengths.append(km)
+            self._weights.append(km)
+            self._out[tail].append((head, arc))
+            self._in[head].append((tail, arc))
+            arcs.append(arc)
+        self._roads.setdefault((u, v), []).extend(arcs)
+        if oneway:
+            self.directed = True
+        else:
+            self._roads.setdefault((v, u), []).extend(arcs)
+        return blocked
+
+    def _dijkstra(self, source, reverse=False, weights=None):
+        """(distance, arc into each node on its shortest path) from `source`, or to it if `reverse`."""
+        adjacency = self._in if reverse else self._out
+        weights = self._weights if weights is None else weights
+        dist = [inf] * len(self.ids)
+        via = [-1] * len(self.ids)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, arc in adjacency[u]:
+                nd = d + weights[arc]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    via[v] = arc
+                    heapq.heappush(heap, (nd, v))
+        return dist, via
+
+    def _landmarks(self, count):
+        """
+        Pick far-apart landmarks and keep exact distances from (and to) each,
+        over the roads' full lengths so the bounds hold whatever is blocked.
+        """
+        self._from_landmark = np.empty((0, len(self.ids)))
+        self._to_landmark = np.empty((0, len(self.ids)))
+        if not self.ids or count <= 0:
+            return
+        rows_from, rows_to = [], []
+        nearest = np.full(len(self.ids), inf)
+        landmark = random.Random(0).randrange(len(self.ids))
+        for _ in range(min(count, len(self.ids))):
+            forward = np.array(self._dijkstra(landmark, weights=self._lengths)[0])
+            backward = (np.array(self._dijkstra(landmark, reverse=True, weights=self._lengths)[0])
+                        if self.directed else forward)
+            rows_from.append(forward)
+            rows_to.append(backward)
+            nearest = np.minimum(nearest, np.where(np.isfinite(forward), forward, -1))
+            landmark = int(nearest.argmax())
+            if nearest[landmark] <= 0:
+                break
+        self._from_landmark = np.array(rows_from)
+        self._to_landmark = np.array(rows_to)
+
+    def _potential(self, target):
+        """Lower bound on the distance from every node to `target` (ALT)."""
+        if not len(self._from_landmark):
+            return [0.0] * len(self.ids)
+        # inf - inf (neither reachable from a landmark) is NaN, which fmax skips
+        with np.errstate(invalid="ignore"):
+            ahead = self._from_landmark[:, target:target + 1] - self._from_landmark
+            behind = self._to_landmark - self._to_landmark[:, target:target + 1]
+            bound = np.fmax(np.fmax.reduce(ahead, axis=0), np.fmax.reduce(behind, axis=0))
+        return np.nan_to_num(np.clip(bound, 0, None), nan=0.0, posinf=inf).tolist()
+
+    def _astar(self, source, target):
+        h = self._potential(target)
+        if h[source] == inf:
+            return inf, ()
+        weights = self._weights
+        dist = {source: 0.0}
+        via = {}
+        heap = [(h[source], source)]
+        done = set()
+        while heap:
+            _, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            if u == target:
+                break
+            done.add(u)
+            d = dist[u]
+            for v, arc in self._out[u]:
+                nd = d + weights[arc]
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    via[v] = arc
+                    heapq.heappush(heap, (nd + h[v], v))
+        if target not in dist:
+            return inf, ()
+        arcs, node = [], target
+        while node != source:
+            arcs.append(via[node])
+            node = self._tails[via[node]]
+        return dist[target], tuple(reversed(arcs))
+
+    def node_distance(self, source, target):
+        """Shortest road distance between two node indexes (inf if unreachable), cached."""
+        key = (source, target)
+        with self._lock:
+            cached = self._pairs.get(key)
+            if cached is not None:
+                self._pairs.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+            cost, arcs = self._astar(source, target)
+            self._pairs[key] = (cost, arcs)
+            for arc in arcs:
+                self._pairs_by_arc.setdefault(arc, set()).add(key)
+            while len(self._pairs) > self.cache_size:
+                self._forget(*self._pairs.popitem(last=False))
+            return cost
+
+    def _forget(self, key, entry):
+        for arc in entry[1]:
+            keys = self._pairs_by_arc.get(arc)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._pairs_by_arc[arc]
+
+    def _tree(self, source, reverse=False):
+        key = (source, reverse)
+        with self._lock:
+            tree = self._trees.get(key)
+            if tree is not None:
+                self._trees.move_to_end(key)
+                return tree
+            dist, via = self._dijkstra(source, reverse)
+            tree = self._trees[key] = (np.array(dist), via)
+            while len(self._trees) > self.tree_cache_size:
+                self._trees.popitem(last=False)
+            return tree
+
+    def snap(self, location):
+        """(nearest node index, straight-line km to it)"""
+        key = (float(location[0]), float(location[1]))
+        snapped = self._snaps.get(key)
+        if snapped is None:
+            km = haversine_matrix([key], self.coords)[0]
+            node = int(km.argmin())
+            snapped = self._snaps[key] = (node, float(km[node]))
+        return snapped
+
+    def distance(self, loc1, loc2):
+        """Road distance in km between two locations; UNREACHABLE_KM if no road connects them."""
+        (a, leg_a), (b, leg_b) = self.snap(loc1), self.snap(loc2)
+        cost = self.node_distance(a, b)
+        if cost == inf:
+            return UNREACHABLE_KM
+        # Never shorter than the straight line, e.g. for two points snapped to one node
+        return max(leg_a + cost + leg_b, haversine_distance(loc1, loc2))
+
+    def matrix(self, origins, targets):
+        """(len(origins), len(targets)) road distances from each origin to each target."""
+        origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+        targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+        src = [self.snap(loc) for loc in origins]
+        dst = [self.snap(loc) for loc in targets]
+        src_nodes = np.array([node for node, _ in src], dtype=np.int64)
+        dst_nodes = np.array([node for node, _ in dst], dtype=np.int64)
+        result = np.empty((len(origins), len(targets)))
+        # One tree per distinct node on the smaller side
+        if len(set(src_nodes.tolist())) <= len(set(dst_nodes.tolist())):
+            for i, node in enumerate(src_nodes.tolist()):
+                result[i] = self._tree(node)[0][dst_nodes]
+        else:
+            for j, node in enumerate(dst_nodes.tolist()):
+                result[:, j] = self._tree(node, reverse=True)[0][src_nodes]
+        result += np.array([leg for _, leg in src])[:, None] + np.array([leg for _, leg in dst])[None, :]
+        result = np.maximum(result, haversine_matrix(origins, targets))
+        result[~np.isfinite(result)] = UNREACHABLE_KM
+        return result
+
+    def block(self, u, v, blocked=True):
+        """
+        Close (or reopen) the road between nodes `u` and `v`, both ways
+        unless it is one-way. Returns False if there is no such road.
+        """
+        arcs = self._roads.get((u, v))
+        if not arcs:
+            return False
+        with self._lock:
+            for arc in arcs:
+                self._weights[arc] = inf if blocked else self._lengths[arc]
+                if blocked:
+                    self.blocked.add(arc)
+                else:
+                    self.blocked.discard(arc)
+            if not blocked:
+                self._pairs.clear()
+                self._pairs_by_arc.clear()
+                self._trees.clear()
+                return True
+            for arc in arcs:
+                for key in self._pairs_by_arc.pop(arc, ()):
+                    entry = self._pairs.pop(key, None)
+                    if entry is not None:
+                        self._forget(key, entry)
+            for key, (_, via) in list(self._trees.items()):
+                source, reverse = key
+                if any(via[self._tails[arc] if reverse else self._heads[arc]] == arc for arc in arcs):
+                    del self._trees[key]
+        return True
+
+    def blocked_roads(self):
+        """Blocked roads as [from, to] node id pairs."""
+        return sorted({tuple(sorted((self.ids[self._tails[arc]], self.ids[self._heads[arc]]), key=repr))
+                       for arc in self.blocked}, key=repr)
+
+    def summary(self):
+        return {"nodes": len(self.ids), "arcs": len(self._heads), "landmarks": len(self._from_landmark),
+                "directed": self.directed, "blocked": [list(road) for road in self.blocked_roads()],
+                "cached_pairs": len(self._pairs), "cached_trees": len(self._trees),
+                "cache_hits": self.hits, "cache_misses": self.misses}
+
+
+def grid_graph(rows, cols, origin=(12.5, 77.2), step=0.01, detour=(1.0, 1.6), seed=0):
+    """A rows x cols street grid around `origin` with roads somewhat longer than the straight line."""
+    rng = random.Random(seed)
+    nodes = {f"{r}-{c}": [round(origin[0] + r * step, 6), round(origin[1] + c * step, 6)]
+             for r in range(rows) for c in range(cols)}
+    edges = []
+    for r in range(rows):
+        for c in range(cols):
+            for dr, dc in ((0, 1), (1, 0)):
+                if r + dr < rows and c + dc < cols:
+                    a, b = f"{r}-{c}", f"{r + dr}-{c + dc}"
+                    km = haversine_distance(nodes[a], nodes[b]) * rng.uniform(*detour)
+                    edges.append({"from": a, "to": b, "km": round(km, 4)})
+    return {"nodes": nodes, "edges": edges}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    grid = commands.add_parser("grid", help="write a synthetic street-grid graph file")
+    grid.add_argument("--rows", type=int, default=100)
+    grid.add_argument("--cols", type=int, default=100)
+    grid.add_argument("--out", required=True)
+    route = commands.add_parser("route", help="road distance between two lat,lon points")
+    route.add_argument("graph")
+    route.add_argument("start")
+    route.add_argument("end")
+    args = parser.parse_args()
+
+    if args.command == "grid":
+        directory = os.path.dirname(args.out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(grid_graph(args.rows, args.cols), f)
+    else:
+        network = RoadNetwork.load(args.graph)
+        start = [float(x) for x in args.start.split(",")]
+        end = [float(x) for x in args.end.split(",")]
+        print(f"road {network.distance(start, end):.3f} km, straight line {haversine_distance(start, end):.3f} km")
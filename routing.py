@@ -0,0 +1,258 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from distance import haversine_matrix
+from geo import get_distance_provider
+
+# Improvements smaller than this (km) are not worth another pass; well above
+# float32 rounding, so a neutral move is never taken back and forth
+EPSILON = 1e-3
+
+
+def point_matrix(points, chunk=512):
+    """
+    Distances between all points as float32, computed in row blocks to
+    bound temporaries. With a road provider (geo.set_distance_provider)
+    they are made symmetric by taking the longer direction.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    provider = get_distance_provider()
+    if provider is not None:
+        matrix = provider.matrix(points, points)
+        return np.maximum(matrix, matrix.T).astype(np.float32)
+    matrix = np.empty((len(points), len(points)), dtype=np.float32)
+    for start in range(0, len(points), chunk):
+        matrix[start:start + chunk] = haversine_matrix(points[start:start + chunk], points)
+    return matrix
+
+
+class MatrixCache:
+    """The last few point matrices, keyed by their points, so replanning the same stops skips the O(n^2) build."""
+
+    def __init__(self, size=8):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, points):
+        key = tuple((float(lat), float(lon)) for lat, lon in points)
+        with self._lock:
+            matrix = self._entries.get(key)
+            if matrix is None:
+                matrix = self._entries[key] = point_matrix(points)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+            return matrix
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def route_length(route, matrix):
+    """Length of a closed route given as node indices starting and ending at the depot (0)."""
+    route = np.asarray(route)
+    return float(matrix[route[:-1], route[1:]].astype(float).sum())
+
+
+def nearest_neighbour(matrix, demand, capacity):
+    """
+    Routes from the depot (node 0): each goes to the nearest unserved stop
+    whose demand still fits the vehicle, and returns when none does.
+    `demand[k]` is the load of node k (demand[0] is ignored, each must
+    fit `capacity`). Returns routes as node lists [0, ..., 0].
+    """
+    n = len(matrix)
+    open_ = np.ones(n, dtype=bool)
+    open_[0] = False
+    routes = []
+    while open_.any():
+        route, here, room = [0], 0, capacity
+        while True:
+            fits = open_ & (demand <= room)
+            if not fits.any():
+                break
+            row = np.where(fits, matrix[here], np.inf)
+            here = int(row.argmin())
+            route.append(here)
+            open_[here] = False
+            room -= demand[here]
+        route.append(0)
+        routes.append(route)
+    return routes
+
+
+def two_opt(route, matrix, deadline):
+    """Reverse route segments while that shortens it; returns whether anything changed."""
+    route = np.asarray(route)
+    changed = False
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(len(route) - 3):
+            if time.perf_counter() >= deadline:
+                break
+            a, b = route[i], route[i + 1]
+            c, d = route[i + 2:-1], route[i + 3:]
+            delta = matrix[a, c] + matrix[b, d] - matrix[a, b] - matrix[c, d]
+            j = int(delta.argmin())
+            if delta[j] < -EPSILON:
+                route[i + 1:i + j + 3] = route[i + 1:i + j + 3][::-1].copy()
+                improved = changed = True
+    return route.tolist(), changed
+
+
+def or_opt(route, matrix, deadline, longest=3):
+    """
+    Move runs of 1..`longest` consecutive stops, possibly reversed, to the
+    cheapest other place in the route; returns whether anything changed.
+    """
+    route = list(route)
+    changed = False
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for length in range(1, longest + 1):
+            s = 1
+            while s + length < len(route) and time.perf_counter() < deadline:
+                seg = route[s:s + length]
+                prev, nxt = route[s - 1], route[s + length]
+                removed = matrix[prev, seg[0]] + matrix[seg[-1], nxt] - matrix[prev, nxt]
+                rest = np.array(route[:s] + route[s + length:])
+                p, q = rest[:-1], rest[1:]
+                forward = matrix[p, seg[0]] + matrix[seg[-1], q] - matrix[p, q]
+                backward = matrix[p, seg[-1]] + matrix[seg[0], q] - matrix[p, q]
+                forward[s - 1] = backward[s - 1] = np.inf  # where it came from
+                k_f, k_b = int(forward.argmin()), int(backward.argmin())
+                reverse = backward[k_b] < forward[k_f]
+                k = k_b if reverse else k_f
+                if min(forward[k_f], backward[k_b]) - removed < -EPSILON:
+                    rest = rest.tolist()
+                    route = rest[:k + 1] + (seg[::-1] if reverse else seg) + rest[k + 1:]
+                    improved = changed = True
+                else:
+                    s += 1
+    return route, changed
+
+
+def _edges(routes, which=None):
+    """(from, to, route index) of every edge of the given routes (all by default), as arrays."""
+    which = range(len(routes)) if which is None else which
+    p = np.concatenate([routes[r][:-1] for r in which]).astype(np.int64)
+    q = np.concatenate([routes[r][1:] for r in which]).astype(np.int64)
+    owner = np.repeat(np.asarray(which), [len(routes[r]) - 1 for r in which])
+    return p, q, owner
+
+
+def relocate(routes, demand, capacity, matrix, deadline):
+    """
+    Move single stops into the cheapest place in another route with room
+    for them; routes left empty are dropped, saving a vehicle. Changes
+    `routes` in place and returns whether anything moved.
+    """
+    if not routes:
+        return False
+    loads = np.array([demand[route[1:-1]].sum() for route in routes])
+    changed = False
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        p, q, owner = _edges(routes)
+        span = matrix[p, q]
+        live = np.ones(len(p), dtype=bool)
+        for r in range(len(routes)):
+            s = 1
+            while s < len(routes[r]) - 1 and time.perf_counter() < deadline:
+                route = routes[r]
+                k, prev, nxt = route[s], route[s - 1], route[s + 1]
+                removed = matrix[prev, k] + matrix[k, nxt] - matrix[prev, nxt]
+                row = matrix[k]  # the matrix is symmetric, so gather from one row
+                cost = row[p] + row[q] - span
+                cost[~live | (owner == r) | (loads[owner] + demand[k] > capacity)] = np.inf
+                e = int(cost.argmin())
+                if cost[e] - removed >= -EPSILON:
+                    s += 1
+                    continue
+                target = int(owner[e])
+                routes[target].insert(routes[target].index(int(q[e]), 1) if q[e] else len(routes[target]) - 1, k)
+                del route[s]
+                loads[target] += demand[k]
+                loads[r] -= demand[k]
+                # Retire the two routes' edges and append their new ones
+                live &= (owner != r) & (owner != target)
+                new_p, new_q, new_owner = _edges(routes, [r, target])
+                p, q, owner = np.concatenate([p, new_p]), np.concatenate([q, new_q]), np.concatenate([owner, new_owner])
+                span = np.concatenate([span, matrix[new_p, new_q]])
+                live = np.concatenate([live, np.ones(len(new_p), dtype=bool)])
+                if len(live) > 2 * live.sum() + 64:
+                    p, q, owner, span = p[live], q[live], owner[live], span[live]
+                    live = np.ones(len(p), dtype=bool)
+                improved = changed = True
+    routes[:] = [route for route in routes if len(route) > 2]
+    return changed
+
+
+def plan_routes(depot, stops, capacity, time_budget=1.0, cache=None):
+    """
+    Multi-stop delivery runs from `depot` (a location) to `stops`, given as
+    (location, units) pairs, with vehicles carrying at most `capacity`
+    units. Stops needing more than a vehicle get full out-and-back trips
+    first. Routes are built by nearest neighbour, then improved by moving
+    stops between routes (relocate) and within each route (2-opt and
+    Or-opt) until nothing improves or `time_budget` seconds have passed. Returns routes as lists of (stop index, units) and statistics.
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget
+    points = [depot] + [location for location, _ in stops]
+    matrix = cache.get(points) if cache is not None else point_matrix(points)
+    units = np.array([0] + [u for _, u in stops], dtype=np.int64)
+
+    # Whole vehicle loads go straight out and back; the remainders are routed
+    full = units // capacity
+    full[0] = 0
+    demand = units - full * capacity
+    served = demand > 0
+    served[0] = True
+    nodes = np.nonzero(served)[0]
+
+    routes = [[0, k, 0] for k in np.nonzero(full)[0].tolist() for _ in range(int(full[k]))]
+    trips = len(routes)
+    sub = matrix[np.ix_(nodes, nodes)]
+    built = nearest_neighbour(sub, demand[nodes], capacity)
+    initial = sum(route_length(route, sub) for route in built)
+
+    passes = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        passes += 1
+        improved = relocate(built, demand[nodes], capacity, sub, deadline)
+        for r, route in enumerate(built):
+            if len(route) < 5:
+                continue
+            route, two = two_opt(route, sub, deadline)
+            route, moved = or_opt(route, sub, deadline)
+            built[r] = route
+            improved = improved or two or moved
+    routes += [[int(nodes[k]) for k in route] for route in built]
+
+    result = []
+    for r, route in enumerate(routes):
+        loads = [capacity] if r < trips else [int(demand[k]) for k in route[1:-1]]
+        result.append({"stops": [(k - 1, load) for k, load in zip(route[1:-1], loads)],
+                       "load": sum(loads), "distance_km": round(route_length(route, matrix), 3)})
+    trip_km = sum(route["distance_km"] for route in result[:trips])
+    stats = {
+        "vehicles": len(routes),
+        "total_distance_km": round(sum(route["distance_km"] for route in result), 3),
+        "nearest_neighbour_km": round(trip_km + initial, 3),
+        "improvement_passes": passes,
+        "timed_out": time.perf_counter() >= deadline,
+        "solve_ms": round((time.perf_counter() - start) * 1e3, 2),
+    }
+    return result, stats
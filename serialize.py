@@ -0,0 +1,116 @@
+"""
+JSON encoding for the state file, the journal and API responses. Uses
+orjson when it is installed (DISASTRO_JSON=stdlib forces the standard
+library) and falls back to json for anything orjson refuses, such as
+integers beyond 64 bits. Output is compact unless asked for `pretty`.
+
+    python serialize.py pretty data/hubs.json hubs.pretty.json
+    python serialize.py compact hubs.pretty.json data/hubs.json
+"""
+import argparse
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.environ.get("DISASTRO_JSON", "").lower() == "stdlib":
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+# Raised by loads() for malformed input (orjson's error is a subclass)
+JSONDecodeError = json.JSONDecodeError
+# Bytes per chunk of a streamed response
+CHUNK_SIZE = 64 * 1024
+
+
+def _default(obj):
+    """numpy scalars and arrays, which both encoders otherwise reject."""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(obj, sort_keys, pretty):
+    return json.dumps(obj, sort_keys=sort_keys, default=_default, ensure_ascii=False,
+                      indent=2 if pretty else None, separators=(",", ": ") if pretty else (",", ":"))
+
+
+def dumps(obj, sort_keys=False, pretty=False):
+    """`obj` as UTF-8 JSON bytes."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except TypeError:
+            pass
+    return _stdlib_dumps(obj, sort_keys, pretty).encode("utf-8")
+
+
+def dumps_str(obj, sort_keys=False, pretty=False):
+    """`obj` as a JSON string."""
+    if orjson is not None:
+        return dumps(obj, sort_keys, pretty).decode("utf-8")
+    return _stdlib_dumps(obj, sort_keys, pretty)
+
+
+def loads(data):
+    """Parse JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def iter_array(parts, chunk_size=CHUNK_SIZE):
+    """
+    A JSON list from already serialized elements (str), yielded as UTF-8
+    chunks of about `chunk_size` bytes so the whole body is never built.
+    """
+    yield b"["
+    chunk, size, first = [], 0, True
+    for part in parts:
+        if not first:
+            chunk.append(",")
+            size += 1
+        first = False
+        chunk.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(chunk).encode("utf-8")
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk).encode("utf-8")
+    yield b"]"
+
+
+def export(source, target, pretty=True):
+    """Re-encode a JSON file, e.g. the compact hubs.json as an indented copy for reading."""
+    payload = dumps(load(source), pretty=pretty)
+    with open(target, "wb") as f:
+        f.write(payload)
+    return len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-encode a JSON state file.")
+    parser.add_argument("format", choices=["pretty", "compact"])
+    parser.add_argument("source")
+    parser.add_argument("target")
+    args = parser.parse_args()
+    size = export(args.source, args.target, pretty=args.format == "pretty")
+    print(f"wrote {size} bytes to {args.target} ({BACKEND})")
+
+
+if __name__ == "__main__":
+    main()
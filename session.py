@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+
+
+def _contribution(alloc):
+    units = alloc.get("allocated_units")
+    units = units if isinstance(units, (int, float)) and not isinstance(units, bool) else 0
+    return units, 1 if alloc.get("status") == "Pending" else 0
+
+
+class SessionAllocations:
+    """
+    Allocations made since the server started, as served by
+    /session_allocations: a ring holding the newest `capacity` entries,
+    none older than `max_age` seconds (0 keeps them regardless of age).
+    Evicted entries are appended to `spill_path` as JSON lines; per-camp
+    and per-resource counters keep covering the whole session.
+
+    Positions count every entry ever appended, so a cursor or a "session"
+    event position stays valid after eviction. Every entry is kept
+    alongside its serialized JSON: the full list is one join of
+    pre-serialized parts, rebuilt only after a change, and a page is a
+    join of a slice. `version` moves on every change and serves as the ETag.
+
+    A pending entry is the same dict the camp's history holds, so when it
+    is later filled it changes here too; `refresh` picks that up.
+    """
+
+    def __init__(self, dumps, capacity=10000, max_age=0, spill_path=None, spill_every=1000):
+        self.dumps = dumps
+        self.capacity = capacity
+        self.max_age = max_age
+        self.spill_path = spill_path
+        self.spill_every = spill_every
+        self.lock = threading.Lock()
+        self.version = 0
+        self.first = 0
+        self.evicted = 0
+        self.by_camp = {}
+        self.by_resource = {}
+        self._head = 0
+        self._items = []
+        self._parts = []
+        self._times = []
+        self._positions = {}
+        self._counted = {}
+        self._spill = []
+        self._body = None
+
+    def __len__(self):
+        return len(self._items) - self._head
+
+    @property
+    def total(self):
+        """Entries appended this session, evicted ones included."""
+        return self.first + len(self)
+
+    def _bump(self, alloc, allocations, units, pending):
+        for key, counters in ((alloc.get("allocated_to"), self.by_camp), (alloc.get("resource"), self.by_resource)):
+            counter = counters.get(key)
+            if counter is None:
+                counter = counters[key] = {"allocations": 0, "units": 0, "pending": 0}
+            counter["allocations"] += allocations
+            counter["units"] += units
+            counter["pending"] += pending
+
+    def extend(self, allocations, now=None):
+        """Append entries (caller holds `lock`); returns the position of the first."""
+        now = time.time() if now is None else now
+        start = self.total
+        for alloc in allocations:
+            self._positions[id(alloc)] = self.total
+            self._items.append(alloc)
+            self._parts.append(self.dumps(alloc))
+            self._times.append(now)
+            units, pending = _contribution(alloc)
+            self._bump(alloc, 1, units, pending)
+            self._counted[id(alloc)] = (alloc, units, pending)
+        self._evict(now)
+        self.version += 1
+        self._body = None
+        return start
+
+    def refresh(self, alloc):
+        """
+        Re-count and re-serialize an entry changed in place (caller holds
+        `lock`). Returns its position, or None if it is not retained.
+        """
+        counted = self._counted.get(id(alloc))
+        if counted is not None and counted[0] is alloc:
+            _, old_units, old_pending = counted
+            units, pending = _contribution(alloc)
+            self._bump(alloc, 0, units - old_units, pending - old_pending)
+            if pending or id(alloc) in self._positions:
+                self._counted[id(alloc)] = (alloc, units, pending)
+            else:
+                del self._counted[id(alloc)]
+        position = self._positions.get(id(alloc))
+        if position is None:
+            return None
+        index = self._head + position - self.first
+        if self._items[index] is not alloc:
+            return None
+        self._parts[index] = self.dumps(alloc)
+        self.version += 1
+        self._body = None
+        return position
+
+    def _evict(self, now):
+        drop = max(len(self) - self.capacity, 0)
+        if self.max_age:
+            while drop < len(self) and now - self._times[self._head + drop] > self.max_age:
+                drop += 1
+        if not drop:
+            return
+        for index in range(self._head, self._head + drop):
+            alloc = self._items[index]
+            del self._positions[id(alloc)]
+            # Pending entries stay counted until filled, so their refresh still adjusts the rollups
+            if not self._counted[id(alloc)][2]:
+                del self._counted[id(alloc)]
+            self._spill.append(self._parts[index])
+            self._items[index] = self._parts[index] = None
+        self._head += drop
+        self.first += drop
+        self.evicted += drop
+        if self._head > len(self._items) // 2:
+            del self._items[:self._head], self._parts[:self._head], self._times[:self._head]
+            self._head = 0
+        if len(self._spill) >= self.spill_every:
+            self.flush()
+        self.version += 1
+        self._body = None
+
+    def expire(self, now=None):
+        """Drop entries past `max_age` (caller holds `lock`)."""
+        if self.max_age:
+            self._evict(time.time() if now is None else now)
+
+    def flush(self):
+        """Append evicted entries to the spill file (caller holds `lock`)."""
+        if not self._spill:
+            return
+        if self.spill_path:
+            directory = os.path.dirname(self.spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write("\n".join(self._spill) + "\n")
+        self._spill = []
+
+    def items(self):
+        return self._items[self._head:]
+
+    def parts(self):
+        """The retained entries' serialized JSON, oldest first."""
+        return self._parts[self._head:]
+
+    def body(self):
+        """The retained entries as a JSON list (caller holds `lock`)."""
+        if self._body is None:
+            self._body = "[" + ",".join(self._parts[self._head:]) + "]"
+        return self._body
+
+    def page(self, cursor, limit):
+        """
+        Up to `limit` entries from position `cursor` as JSON, with the cursor
+        to continue from. A cursor before `first` starts at the oldest
+        retained entry; "first" tells the client what it missed.
+        """
+        cursor = max(cursor, self.first)
+        index = self._head + cursor - self.first
+        parts = self._parts[index:index + limit]
+        return ('{"allocations":[' + ",".join(parts) + f'],"first":{self.first},'
+                f'"next_cursor":{cursor + len(parts)},"total":{self.total}}}')
+
+    def rollup(self, camp=None, resource=None):
+        """Session counters for one camp or resource, or all of them."""
+        if camp is not None:
+            return self.by_camp.get(camp, {"allocations": 0, "units": 0, "pending": 0})
+        if resource is not None:
+            return self.by_resource.get(resource, {"allocations": 0, "units": 0, "pending": 0})
+        return {"total": self.total, "retained": len(self), "evicted": self.evicted,
+                "by_camp": self.by_camp, "by_resource": self.by_resource}
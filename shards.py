@@ -0,0 +1,412 @@
+"""
+Sharded deployment: hubs and camps are partitioned by geohash prefix
+across worker processes, each running the app.py handlers over its own
+slice of the state (its own hubs.json and journal). A coordinator routes
+/allocate and /allocate_hub to the shard holding the camp and
+/update_inventory to the shard holding the hub. Demand a camp's shard
+cannot fill is offered to the other shards, nearest first, and the
+result is recorded in the camp's shard as one outcome. A shard that
+ships to another shard's camp records the shipment in its own state
+("shipped_out", with the camp's shard), so each shard's stock and
+records reconcile on their own and survive a restart.
+
+Spillover happens when a request arrives: requests left pending wait for
+stock in their own shard only.
+
+    python shards.py serve --data data/hubs.json --workers 4 --dir data/shards --port 5000
+"""
+import argparse
+import bisect
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import serialize
+from distance import haversine_matrix
+from storage import write_snapshot
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat, lon, precision=4):
+    """The geohash cell of a point; nearby cells mostly share a prefix and sort together."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    cells, value, bits, even = [], 0, 0, True
+    while len(cells) < precision:
+        span, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        mid = (span[0] + span[1]) / 2
+        if coordinate >= mid:
+            value = value * 2 + 1
+            span[0] = mid
+        else:
+            value *= 2
+            span[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            cells.append(GEOHASH_BASE32[value])
+            value = bits = 0
+    return "".join(cells)
+
+
+class ShardMap:
+    """Geohash prefix -> shard. Prefixes not seen when partitioning go with their neighbour in geohash order."""
+
+    def __init__(self, prefixes, shards, precision=4):
+        self.prefixes = dict(prefixes)
+        self.shards = shards
+        self.precision = precision
+        self._sorted = sorted(self.prefixes)
+
+    @classmethod
+    def partition(cls, data, shards, precision=4):
+        """
+        Cut the geohash-ordered cells holding hubs and camps into `shards`
+        contiguous runs with about as many hubs and camps each.
+        """
+        weights = {}
+        for item in data.get("hubs", []) + data.get("relief_camps", []):
+            if item.get("location"):
+                prefix = geohash(item["location"][0], item["location"][1], precision)
+                weights[prefix] = weights.get(prefix, 0) + 1
+        total = sum(weights.values())
+        prefixes, shard, seen = {}, 0, 0
+        for prefix in sorted(weights):
+            prefixes[prefix] = shard
+            seen += weights[prefix]
+            if shard < shards - 1 and seen >= total * (shard + 1) / shards:
+                shard += 1
+        return cls(prefixes, shards, precision)
+
+    def shard_of(self, location):
+        if not location or not self._sorted:
+            return 0
+        prefix = geohash(location[0], location[1], self.precision)
+        shard = self.prefixes.get(prefix)
+        if shard is None:
+            position = bisect.bisect_left(self._sorted, prefix)
+            shard = self.prefixes[self._sorted[min(position, len(self._sorted) - 1)]]
+        return shard
+
+    def split(self, data):
+        """One dataset per shard, hubs and camps placed by location."""
+        parts = [{"hubs": [], "relief_camps": []} for _ in range(self.shards)]
+        for key in ("hubs", "relief_camps"):
+            for item in data.get(key, []):
+                parts[self.shard_of(item.get("location"))][key].append(item)
+        return parts
+
+    def to_dict(self):
+        return {"precision": self.precision, "shards": self.shards, "prefixes": self.prefixes}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["prefixes"], data["shards"], data["precision"])
+
+
+def write_shards(data, shards, directory, precision=4):
+    """Partition `data` into <directory>/shard-<i>/hubs.json plus shards.json; returns the map."""
+    shard_map = ShardMap.partition(data, shards, precision)
+    for index, part in enumerate(shard_map.split(data)):
+        write_snapshot(shard_path(directory, index), serialize.dumps(part))
+    write_snapshot(os.path.join(directory, "shards.json"), serialize.dumps(shard_map.to_dict(), pretty=True))
+    return shard_map
+
+
+def shard_path(directory, index):
+    return os.path.join(directory, f"shard-{index}", "hubs.json")
+
+
+def _worker(path, conn):
+    """A shard: the app's handlers over the state at `path`, serving calls from the coordinator's pipe."""
+    os.environ["DISASTRO_DATA_PATH"] = path
+    import app as disastro
+
+    def state():
+        with disastro.store.lock:
+            return serialize.dumps(disastro.store.data)
+
+    handlers = {
+        "allocate": disastro.allocate_camp,
+        "allocate_hub": disastro.allocate_round_robin,
+        "ship": disastro.ship_to_shard,
+        "update_inventory": disastro.update_hub_inventory,
+        "record": disastro.record_allocations,
+        "state": state,
+    }
+    try:
+        while True:
+            try:
+                op, args = conn.recv()
+            except EOFError:
+                break
+            if op == "stop":
+                break
+            conn.send(handlers[op](*args))
+    finally:
+        disastro.shutdown()
+        conn.close()
+
+
+def _requested(requests):
+    """Valid units asked for per resource, as allocate_camp counts them."""
+    units = {}
+    for req in requests:
+        resource, amount = req.get("resource"), req.get("units")
+        if resource and isinstance(amount, int) and amount > 0:
+            units[resource] = units.get(resource, 0) + amount
+    return units
+
+
+def _shipped(allocations):
+    units = {}
+    for alloc in allocations:
+        amount = alloc.get("allocated_units")
+        if alloc.get("hub") != "N/A" and isinstance(amount, int):
+            units[alloc["resource"]] = units.get(alloc["resource"], 0) + amount
+    return units
+
+
+class Coordinator:
+    """
+    Routes requests to the shard worker processes. Each shard takes one call
+    at a time over its pipe; calls to different shards run in parallel.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "shards.json"), "rb") as f:
+            self.map = ShardMap.from_dict(serialize.loads(f.read()))
+        self.hub_shard = {}
+        self.camp_shard = {}
+        self.camp_location = {}
+        self.hub_locations = []
+        self.stats = {"calls": 0, "short_requests": 0, "spilled_units": 0, "spill_calls": 0}
+        self._stats_lock = threading.Lock()
+        self._conns = []
+        self._locks = []
+        self._processes = []
+        self._pool = None
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.map.shards):
+            conn, child = context.Pipe()
+            process = context.Process(target=_worker, args=(shard_path(self.directory, index), child), daemon=True)
+            process.start()
+            child.close()
+            self._conns.append(conn)
+            self._locks.append(threading.Lock())
+            self._processes.append(process)
+        self._pool = ThreadPoolExecutor(max(self.map.shards, 2))
+        for index, data in enumerate(self._pool.map(self.state, range(self.map.shards))):
+            for hub in data["hubs"]:
+                self.hub_shard[hub["name"]] = index
+            for camp in data["relief_camps"]:
+                self.camp_shard[camp["name"]] = index
+                self.camp_location[camp["name"]] = camp.get("location")
+            self.hub_locations.append(np.array([hub["location"] for hub in data["hubs"]], dtype=float).reshape(-1, 2))
+        return self
+
+    def stop(self):
+        for conn, lock in zip(self._conns, self._locks):
+            with lock:
+                conn.send(("stop", ()))
+        for process in self._processes:
+            process.join(10)
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def call(self, shard, op, *args):
+        with self._locks[shard]:
+            self._conns[shard].send((op, args))
+            return self._conns[shard].recv()
+
+    def state(self, shard):
+        return serialize.loads(self.call(shard, "state"))
+
+    def _count(self, **amounts):
+        with self._stats_lock:
+            for key, amount in amounts.items():
+                self.stats[key] += amount
+
+    def home(self, camp, location=None):
+        shard = self.camp_shard.get(camp)
+        return self.map.shard_of(location or self.camp_location.get(camp)) if shard is None else shard
+
+    def spill_order(self, location, home):
+        """The other shards holding hubs, nearest hub first."""
+        nearest = []
+        for shard, locations in enumerate(self.hub_locations):
+            if shard != home and len(locations):
+                nearest.append((float(haversine_matrix([location], locations).min()), shard))
+        return [shard for _, shard in sorted(nearest)]
+
+    def spill(self, camp, location, short, home):
+        """Fill `short` ({resource: units}) from other shards; returns their allocations and reduces `short`."""
+        filled = []
+        if not location:
+            return filled
+        for shard in self.spill_order(location, home):
+            if not short:
+                break
+            requests = [{"resource": resource, "units": units} for resource, units in short.items()]
+            body, status = self.call(shard, "ship", {"relief_camp": camp, "location": location,
+                                                     "requests": requests}, home)
+            self._count(spill_calls=1)
+            if status != 200:
+                continue
+            for alloc in body:
+                if alloc.get("hub") == "N/A" or not alloc.get("allocated_units"):
+                    continue
+                filled.append(dict(alloc, shard=shard))
+                short[alloc["resource"]] -= alloc["allocated_units"]
+                if short[alloc["resource"]] <= 0:
+                    del short[alloc["resource"]]
+        return filled
+
+    def allocate(self, req_data):
+        """/allocate through the camp's shard, topping up a shortfall from the others."""
+        if not isinstance(req_data, dict):
+            return {"error": "Invalid request data"}, 400
+        camp, location = req_data.get("relief_camp"), req_data.get("location")
+        if not camp or not location or not req_data.get("requests"):
+            return {"error": "Invalid request data"}, 400
+        self._count(calls=1)
+        home = self.home(camp, location)
+        body, status = self.call(home, "allocate", req_data, True)
+        if status != 200 or all(alloc.get("hub") != "N/A" for alloc in body):
+            return body, status
+
+        shipped = _shipped(body)
+        short = {resource: units - shipped.get(resource, 0)
+                 for resource, units in _requested(req_data["requests"]).items() if units > shipped.get(resource, 0)}
+        allocations = [alloc for alloc in body if alloc.get("hub") != "N/A"]
+        before = sum(short.values())
+        allocations += self.spill(camp, location, short, home)
+        self._count(short_requests=1, spilled_units=before - sum(short.values()))
+        for resource in short:
+            allocations.append({"resource": resource, "allocated_to": camp, "hub": "N/A",
+                                "allocated_units": "Not fully allocated"})
+        self.call(home, "record", allocations, False)
+        return allocations, 200
+
+    def _allocate_group(self, shard, requests):
+        body, status = self.call(shard, "allocate_hub", {"requests": requests}, True)
+        if status != 200 or all(alloc.get("status") != "Pending" for alloc in body):
+            return body, status
+        allocations = []
+        for alloc in body:
+            if alloc.get("status") != "Pending":
+                allocations.append(alloc)
+                continue
+            camp, resource = alloc["allocated_to"], alloc["resource"]
+            short = {resource: alloc["units_remaining"]}
+            filled = self.spill(camp, self.camp_location.get(camp), short, shard)
+            for spilled in filled:
+                spilled["status"] = "Allocated"
+            allocations += filled
+            self._count(short_requests=1, spilled_units=alloc["units_remaining"] - short.get(resource, 0))
+            if short:
+                allocations.append(dict(alloc, units_remaining=short[resource]))
+        return self.call(shard, "record", allocations, True), 200
+
+    def allocate_hub(self, req_data):
+        """/allocate_hub: each shard runs its camps' requests; what would be left pending spills first."""
+        requests = req_data.get("requests") if isinstance(req_data, dict) else None
+        if not requests:
+            return {"error": "Invalid request data"}, 400
+        self._count(calls=1)
+        groups = {}
+        for req in requests:
+            groups.setdefault(self.home(req.get("relief_camp"), req.get("location")), []).append(req)
+        allocations = []
+        for body, status in self._pool.map(lambda item: self._allocate_group(*item), groups.items()):
+            if status != 200:
+                return body, status
+            allocations += body
+        return allocations, 200
+
+    def update_inventory(self, req_data):
+        hub = req_data.get("hub_name") if isinstance(req_data, dict) else None
+        self._count(calls=1)
+        return self.call(self.hub_shard.get(hub, 0), "update_inventory", req_data)
+
+    def summary(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {"shards": self.map.shards, "precision": self.map.precision,
+                "hubs": [sum(1 for s in self.hub_shard.values() if s == i) for i in range(self.map.shards)],
+                "camps": [sum(1 for s in self.camp_shard.values() if s == i) for i in range(self.map.shards)],
+                **stats}
+
+
+def create_app(coordinator):
+    from flask import Flask, Response, request
+    from flask_cors import CORS
+
+    app = Flask(__name__)
+    CORS(app)
+
+    def respond(body, status=200):
+        return Response(serialize.dumps(body), status=status, mimetype="application/json")
+
+    @app.route('/allocate', methods=['POST'])
+    def allocate():
+        return respond(*coordinator.allocate(request.get_json(silent=True)))
+
+    @app.route('/allocate_hub', methods=['POST'])
+    def allocate_hub():
+        return respond(*coordinator.allocate_hub(request.get_json(silent=True)))
+
+    @app.route('/update_inventory', methods=['POST'])
+    def update_inventory():
+        return respond(*coordinator.update_inventory(request.get_json(silent=True)))
+
+    @app.route('/hubs.json')
+    def hubs_json():
+        data = {"hubs": [], "relief_camps": []}
+        for part in coordinator._pool.map(coordinator.state, range(coordinator.map.shards)):
+            data["hubs"] += part["hubs"]
+            data["relief_camps"] += part["relief_camps"]
+        return respond(data)
+
+    @app.route('/shards')
+    def shards():
+        return respond(coordinator.summary())
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    split = sub.add_parser("split", help="partition a hubs.json into shard directories")
+    serve = sub.add_parser("serve", help="start the shard workers and the coordinator")
+    for command in (split, serve):
+        command.add_argument("--data", help="hubs.json to partition")
+        command.add_argument("--dir", required=True, help="shard directory")
+        command.add_argument("--workers", type=int, default=os.cpu_count())
+        command.add_argument("--precision", type=int, default=4, help="geohash characters per cell")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.command == "split" or not os.path.exists(os.path.join(args.dir, "shards.json")):
+        if not args.data:
+            parser.error("--data is required to partition")
+        shard_map = write_shards(serialize.load(args.data), args.workers, args.dir, args.precision)
+        print(f"partitioned {args.data} into {shard_map.shards} shards under {args.dir}")
+    if args.command == "serve":
+        coordinator = Coordinator(args.dir).start()
+        try:
+            create_app(coordinator).run(host=args.host, port=args.port, threaded=True)
+        finally:
+            coordinator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import heapq
+from math import asin, cos, inf, pi, radians, sin
+
+from geo import EARTH_RADIUS_KM, calculate_distance
+
+
+class HubIndex:
+    """
+    Lat/lon grid over hub locations. `nearest` walks rings of cells outward
+    from the query point and yields hubs in increasing great-circle distance,
+    so a caller that stops after the first few hubs never touches the rest.
+
+    Hubs can be added, moved and removed at any time; a lookup in progress
+    simply sees the grid as it is when each ring is visited.
+    """
+
+    def __init__(self, cell_deg=0.1):
+        self.cell_deg = cell_deg
+        self._nrows = int(round(180 / cell_deg))
+        self._ncols = int(round(360 / cell_deg))
+        self._rows = {}
+        self._where = {}
+
+    @classmethod
+    def from_hubs(cls, hubs, cell_deg=0.1):
+        index = cls(cell_deg)
+        for hub in hubs:
+            index.add(hub["name"], hub["location"])
+        return index
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, name):
+        return name in self._where
+
+    def _cell(self, lat, lon):
+        row = min(int((lat + 90) / self.cell_deg), self._nrows - 1)
+        col = int(((lon + 180) % 360) / self.cell_deg) % self._ncols
+        return row, col
+
+    def add(self, name, location):
+        """Insert a hub, or move it if it is already indexed."""
+        if name in self._where:
+            self.remove(name)
+        row, col = self._cell(location[0], location[1])
+        self._rows.setdefault(row, {}).setdefault(col, {})[name] = location
+        self._where[name] = (row, col)
+
+    def remove(self, name):
+        cell = self._where.pop(name, None)
+        if cell is None:
+            return
+        row, col = cell
+        cols = self._rows[row]
+        del cols[col][name]
+        if not cols[col]:
+            del cols[col]
+            if not cols:
+                del self._rows[row]
+
+    def _ring(self, row0, col0, r):
+        """Hubs in the cells exactly `r` cells away from (row0, col0)."""
+        found = []
+        # Once a ring spans every column it is cheaper to take whole rows;
+        # `nearest` drops hubs it has already seen.
+        wraps = 2 * r + 1 >= self._ncols
+        lo = col0 - r
+        for row in range(row0 - r, row0 + r + 1):
+            cols = self._rows.get(row)
+            if not cols:
+                continue
+            if wraps:
+                candidates = cols.values()
+            elif row in (row0 - r, row0 + r):
+                candidates = [v for c, v in cols.items() if (c - lo) % self._ncols <= 2 * r]
+            else:
+                candidates = [cols[c] for c in {(col0 - r) % self._ncols, (col0 + r) % self._ncols} if c in cols]
+            for points in candidates:
+                found.extend(points.items())
+        return found
+
+    def _bound(self, lat, lon, row0, col0, r):
+        """Lower bound on the distance to any hub outside rings 0..r."""
+        bound = inf
+        lat_lo = (row0 - r) * self.cell_deg - 90
+        lat_hi = (row0 + r + 1) * self.cell_deg - 90
+        if lat_lo > -90:
+            bound = min(bound, radians(lat - lat_lo) * EARTH_RADIUS_KM)
+        if lat_hi < 90:
+            bound = min(bound, radians(lat_hi - lat) * EARTH_RADIUS_KM)
+        if 2 * r + 1 < self._ncols:
+            offset = (lon + 180) % 360 - col0 * self.cell_deg
+            dlon = radians(min(offset + r * self.cell_deg, (r + 1) * self.cell_deg - offset))
+            # Distance from the query point to the nearest meridian outside the box.
+            cross = cos(radians(lat)) * sin(min(dlon, pi / 2))
+            bound = min(bound, asin(min(1.0, max(0.0, cross))) * EARTH_RADIUS_KM)
+        return bound
+
+    def nearest(self, location, accept=None):
+        """
+        Yield (distance_km, hub_name) in increasing distance from `location`.
+        `accept` filters hubs by name, e.g. to skip hubs out of a resource.
+        """
+        lat, lon = location[0], location[1]
+        row0, col0 = self._cell(lat, lon)
+        heap = []
+        visited = set()
+        r = 0
+        max_r = max(self._nrows, self._ncols)
+        while True:
+            exhausted = r > max_r
+            if not exhausted:
+                for name, loc in self._ring(row0, col0, r):
+                    if name not in visited:
+                        visited.add(name)
+                        heapq.heappush(heap, (calculate_distance(location, loc), name))
+                if len(visited) >= len(self._where) and all(n in visited for n in self._where):
+                    exhausted = True
+            bound = inf if exhausted else self._bound(lat, lon, row0, col0, r)
+            while heap and heap[0][0] <= bound:
+                distance, name = heapq.heappop(heap)
+                if name in self._where and (accept is None or accept(name)):
+                    yield distance, name
+            if exhausted:
+                return
+            r += 1
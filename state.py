@@ -0,0 +1,270 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+from metrics import span
+from model import AllocationTable, CampAllocations, compact_allocations
+from storage import JsonStorage
+
+log = logging.getLogger("disastro.state")
+
+
+class ResourceLocks:
+    """
+    One re-entrant lock per resource name. `hold(resources)` takes the locks
+    for just those resources, always in sorted order so two callers can
+    never deadlock. Entering the object itself takes every lock, for work
+    that must see or change the whole state at once.
+    """
+
+    def __init__(self):
+        self._guard = threading.RLock()
+        self._locks = {}
+        self._held = threading.local()
+
+    def _get(self, name):
+        lock = self._locks.get(name)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault(name, threading.RLock())
+        return lock
+
+    @contextmanager
+    def hold(self, resources):
+        locks = [self._get(name) for name in sorted(set(resources), key=repr)]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def __enter__(self):
+        self._guard.acquire()
+        locks = [self._locks[name] for name in sorted(self._locks, key=repr)]
+        for lock in locks:
+            lock.acquire()
+        stack = getattr(self._held, "stack", None)
+        if stack is None:
+            stack = self._held.stack = []
+        stack.append(locks)
+        return self
+
+    def __exit__(self, *exc):
+        for lock in reversed(self._held.stack.pop()):
+            lock.release()
+        self._guard.release()
+        return False
+
+
+class StateStore:
+    """
+    Process-resident copy of the hubs and relief camps. Handlers change it
+    through the mutation methods below, which update memory and hand a
+    change record to the storage backend (storage.py): by default hubs.json
+    plus its journal, or a SQLite database. A background thread flushes the
+    records in batches and, once `compact_every` have been written, compacts
+    the backend. On startup the state is loaded back from the backend.
+    Camps' allocation histories are CampAllocations (model.py): settled
+    records are kept as rows of one AllocationTable, not as dicts.
+
+    Callers hold `locked(resources)` for the resources they touch, so
+    requests for different resources run side by side; `lock` covers
+    everything and is used for snapshots and structural changes.
+    """
+
+    def __init__(self, path, flush_interval=1.0, compact_every=10000, storage=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.lock = ResourceLocks()
+        self._seq_lock = threading.Lock()
+        self._alloc_lock = threading.Lock()
+        self._batch = threading.local()
+        self.storage = storage if storage is not None else JsonStorage(path)
+        with span("state.load"):
+            self.data, self.seq = self.storage.load()
+        # Settled allocation records live as rows of one table rather than dicts
+        self.allocations = AllocationTable()
+        compact_allocations(self.relief_camps, self.allocations)
+        self._index_names()
+        self._snapshot_seq = self.seq
+        self._listeners = []
+        self._write_lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _index_names(self):
+        # Stock indexes address hubs by name and by position alike, so two
+        # hubs sharing a name would have stock taken from the wrong one
+        self._hubs_by_name = {}
+        for hub in self.hubs:
+            if hub.get("name") in self._hubs_by_name:
+                raise ValueError(f"Duplicate hub name in {self.path}: {hub.get('name')!r}")
+            self._hubs_by_name[hub.get("name")] = hub
+        self._camps_by_name = {}
+        for camp in self.relief_camps:
+            self._camps_by_name.setdefault(camp.get("name"), camp)
+
+    @property
+    def hubs(self):
+        return self.data["hubs"]
+
+    @property
+    def relief_camps(self):
+        return self.data["relief_camps"]
+
+    def hub(self, name):
+        return self._hubs_by_name.get(name)
+
+    def camp(self, name):
+        return self._camps_by_name.get(name)
+
+    def locked(self, resources=None):
+        """Hold the locks for `resources`, or for everything when None."""
+        return self.lock if resources is None else self.lock.hold(resources)
+
+    def subscribe(self, listener):
+        """Call `listener(record)` after every change, e.g. to keep an index current."""
+        self._listeners.append(listener)
+
+    def _journal(self, record):
+        batch = getattr(self._batch, "records", None)
+        with self._seq_lock:
+            self.seq += 1
+            record["seq"] = self.seq
+            if batch is None:
+                self.storage.append(record)
+            else:
+                batch.append(record)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Journal the changes made in this thread inside the block as one
+        "batch" record, so the backend stores all of them or none. Memory
+        and listeners still see each change as it is made; the caller holds
+        the locks for what it changes. Nested blocks join the outer one.
+        Keep allocations out: a camp's allocation indexes depend on the order
+        its appends replay in, which a batch committed later would change.
+        """
+        if getattr(self._batch, "records", None) is not None:
+            yield
+            return
+        self._batch.records = []
+        try:
+            yield
+        finally:
+            records, self._batch.records = self._batch.records, None
+            if records:
+                # A seq of its own keeps the backend's records in seq order
+                with self._seq_lock:
+                    self.seq += 1
+                    self.storage.append({"op": "batch", "records": records, "seq": self.seq})
+
+    def _notify(self, record):
+        for listener in self._listeners:
+            listener(record)
+
+    def _record(self, record):
+        self._journal(record)
+        self._notify(record)
+
+    def add_hub(self, hub):
+        """Register a new hub, or update the location/resources of an existing one."""
+        with self.lock:
+            existing = self.hub(hub["name"])
+            if existing is None:
+                existing = dict(hub)
+                existing.setdefault("resources", {})
+                self.hubs.append(existing)
+                self._hubs_by_name[existing["name"]] = existing
+            else:
+                existing.update(hub)
+            self._record({"op": "hub", "hub": dict(existing, resources=dict(existing["resources"]))})
+            return existing
+
+    def adjust_inventory(self, hub, resource, delta):
+        with self.lock.hold([resource]):
+            hub["resources"][resource] = hub["resources"].get(resource, 0) + delta
+            self._record({"op": "inventory", "hub": hub["name"], "resource": resource, "delta": delta})
+
+    def set_inventory(self, hub, resource, value):
+        with self.lock.hold([resource]):
+            hub["resources"][resource] = value
+            self._record({"op": "inventory", "hub": hub["name"], "resource": resource, "value": value})
+
+    def add_allocation(self, camp_name, alloc):
+        """Append `alloc` to the named camp's history; returns its index or None."""
+        camp = self.camp(camp_name)
+        if camp is None:
+            return None
+        record = {"op": "alloc", "camp": camp_name, "alloc": dict(alloc)}
+        with self.lock.hold([alloc["resource"]]):
+            # Replay re-appends in journal order, so append and journal together.
+            with self._alloc_lock:
+                if "allocations" not in camp:
+                    camp["allocations"] = CampAllocations(self.allocations)
+                camp["allocations"].append(alloc)
+                index = len(camp["allocations"]) - 1
+                self._journal(record)
+            self._notify(record)
+        return index
+
+    def add_shipment(self, shipment):
+        """Record stock sent to a camp held elsewhere (another shard), in data["shipped_out"]."""
+        with self.lock.hold([shipment["resource"]]):
+            self.data.setdefault("shipped_out", []).append(shipment)
+            self._record({"op": "shipment", "shipment": dict(shipment)})
+
+    def update_allocation(self, camp_name, index, **fields):
+        alloc = self.camp(camp_name)["allocations"][index]
+        with self.lock.hold([alloc["resource"]]):
+            alloc.update(fields)
+            self._record({"op": "alloc_update", "camp": camp_name, "index": index, "fields": fields})
+
+    def flush(self):
+        """Write buffered change records, compacting once enough have built up."""
+        with self._write_lock:
+            with span("storage.flush"):
+                written = self.storage.flush()
+            if self.storage.size >= self.compact_every:
+                self.compact()
+            return written
+
+    def compact(self):
+        """Compact the backend, e.g. fold the journal into a fresh hubs.json snapshot."""
+        with self._write_lock:
+            with self.lock:
+                self.storage.flush()
+                seq = self.seq
+                if seq == self._snapshot_seq:
+                    return False
+                with span("state.snapshot"):
+                    snapshot = self.storage.snapshot(self.data, seq)
+            with span("storage.compact"):
+                self.storage.compact(snapshot)
+            self._snapshot_seq = seq
+            return True
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="state-flusher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Error saving data")
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.compact()
+        self.storage.close()
@@ -0,0 +1,393 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import serialize
+from journal import Journal, apply_record
+
+log = logging.getLogger("disastro.storage")
+
+
+def load_snapshot(path):
+    try:
+        return serialize.load(path)
+    except (FileNotFoundError, serialize.JSONDecodeError) as e:
+        log.error("Error loading data: %s", e)
+        return {"hubs": [], "relief_camps": []}
+
+
+def write_snapshot(path, payload):
+    """
+    Write the serialized state (bytes or str) next to the target file and
+    rename it into place, so readers never see a half-written hubs.json.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".hubs-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _by_name(items):
+    named = {}
+    for item in items:
+        named.setdefault(item.get("name"), item)
+    return named
+
+
+class JsonStorage:
+    """
+    hubs.json as a snapshot plus an append-only journal of the changes made
+    since (hubs.json.journal). Compaction rewrites the snapshot and empties
+    the journal.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal = Journal(path + ".journal")
+
+    @property
+    def size(self):
+        return self.journal.size
+
+    def load(self):
+        """Return (data, seq): the snapshot with the journal replayed on top."""
+        data = load_snapshot(self.path)
+        data.setdefault("hubs", [])
+        data.setdefault("relief_camps", [])
+        seq = data.pop("journal_seq", 0)
+        hubs_by_name, camps_by_name = _by_name(data["hubs"]), _by_name(data["relief_camps"])
+        for record in self.journal.read(after_seq=seq):
+            apply_record(record, data, hubs_by_name, camps_by_name)
+            seq = record["seq"]
+            self.journal.size += 1
+        return data, seq
+
+    def append(self, record):
+        self.journal.append(record)
+
+    def flush(self):
+        return self.journal.flush()
+
+    def snapshot(self, data, seq):
+        """
+        Serialize `data`, compactly (see serialize.py for a pretty copy);
+        called with the state locked, so keep it to the encoding.
+        """
+        return serialize.dumps(dict(data, journal_seq=seq))
+
+    def compact(self, snapshot):
+        write_snapshot(self.path, snapshot)
+        # Records newer than the snapshot are still buffered, so the file on
+        # disk holds nothing the snapshot does not already cover.
+        self.journal.reset()
+
+    def close(self):
+        pass
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+CREATE TABLE IF NOT EXISTS hubs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    lat,
+    lon,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS inventory (
+    hub_id INTEGER NOT NULL REFERENCES hubs(id),
+    resource TEXT NOT NULL,
+    units NOT NULL,
+    UNIQUE (hub_id, resource)
+);
+CREATE INDEX IF NOT EXISTS inventory_by_resource ON inventory(resource, units);
+CREATE TABLE IF NOT EXISTS camps (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    lat,
+    lon,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS allocations (
+    camp_id INTEGER NOT NULL REFERENCES camps(id),
+    idx INTEGER NOT NULL,
+    resource TEXT,
+    status TEXT,
+    hub TEXT,
+    record TEXT NOT NULL,
+    PRIMARY KEY (camp_id, idx)
+);
+CREATE INDEX IF NOT EXISTS allocations_pending ON allocations(resource) WHERE status = 'Pending';
+CREATE TABLE IF NOT EXISTS shipments (
+    id INTEGER PRIMARY KEY,
+    record TEXT NOT NULL
+);
+"""
+
+
+class SqliteStorage:
+    """
+    Hubs, camps, inventory and allocation history in a SQLite database in
+    WAL mode, one row per hub, camp, (hub, resource) and allocation, with
+    names and pending allocations indexed. Buffered change records are
+    applied in a single transaction per flush, so the tables only ever
+    move from one flushed state to the next.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Only the store's writer uses the connection, under its write lock.
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def is_empty(self):
+        return self.conn.execute("SELECT NOT EXISTS (SELECT 1 FROM meta)").fetchone()[0] == 1
+
+    def _meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    @staticmethod
+    def _set_meta(conn, key, value):
+        conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                     "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, value))
+
+    @staticmethod
+    def _split(item, known):
+        location = item.get("location") or (None, None)
+        extra = {k: v for k, v in item.items() if k not in known}
+        return location[0], location[1], serialize.dumps_str(extra)
+
+    @staticmethod
+    def _join(name, lat, lon, extra):
+        item = {"name": name}
+        if lat is not None:
+            item["location"] = [lat, lon]
+        item.update(serialize.loads(extra))
+        return item
+
+    def load(self):
+        """Return (data, seq) rebuilt from the tables."""
+        data = serialize.loads(self._meta("extra", "{}"))
+        hubs, by_id = [], {}
+        for hub_id, name, lat, lon, extra in self.conn.execute(
+                "SELECT id, name, lat, lon, extra FROM hubs ORDER BY id"):
+            hub = self._join(name, lat, lon, extra)
+            hub["resources"] = {}
+            hubs.append(hub)
+            by_id[hub_id] = hub
+        for hub_id, resource, units in self.conn.execute(
+                "SELECT hub_id, resource, units FROM inventory ORDER BY rowid"):
+            by_id[hub_id]["resources"][resource] = units
+
+        camps, by_id = [], {}
+        for camp_id, name, lat, lon, extra in self.conn.execute(
+                "SELECT id, name, lat, lon, extra FROM camps ORDER BY id"):
+            camp = self._join(name, lat, lon, extra)
+            camp["allocations"] = []
+            camps.append(camp)
+            by_id[camp_id] = camp
+        for camp_id, record in self.conn.execute(
+                "SELECT camp_id, record FROM allocations ORDER BY camp_id, idx"):
+            by_id[camp_id]["allocations"].append(serialize.loads(record))
+
+        data["hubs"] = hubs
+        data["relief_camps"] = camps
+        shipped = [serialize.loads(record) for record, in self.conn.execute("SELECT record FROM shipments ORDER BY id")]
+        if shipped:
+            data["shipped_out"] = shipped
+        return data, self._meta("seq", 0)
+
+    def import_state(self, data, seq=0):
+        """Replace the database contents with `data` (as loaded from hubs.json)."""
+        with self._transaction() as conn:
+            for table in ("shipments", "allocations", "camps", "inventory", "hubs", "meta"):
+                conn.execute(f"DELETE FROM {table}")
+            for hub in data.get("hubs", []):
+                self._put_hub(conn, hub)
+            for camp in data.get("relief_camps", []):
+                cur = conn.execute("INSERT OR IGNORE INTO camps (name, lat, lon, extra) VALUES (?, ?, ?, ?)",
+                                   (camp["name"], *self._split(camp, ("name", "location", "allocations"))))
+                if not cur.rowcount:
+                    continue
+                conn.executemany(
+                    "INSERT INTO allocations (camp_id, idx, resource, status, hub, record) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(cur.lastrowid, idx, alloc.get("resource"), alloc.get("status"), alloc.get("hub"), serialize.dumps_str(alloc))
+                     for idx, alloc in enumerate(camp.get("allocations", []))])
+            conn.executemany("INSERT INTO shipments (record) VALUES (?)",
+                             [(serialize.dumps_str(shipment),) for shipment in data.get("shipped_out", [])])
+            extra = {k: v for k, v in data.items() if k not in ("hubs", "relief_camps", "shipped_out", "journal_seq")}
+            self._set_meta(conn, "extra", serialize.dumps_str(extra))
+            self._set_meta(conn, "seq", seq)
+
+    def _put_hub(self, conn, hub):
+        lat, lon, extra = self._split(hub, ("name", "location", "resources"))
+        conn.execute("INSERT INTO hubs (name, lat, lon, extra) VALUES (?, ?, ?, ?) "
+                     "ON CONFLICT (name) DO UPDATE SET lat = excluded.lat, lon = excluded.lon, extra = excluded.extra",
+                     (hub["name"], lat, lon, extra))
+        hub_id = self._hub_id(conn, hub["name"])
+        resources = hub.get("resources", {})
+        conn.executemany(
+            "INSERT INTO inventory (hub_id, resource, units) VALUES (?, ?, ?) "
+            "ON CONFLICT (hub_id, resource) DO UPDATE SET units = excluded.units",
+            [(hub_id, resource, units) for resource, units in resources.items()])
+        conn.execute(f"DELETE FROM inventory WHERE hub_id = ? AND resource NOT IN ({','.join('?' * len(resources))})",
+                     (hub_id, *resources))
+
+    @staticmethod
+    def _hub_id(conn, name):
+        row = conn.execute("SELECT id FROM hubs WHERE name = ?", (name,)).fetchone()
+        return row and row[0]
+
+    @staticmethod
+    def _camp_id(conn, name):
+        row = conn.execute("SELECT id FROM camps WHERE name = ?", (name,)).fetchone()
+        return row and row[0]
+
+    def _apply(self, conn, record):
+        """The SQL counterpart of journal.apply_record."""
+        op = record.get("op")
+        if op == "batch":
+            for inner in record["records"]:
+                self._apply(conn, inner)
+        elif op == "hub":
+            self._put_hub(conn, record["hub"])
+        elif op == "inventory":
+            hub_id = self._hub_id(conn, record["hub"])
+            if hub_id is None:
+                return
+            if "value" in record:
+                update, units = "excluded.units", record["value"]
+            else:
+                update, units = "units + excluded.units", record["delta"]
+            conn.execute("INSERT INTO inventory (hub_id, resource, units) VALUES (?, ?, ?) "
+                         f"ON CONFLICT (hub_id, resource) DO UPDATE SET units = {update}",
+                         (hub_id, record["resource"], units))
+        elif op == "alloc":
+            camp_id = self._camp_id(conn, record["camp"])
+            if camp_id is None:
+                return
+            alloc = record["alloc"]
+            conn.execute("INSERT INTO allocations (camp_id, idx, resource, status, hub, record) "
+                         "SELECT ?, COALESCE(MAX(idx) + 1, 0), ?, ?, ?, ? FROM allocations WHERE camp_id = ?",
+                         (camp_id, alloc.get("resource"), alloc.get("status"), alloc.get("hub"),
+                          serialize.dumps_str(alloc), camp_id))
+        elif op == "alloc_update":
+            camp_id = self._camp_id(conn, record["camp"])
+            row = camp_id and conn.execute("SELECT record FROM allocations WHERE camp_id = ? AND idx = ?",
+                                           (camp_id, record["index"])).fetchone()
+            if not row:
+                return
+            alloc = serialize.loads(row[0])
+            alloc.update(record["fields"])
+            conn.execute("UPDATE allocations SET resource = ?, status = ?, hub = ?, record = ? "
+                         "WHERE camp_id = ? AND idx = ?",
+                         (alloc.get("resource"), alloc.get("status"), alloc.get("hub"),
+                          serialize.dumps_str(alloc), camp_id, record["index"]))
+        elif op == "shipment":
+            conn.execute("INSERT INTO shipments (record) VALUES (?)", (serialize.dumps_str(record["shipment"]),))
+
+    def append(self, record):
+        with self._lock:
+            self._pending.append(record)
+
+    def flush(self):
+        """Apply buffered records in one transaction. Returns how many were applied."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        try:
+            with self._transaction() as conn:
+                for record in pending:
+                    self._apply(conn, record)
+                self._set_meta(conn, "seq", pending[-1]["seq"])
+        except BaseException:
+            # Keep the batch so the next flush retries it.
+            with self._lock:
+                self._pending[:0] = pending
+            raise
+        self.size += len(pending)
+        return len(pending)
+
+    def snapshot(self, data, seq):
+        return None
+
+    def compact(self, snapshot):
+        """The tables are always current; fold the WAL back into the database file."""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.size = 0
+
+    def close(self):
+        self.conn.close()
+
+
+def open_storage(kind, path):
+    """
+    The backend for `kind` ("json" or "sqlite") keeping the state found at
+    `path` (hubs.json). The SQLite database lives next to it (hubs.db) and
+    is migrated from the JSON snapshot and journal the first time it is used.
+    """
+    if kind == "json":
+        return JsonStorage(path)
+    if kind == "sqlite":
+        storage = SqliteStorage(os.path.splitext(path)[0] + ".db")
+        if storage.is_empty() and os.path.exists(path):
+            storage.import_state(*JsonStorage(path).load())
+        return storage
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def migrate(json_path, db_path):
+    """Copy hubs.json, with its journal replayed, into a SQLite database."""
+    storage = SqliteStorage(db_path)
+    try:
+        data, seq = JsonStorage(json_path).load()
+        storage.import_state(data, seq)
+        return len(data["hubs"]), len(data["relief_camps"])
+    finally:
+        storage.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        sys.exit("usage: python storage.py hubs.json hubs.db")
+    hubs, camps = migrate(sys.argv[1], sys.argv[2])
+    print(f"Migrated {hubs} hubs and {camps} relief camps to {sys.argv[2]}")
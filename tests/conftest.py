@@ -0,0 +1,35 @@
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app loads its store on import; keep that one (and its session file) out of the repo
+os.environ.setdefault("DISASTRO_DATA_PATH", os.path.join(tempfile.mkdtemp(), "hubs.json"))
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    """hubs.json with two hubs and one camp, in a fresh directory."""
+    path = tmp_path / "hubs.json"
+    path.write_text(json.dumps({
+        "hubs": [
+            {"name": "Hub A", "location": [12.97, 77.59], "resources": {"water": 0, "food": 10}},
+            {"name": "Hub B", "location": [12.98, 77.60], "resources": {"water": 20}},
+        ],
+        "relief_camps": [
+            {"name": "Camp X", "location": [12.975, 77.595], "allocations": []},
+        ],
+    }), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def disastro(data_path):
+    """The app module with its store and indexes loaded from `data_path`."""
+    import app
+    app.init_store(data_path, "json")
+    yield app
+    app.store.close()
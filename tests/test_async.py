@@ -0,0 +1,83 @@
+import asyncio
+import copy
+
+import async_app
+
+
+def allocate(camp, *requests):
+    return {"relief_camp": camp, "location": [12.975, 77.595],
+            "requests": [{"resource": resource, "units": units} for resource, units in requests]}
+
+
+CALLS = [
+    ("/allocate", allocate("Camp X", ("water", 8), ("food", 4))),
+    ("/allocate", None),
+    ("/allocate", allocate("Camp X", ("water", 15), ("food", 9))),
+    ("/update_inventory", {"hub_name": "Hub A", "update_type": "add", "resources": {"water": 6}}),
+    ("/update_inventory", {"hub_name": "Nowhere", "update_type": "add", "resources": {"water": 6}}),
+    ("/update_inventory", {"hub_name": "Hub B", "update_type": "bad", "resources": {"water": 6}}),
+    ("/allocate_hub", {"requests": [{"relief_camp": "Camp X", "resource": "water", "units": 3}]}),
+    ("/allocate_hub", {"requests": "not a list"}),
+]
+
+
+def test_merged_batch_matches_one_call_at_a_time(disastro, data_path, tmp_path):
+    with open(data_path, encoding="utf-8") as f:
+        original = f.read()
+    merged = async_app._run_batch(copy.deepcopy(CALLS))
+    merged_hubs = copy.deepcopy(disastro.store.hubs)
+    merged_history = copy.deepcopy(disastro.store.camp("Camp X")["allocations"].tolist())
+
+    # Invalid calls are answered on their own, the rest go through
+    assert [status for _, status in merged] == [200, 500, 200, 200, 404, 400, 200, 400]
+    assert merged_hubs[0]["resources"] == {"water": 3, "food": 0}
+    assert merged_hubs[1]["resources"] == {"water": 0}
+
+    sequential_path = tmp_path / "sequential.json"
+    sequential_path.write_text(original, encoding="utf-8")
+    disastro.init_store(str(sequential_path), "json")
+    handlers = {"/allocate": disastro.allocate_camp, "/allocate_hub": disastro.allocate_round_robin,
+                "/update_inventory": disastro.update_hub_inventory}
+    sequential = [handlers[path](payload) for path, payload in copy.deepcopy(CALLS)]
+
+    for (body, status), (alone, alone_status) in zip(merged, sequential):
+        if status == 200:
+            assert (body, status) == (alone, alone_status)
+    assert disastro.store.hubs == merged_hubs
+    assert disastro.store.camp("Camp X")["allocations"] == merged_history
+
+
+def test_round_robin_calls_are_served_by_priority_together(disastro):
+    low = {"requests": [{"relief_camp": "Camp X", "resource": "water", "units": 15, "priority": "men"}]}
+    high = {"requests": [{"relief_camp": "Camp X", "resource": "water", "units": 15, "priority": "children"}]}
+    (first, _), (second, _) = async_app._run_batch([("/allocate_hub", low), ("/allocate_hub", high)])
+    # Arriving second, the children's request is still served first
+    assert [alloc["status"] for alloc in second] == ["Allocated"]
+    assert [alloc["status"] for alloc in first] == ["Allocated", "Pending"]
+    assert first[-1]["units_remaining"] == 10
+
+
+def exchange(raw):
+    """Send `raw` to a fresh async_app server and return the first response line."""
+    async def run():
+        front = async_app.Server(async_app.Coalescer())
+        server = await asyncio.start_server(front.serve_client, "127.0.0.1", 0)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+            writer.write(raw)
+            await writer.drain()
+            line = await reader.readline()
+            writer.close()
+        finally:
+            front.close()
+            server.close()
+            await server.wait_closed()
+        return line
+
+    return asyncio.run(run())
+
+
+def test_bad_content_length_is_answered_400(disastro):
+    for length in (b"abc", b"-5"):
+        line = exchange(b"POST /allocate HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+        assert line.startswith(b"HTTP/1.1 400")
@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+from manifest import ManifestError, read_manifest
+
+
+def stock(disastro):
+    return {hub["name"]: dict(hub["resources"]) for hub in disastro.store.hubs}
+
+
+def post(client, body, content_type, **query):
+    return client.post("/update_inventory/bulk", data=body, content_type=content_type, query_string=query)
+
+
+def test_csv_rows_for_one_hub_are_merged():
+    body = b"hub_name,resource,units\nHub A,water,5\nHub A,water,7\nHub B,food,2.5\n"
+    updates = list(read_manifest(io.BytesIO(body), "text/csv", "add"))
+    assert updates == [("line 2", {"hub_name": "Hub A", "resources": {"water": 12}, "update_type": "add"}),
+                       ("line 4", {"hub_name": "Hub B", "resources": {"food": 2.5}, "update_type": "add"})]
+
+
+def test_unsupported_type_and_bad_units_are_rejected():
+    with pytest.raises(ManifestError):
+        read_manifest(io.BytesIO(b""), "text/plain")
+    with pytest.raises(ManifestError, match="line 3"):
+        list(read_manifest(io.BytesIO(b"hub_name,resource,units\nHub A,water,5\nHub A,food,lots\n"), "text/csv"))
+
+
+@pytest.mark.parametrize("body, content_type", [
+    (b'[{"hub_name": "Hub A", "resources": {"water": 5}}, {"hub_name": "Nowhere", "resources": {"water": 5}}]',
+     "application/json"),
+    (b'{"hub_name": "Hub A", "resources": {"water": 5}}\n'
+     b'{"hub_name": "Hub B", "resources": {"water": 1}, "update_type": "bad"}\n', "application/x-ndjson"),
+    (b'{"hub_name": "Hub A", "resources": {"water": 5}}\n{"hub_name": "Hub B", "resou\n', "application/x-ndjson"),
+    (b"hub_name,resource,units\nHub A,water,5\nHub B,water,many\n", "text/csv"),
+])
+def test_an_invalid_row_leaves_all_inventory_untouched(disastro, body, content_type):
+    before = stock(disastro)
+    response = post(disastro.app.test_client(), body, content_type, update_type="add")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "No inventory was changed"
+    assert stock(disastro) == before
+
+
+def test_bulk_update_applies_every_row_and_releases_pending_once(disastro):
+    client = disastro.app.test_client()
+    client.post("/allocate_hub", json={"requests": [
+        {"relief_camp": "Camp X", "resource": "food", "units": 30, "priority": "children"}]})
+    assert disastro.pending.count("food") == 1
+
+    body = b"hub_name,resource,units\nHub A,water,5\nHub A,food,10\nHub B,food,15\n"
+    response = post(client, body, "text/csv", update_type="add")
+    assert response.status_code == 200
+    assert response.get_json()["updates"] == 2 and response.get_json()["released"] == 2
+    # 10 of the 30 came from Hub A at once, the other 20 from the restock
+    assert stock(disastro) == {"Hub A": {"water": 5, "food": 0}, "Hub B": {"water": 20, "food": 5}}
+    assert disastro.pending.count("food") == 0
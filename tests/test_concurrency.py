@@ -0,0 +1,78 @@
+import random
+import sys
+import threading
+
+import pytest
+
+from state import StateStore
+
+RESOURCES = ["water", "food"]
+
+
+@pytest.fixture
+def stocked(disastro):
+    for name in ("Hub A", "Hub B"):
+        disastro.update_hub_inventory({"hub_name": name, "update_type": "set",
+                                       "resources": {"water": 500, "food": 400}})
+    return disastro
+
+
+def shipped(relief_camps):
+    """Units the camps' histories say left a hub, per resource."""
+    units = dict.fromkeys(RESOURCES, 0)
+    for camp in relief_camps:
+        for alloc in camp.get("allocations", []):
+            if alloc["hub"] not in ("N/A", "Multiple") and isinstance(alloc["allocated_units"], int):
+                units[alloc["resource"]] += alloc["allocated_units"]
+    return units
+
+
+def stock(hubs):
+    return {resource: sum(hub["resources"].get(resource, 0) for hub in hubs) for resource in RESOURCES}
+
+
+def test_concurrent_allocations_conserve_stock(stocked):
+    # Switch threads as often as possible, so unguarded updates would interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    initial = stock(stocked.store.hubs)
+    errors = []
+
+    def fire(seed):
+        rng = random.Random(seed)
+        client = stocked.app.test_client()
+        for _ in range(60):
+            requests = [{"resource": rng.choice(RESOURCES), "units": rng.randint(1, 40)}
+                        for _ in range(rng.randint(1, 3))]
+            if rng.random() < 0.5:
+                response = client.post("/allocate", json={"relief_camp": "Camp X", "location": [12.975, 77.595],
+                                                          "requests": requests})
+            else:
+                response = client.post("/allocate_hub", json={"requests": [
+                    dict(req, relief_camp="Camp X") for req in requests]})
+            if response.status_code != 200:
+                errors.append(response.get_json())
+
+    threads = [threading.Thread(target=fire, args=(seed,)) for seed in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    final = stock(stocked.store.hubs)
+    assert all(units >= 0 for hub in stocked.store.hubs for units in hub["resources"].values())
+    # The hubs ran dry, so the shortfall path was exercised too
+    assert final == {"water": 0, "food": 0}
+    used = shipped(stocked.store.relief_camps)
+    for resource in RESOURCES:
+        assert initial[resource] == used[resource] + final[resource]
+
+    # What went to disk balances the same way
+    stocked.store.flush()
+    reloaded = StateStore(stocked.store.path, flush_interval=60)
+    assert stock(reloaded.hubs) == final
+    assert shipped(reloaded.relief_camps) == used
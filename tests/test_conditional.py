@@ -0,0 +1,41 @@
+def add_water(client, hub, units):
+    client.post("/update_inventory", json={"hub_name": hub, "update_type": "add", "resources": {"water": units}})
+
+
+def test_hubs_json_is_not_resent_until_it_changes(disastro):
+    client = disastro.app.test_client()
+    first = client.get("/hubs.json")
+    etag = first.headers["ETag"].strip('"')
+    assert client.get("/hubs.json", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert client.get("/hubs.json", query_string={"since": etag}).status_code == 304
+
+    add_water(client, "Hub A", 3)
+    second = client.get("/hubs.json", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200 and second.headers["ETag"] != first.headers["ETag"]
+    assert second.get_json()["hubs"][0]["resources"]["water"] == 3
+
+
+def test_since_returns_only_the_changes(disastro):
+    client = disastro.app.test_client()
+    mark = client.get("/hubs.json").headers["X-Event-Id"]
+    add_water(client, "Hub A", 3)
+    add_water(client, "Hub A", 2)
+    add_water(client, "Hub B", 1)
+
+    changes = client.get("/hubs.json", query_string={"since": mark}).get_json()
+    # Inventory collapses to each hub's latest stock
+    assert changes["inventory"] == {"Hub A": {"water": 5}, "Hub B": {"water": 21}}
+    assert (changes["since"], changes["hubs"], changes["allocations"]) == (mark, [], [])
+    assert changes["version"] == client.get("/hubs.json").headers["X-Event-Id"]
+
+    # Events no longer retained, or from another run: the full state instead
+    full = client.get("/hubs.json", query_string={"since": "other-1"})
+    assert "relief_camps" in full.get_json() and full.headers["ETag"]
+
+
+def test_session_allocations_etag(disastro):
+    client = disastro.app.test_client()
+    etag = client.get("/session_allocations").headers["ETag"]
+    assert client.get("/session_allocations", headers={"If-None-Match": etag}).status_code == 304
+    client.post("/allocate_hub", json={"requests": [{"relief_camp": "Camp X", "resource": "water", "units": 2}]})
+    assert client.get("/session_allocations", headers={"If-None-Match": etag}).status_code == 200
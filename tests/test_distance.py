@@ -0,0 +1,66 @@
+import random
+
+import numpy as np
+import pytest
+
+import geo
+from distance import DistanceMatrix, distance_matrix, haversine_matrix
+
+
+def points(rng, count):
+    return [[rng.uniform(-60, 60), rng.uniform(-179, 179)] for _ in range(count)]
+
+
+def test_matrix_matches_the_scalar_haversine():
+    rng = random.Random(1)
+    origins, targets = points(rng, 7), points(rng, 5) + [[0.0, 0.0], [0.0, 180.0]]
+    expected = [[geo.haversine_distance(a, b) for b in targets] for a in origins + [[0.0, 0.0]]]
+    assert haversine_matrix(origins + [[0.0, 0.0]], targets) == pytest.approx(np.array(expected), abs=1e-6)
+
+
+def test_incremental_updates_match_a_fresh_build():
+    rng = random.Random(2)
+    hubs = [{"name": f"H{i}", "location": location} for i, location in enumerate(points(rng, 4))]
+    camps = [{"name": f"C{i}", "location": location} for i, location in enumerate(points(rng, 6))]
+    camps.append({"name": "Unmapped", "location": None})
+    matrix = DistanceMatrix.from_state(hubs, camps)
+    assert "Unmapped" not in matrix and matrix.matrix.shape == (6, 4)
+
+    hubs[1]["location"] = [10.0, 20.0]
+    camps[3]["location"] = [-5.0, 40.0]
+    hubs.append({"name": "H4", "location": [1.0, 2.0]})
+    camps.append({"name": "C6", "location": [3.0, 4.0]})
+    for hub in hubs:
+        matrix.set_hub(hub["name"], hub["location"])
+    for camp in camps[:6] + camps[7:]:
+        matrix.set_camp(camp["name"], camp["location"])
+
+    fresh = DistanceMatrix.from_state(hubs, camps)
+    assert matrix.camp_names == fresh.camp_names and matrix.hub_names == fresh.hub_names
+    assert np.array_equal(matrix.matrix, fresh.matrix)
+    assert matrix.get("C3", "H1") == pytest.approx(geo.haversine_distance([-5.0, 40.0], [10.0, 20.0]))
+    assert matrix.block(["C6", "C0"], ["H4"])[:, 0].tolist() == [matrix.get("C6", "H4"), matrix.get("C0", "H4")]
+
+
+class Detour:
+    """Every road is twice the great-circle distance."""
+
+    def distance(self, a, b):
+        return 2 * geo.haversine_distance(a, b)
+
+    def matrix(self, origins, targets):
+        return 2 * haversine_matrix(origins, targets)
+
+
+def test_provider_distances_after_invalidate():
+    matrix = DistanceMatrix.from_state([{"name": "H", "location": [12.98, 77.60]}],
+                                       [{"name": "C", "location": [12.975, 77.595]}])
+    straight = matrix.get("C", "H")
+    geo.set_distance_provider(Detour())
+    try:
+        assert distance_matrix([[0, 0]], [[0, 1]]) == pytest.approx(2 * haversine_matrix([[0, 0]], [[0, 1]]))
+        assert matrix.get("C", "H") == straight
+        matrix.invalidate()
+        assert matrix.get("C", "H") == pytest.approx(2 * straight)
+    finally:
+        geo.set_distance_provider(None)
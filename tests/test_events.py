@@ -0,0 +1,57 @@
+import json
+
+from events import EventLog
+
+
+def parse(text):
+    """[(id, kind, data)] from SSE text."""
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if not line.startswith(":"))
+        events.append((fields["id"], fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_resume_replays_only_what_came_after():
+    log = EventLog()
+    log.publish("inventory", {"units": 1})
+    mark = log.event_id()
+    log.publish("inventory", {"units": 2})
+    log.publish("allocation", {"units": 3})
+
+    first = next(log.stream(mark))
+    assert [(kind, data["units"]) for _, kind, data in parse(first)] == [("inventory", 2), ("allocation", 3)]
+    assert parse(first)[-1][0] == log.event_id()
+
+
+def test_unknown_or_evicted_ids_get_a_reset():
+    log = EventLog(capacity=2)
+    for units in range(4):
+        log.publish("inventory", {"units": units})
+    # From another process, or older than the two events still kept
+    for event_id in ("other-1", log.event_id(1), "garbage"):
+        (event,) = parse(next(log.stream(event_id)))
+        assert event[1] == "reset" and event[0] == log.event_id()
+    assert [kind for _, kind, _ in parse(next(log.stream(log.event_id(2))))] == ["inventory", "inventory"]
+
+
+def test_events_endpoint_resumes_from_last_event_id(disastro):
+    client = disastro.app.test_client()
+    mark = client.get("/hubs.json").headers["X-Event-Id"]
+    client.post("/update_inventory", json={"hub_name": "Hub A", "update_type": "add", "resources": {"water": 4}})
+
+    response = client.get("/events", headers={"Last-Event-ID": mark}, buffered=False)
+    try:
+        assert response.mimetype == "text/event-stream"
+        events = parse(next(iter(response.response)).decode("utf-8"))
+    finally:
+        response.close()
+    assert [(kind, data) for _, kind, data in events] == [
+        ("inventory", {"hub": "Hub A", "resource": "water", "units": 4})]
+
+    # ?since= works the same when the header cannot be set
+    response = client.get("/events", query_string={"since": mark}, buffered=False)
+    try:
+        assert parse(next(iter(response.response)).decode("utf-8")) == events
+    finally:
+        response.close()
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from forecast import DemandForecast, plan_transfers
+
+
+def camp(name, needs=None, population=None, allocations=()):
+    return {"name": name, "needs": needs, "population": population, "allocations": list(allocations)}
+
+
+def test_unlisted_needs_are_estimated_per_weighted_person():
+    forecast = DemandForecast([camp("A", {"water": 10}, {"men": 100}), camp("B", None, {"men": 200})], now=0)
+    assert forecast.forecast(now=0)[:, 0].tolist() == pytest.approx([10, 20])
+
+
+def test_history_is_folded_in_as_one_period():
+    delivered = [{"resource": "water", "allocated_units": 30},
+                 {"resource": "water", "allocated_units": 99, "status": "Pending"}]
+    forecast = DemandForecast([camp("A", {"water": 10}, allocations=delivered)], now=0)
+    assert forecast.level[0, 0] == pytest.approx(0.3 * 30 + 0.7 * 10)
+
+
+def test_holt_smoothing_over_closed_periods():
+    forecast = DemandForecast([camp("A", {"water": 10})], period=10, now=0)
+    forecast.observe("A", "water", 20, now=5)
+    forecast.observe("Nowhere", "water", 50, now=5)
+    assert forecast.forecast(now=9)[0, 0] == pytest.approx(10)
+
+    # The period closes: level 0.3*20 + 0.7*10 = 13, trend 0.1*3
+    assert forecast.forecast(horizon=1, now=12)[0, 0] == pytest.approx(13.3)
+    assert forecast.forecast(horizon=2, now=12)[0, 0] == pytest.approx(2 * 13 + 0.3 * 3)
+    assert forecast.periods == 1
+
+    # A clock jump closes every period missed, each with nothing delivered
+    assert forecast.advance(now=45) == 3
+    assert forecast.periods == 4
+    assert forecast.forecast(now=45)[0, 0] < 13
+
+    # A resource first seen later gets a column of its own
+    forecast.observe("A", "food", 4, now=46)
+    forecast.step(now=47)
+    assert forecast.describe("A", now=47)["resources"]["food"]["level"] == pytest.approx(1.2)
+
+
+def test_transfers_follow_the_demand_to_its_nearest_hub():
+    demand = np.array([[6.0, 0.0], [3.0, 0.0]])
+    units = np.array([[10, 2], [1, 0]])
+    transfers, summary = plan_transfers(demand, [1, 0], units, ["North", "South"],
+                                        [[12.97, 77.59], [13.5, 77.59]], ["water", "food"])
+    assert [(t["resource"], t["from"], t["to"], t["units"]) for t in transfers] == [("water", "North", "South", 5)]
+    assert transfers[0]["distance_km"] == pytest.approx(58.9, abs=0.5)
+    assert summary == {"water": {"demand": 9, "stock": 11, "moved": 5, "short": 0},
+                       "food": {"demand": 0, "stock": 2, "moved": 0, "short": 0}}
+
+    transfers, summary = plan_transfers(demand, [1, 0], units, ["North", "South"],
+                                        [[12.97, 77.59], [13.5, 77.59]], ["water", "food"], min_units=6)
+    assert transfers == [] and summary["water"]["short"] == 5
+
+
+def test_deliveries_feed_the_forecast_endpoint(disastro):
+    client = disastro.app.test_client()
+    client.post("/allocate", json={"relief_camp": "Camp X", "location": [12.975, 77.595],
+                                   "requests": [{"resource": "water", "units": 5}]})
+    disastro.forecast.step()
+    body = client.get("/forecast", query_string={"camp": "Camp X"}).get_json()
+    assert body["resources"]["water"]["level"] == pytest.approx(0.3 * 5)
+    assert client.get("/forecast", query_string={"camp": "Nowhere"}).status_code == 404
+    assert client.get("/forecast", query_string={"horizon": 2}).get_json()["resources"]["water"] > 0
@@ -0,0 +1,81 @@
+import json
+import os
+
+from journal import Journal
+from state import StateStore
+
+
+def reopen(path):
+    """Load the store the way a restart would, without the compaction close() does."""
+    return StateStore(path, flush_interval=60)
+
+
+def water(store, hub="Hub A"):
+    return store.hub(hub)["resources"]["water"]
+
+
+def test_replay_after_flush(data_path):
+    store = reopen(data_path)
+    store.adjust_inventory(store.hub("Hub A"), "water", 5)
+    store.set_inventory(store.hub("Hub B"), "water", 3)
+    assert store.flush() == 2
+    assert water(reopen(data_path)) == 5
+    assert water(reopen(data_path), "Hub B") == 3
+
+
+def test_torn_tail_is_dropped_and_later_records_survive(data_path):
+    store = reopen(data_path)
+    store.adjust_inventory(store.hub("Hub A"), "water", 5)
+    store.flush()
+    with open(data_path + ".journal", "ab") as f:
+        f.write(b'{"op": "inventory", "hub": "Hub A", "resou')
+
+    store = reopen(data_path)
+    assert water(store) == 5
+    store.adjust_inventory(store.hub("Hub A"), "water", 7)
+    store.flush()
+
+    store = reopen(data_path)
+    assert water(store) == 12
+    with open(data_path + ".journal", "rb") as f:
+        assert all(json.loads(line)["op"] == "inventory" for line in f)
+
+
+def test_unterminated_last_record_is_kept(data_path):
+    store = reopen(data_path)
+    store.adjust_inventory(store.hub("Hub A"), "water", 5)
+    store.flush()
+    path = data_path + ".journal"
+    with open(path, "rb") as f:
+        line = f.read()
+    with open(path, "wb") as f:
+        f.write(line.rstrip(b"\n"))
+
+    store = reopen(data_path)
+    assert water(store) == 5
+    store.adjust_inventory(store.hub("Hub A"), "water", 7)
+    store.flush()
+    assert water(reopen(data_path)) == 12
+
+
+def test_read_skips_records_the_snapshot_covers(tmp_path):
+    journal = Journal(str(tmp_path / "hubs.json.journal"))
+    for seq in (1, 2, 3):
+        journal.append({"op": "inventory", "hub": "Hub A", "resource": "water", "delta": 1, "seq": seq})
+    journal.flush()
+    assert [record["seq"] for record in journal.read(after_seq=1)] == [2, 3]
+
+
+def test_corrupt_middle_record_is_skipped_and_later_ones_kept(tmp_path):
+    path = str(tmp_path / "hubs.json.journal")
+    journal = Journal(path)
+    journal.append({"op": "inventory", "hub": "Hub A", "resource": "water", "delta": 1, "seq": 1})
+    journal.flush()
+    with open(path, "ab") as f:
+        f.write(b'{"op": "inventory", "hub": \n')
+    journal.append({"op": "inventory", "hub": "Hub A", "resource": "water", "delta": 1, "seq": 3})
+    journal.flush()
+    size = os.path.getsize(path)
+
+    assert [record["seq"] for record in journal.read()] == [1, 3]
+    assert os.path.getsize(path) == size
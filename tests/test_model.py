@@ -0,0 +1,84 @@
+import threading
+
+import serialize
+from model import AllocationTable, CampAllocations, Interner, Inventory, Model, compact_allocations
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target, args=(k,)) for k in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_interner_gives_each_name_one_id_across_threads():
+    interner = Interner()
+    names = [f"resource {i}" for i in range(2000)]
+
+    def intern(k):
+        for name in names[k::2] + names:
+            interner.id(name)
+
+    run_threads(intern, 8)
+    assert sorted(interner.get(name) for name in names) == list(range(len(names)))
+    assert [interner.name(interner.get(name)) for name in names] == names
+
+
+def test_inventory_keeps_writes_while_other_threads_grow_it():
+    inventory = Inventory.from_hubs([{"name": "Hub A", "resources": {}}])
+
+    def write(k):
+        # Each thread owns its resources, as callers holding per-resource locks would
+        for i in range(300):
+            inventory.set("Hub A", f"r{k}-{i}", i + 1)
+            if i == 150 and k == 0:
+                inventory.set("Hub A", "r0-float", 0.5)
+
+    run_threads(write, 6)
+    for k in range(6):
+        assert [inventory.get("Hub A", f"r{k}-{i}") for i in range(300)] == list(range(1, 301))
+    assert inventory.get("Hub A", "r0-float") == 0.5
+    assert inventory.get("Hub A", "unknown", None) is None
+
+
+def test_model_round_trips_the_json_schema():
+    state = {
+        "hubs": [{"name": "Hub A", "location": [12.97, 77.59], "resources": {"water": 5, "food": 0.5},
+                  "dispatch_hours": 2}],
+        "relief_camps": [
+            {"name": "Camp X", "location": [12.975, 77.595], "population": 300, "allocations": [
+                {"resource": "water", "allocated_to": "Camp X", "hub": "Hub A", "allocated_units": 4,
+                 "status": "Allocated", "distance_km": 0.78},
+                {"resource": "food", "allocated_to": "Camp X", "hub": "N/A",
+                 "allocated_units": "Not fully allocated", "note": "by hand"},
+            ]},
+            {"name": "Camp Y", "location": None},
+        ],
+        "shipped_out": [],
+    }
+    model = Model.from_state(state)
+    assert model.to_state() == state
+    assert dict(zip(model.resources.names, model.allocations.units_by("resource"))) == {"water": 4, "food": 0}
+
+
+def test_camp_allocations_read_like_the_list():
+    table = AllocationTable()
+    history = [
+        {"resource": "water", "allocated_to": "Camp X", "hub": "Hub A", "allocated_units": 4, "status": "Allocated"},
+        {"resource": "water", "allocated_to": "Camp X", "hub": "N/A", "allocated_units": 0,
+         "units_remaining": 6, "status": "Pending", "priority": "children"},
+    ]
+    camps = [{"name": "Camp X", "allocations": [dict(alloc) for alloc in history]}, {"name": "Camp Y"}]
+    compact_allocations(camps, table)
+    allocations = camps[0]["allocations"]
+
+    assert isinstance(allocations, CampAllocations) and "allocations" not in camps[1]
+    assert len(allocations) == 2 and allocations == history and allocations[-1] == history[1]
+    assert allocations[:1] == history[:1]
+    assert len(table) == 1
+
+    # A pending record stays the same dict, so updating it in place sticks
+    allocations[1].update(units_remaining=0, status="Allocated")
+    assert allocations[1]["status"] == "Allocated"
+    assert serialize.loads(serialize.dumps(camps[0]))["allocations"][1]["units_remaining"] == 0
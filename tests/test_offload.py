@@ -0,0 +1,74 @@
+import threading
+import time
+
+import numpy as np
+
+import offload
+
+
+def finished(get, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while True:
+        job = get(job_id)
+        if job["status"] != "running" or time.time() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_round_robin_plan_wraps_around_from_the_last_hub():
+    shared = offload.SharedArray(np.array([[4, 0], [0, 3], [6, 1]]))
+    try:
+        shipments, unmet = offload.plan_round_robin(shared.spec, [(0, 5), (0, 2), (1, 6), (-1, 2)])
+    finally:
+        shared.close()
+    assert shipments == [(0, 0, 4), (0, 2, 1), (1, 2, 2), (2, 1, 3), (2, 2, 1)]
+    assert unmet == [(2, 2), (3, 2)]
+
+
+def test_pending_plan_fills_the_most_urgent_first():
+    shared = offload.SharedArray(np.array([[2, 0], [3, 5]]))
+    try:
+        fills = offload.plan_pending(shared.spec, {0: [4, 4], 1: [1]})
+    finally:
+        shared.close()
+    assert fills == {0: [(0, 0, 2), (0, 1, 2), (1, 1, 1)], 1: [(0, 1, 1)]}
+
+
+def test_conflicts_are_replanned_then_run_inline_on_the_applier_thread():
+    jobs = offload.Jobs(workers=1)
+    threads = []
+
+    def prepare():
+        shared = offload.SharedArray(np.array([[5]]))
+        return (shared.spec, [(0, 3)]), [shared], None
+
+    def apply(plan, context):
+        threads.append(threading.current_thread().name)
+        raise offload.Conflict("stock moved")
+
+    try:
+        job = jobs.submit("test", prepare, offload.plan_round_robin, apply, lambda: "inline")
+        job = finished(jobs.get, job["id"])
+    finally:
+        jobs.shutdown()
+    assert (job["status"], job["result"], job["inline"]) == ("done", "inline", True)
+    assert job["attempts"] == len(threads) == offload.MAX_ATTEMPTS
+    assert set(threads) == {"offload-applier"}
+
+
+def test_async_allocate_hub_replans_when_stock_moves_under_it(disastro):
+    client = disastro.app.test_client()
+    requests = {"requests": [{"relief_camp": "Camp X", "resource": "water", "units": 15}]}
+    # The plan cannot be applied until the lock is released, by which time
+    # Hub B no longer holds what it was planned against
+    with disastro.store.locked(["water"]):
+        response = client.post("/allocate_hub?async=1", json=requests)
+        disastro.store.adjust_inventory(disastro.store.hub("Hub B"), "water", -10)
+    assert response.status_code == 202
+
+    job = finished(lambda job_id: client.get(f"/jobs/{job_id}").get_json(), response.get_json()["id"])
+    assert (job["status"], job["attempts"]) == ("done", 2)
+    assert [(alloc["hub"], alloc["status"]) for alloc in job["result"]] == [("Hub B", "Allocated"), ("N/A", "Pending")]
+    assert job["result"][1]["units_remaining"] == 5
+    assert disastro.store.hub("Hub B")["resources"]["water"] == 0
+    assert client.get("/jobs/job-0").status_code == 404
@@ -0,0 +1,47 @@
+from pending import PendingQueue
+
+
+def waiting(resource, priority="men", units=5):
+    return {"resource": resource, "priority": priority, "status": "Pending", "units_remaining": units}
+
+
+def test_ordered_by_priority_then_arrival():
+    queue = PendingQueue()
+    queue.push("Camp X", 0, waiting("water", "men"))
+    queue.push("Camp Y", 0, waiting("water", "children"))
+    queue.push("Camp X", 1, waiting("water", "elderly"))
+    queue.push("Camp Z", 0, waiting("water", "children"))
+    queue.push("Camp Z", 1, waiting("food", "children"))
+
+    expected = [("Camp Y", 0), ("Camp Z", 0), ("Camp X", 1), ("Camp X", 0)]
+    assert queue.ordered("water") == expected
+    assert list(queue.iter_ordered("water")) == expected
+    assert queue.peek("water") == ("Camp Y", 0)
+
+
+def test_iter_ordered_matches_ordered_on_a_large_queue():
+    queue = PendingQueue()
+    groups = ["men", "children", "women", "elderly"]
+    for index in range(500):
+        queue.push("Camp X", index, waiting("water", groups[index * 7 % 4]))
+    for _ in range(40):
+        queue.pop("water")
+    assert list(queue.iter_ordered("water")) == queue.ordered("water")
+
+
+def test_count_leaves_out_resolved_entries():
+    queue = PendingQueue.from_camps([{"name": "Camp X", "allocations": [
+        waiting("water"), waiting("water", "children"), {"resource": "water", "status": "Allocated"},
+    ]}])
+    assert queue.count("water") == 2
+
+    # Filled out of order: its entry stays behind the head but is not counted
+    queue.resolve("water", "Camp X", 0)
+    assert queue.count("water") == 1
+    assert len(queue) == 1
+    assert queue.peek("water") == ("Camp X", 1)
+
+    queue.pop("water")
+    assert queue.count("water") == 0
+    queue.pop("water")
+    assert queue.resources() == []
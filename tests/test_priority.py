@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from priority import TIME_WEIGHT, CampPriorities, static_scores
+
+HOUR = 3600.0
+
+
+def camp(name, severity=0, population=None, needs=None, last_delivery=0.0):
+    return {"name": name, "severity": severity, "population": population or {}, "needs": needs or {},
+            "allocations": [], "last_delivery": last_delivery}
+
+
+def test_score_terms():
+    priorities = CampPriorities([camp("A", 3, {"children": 100, "men": 50}, {"water": 40})], now=0)
+    assert priorities.score("A", now=2 * HOUR) == pytest.approx(static_scores(3, 120, 1.0) + 2 * TIME_WEIGHT)
+    priorities.delivered_to("A", 10, now=2 * HOUR)
+    assert priorities.describe("A", now=3 * HOUR) == {
+        "camp": "A", "score": pytest.approx(static_scores(3, 120, 0.75) + TIME_WEIGHT, abs=1e-3),
+        "severity": 3.0, "weighted_population": 120.0, "unmet_share": 0.75, "hours_since_delivery": 1.0}
+    assert priorities.score("Nowhere") is None
+
+
+def test_deliveries_rerank_camps():
+    priorities = CampPriorities([camp("A", 5, needs={"water": 10}), camp("B", 5, needs={"water": 10}),
+                                 camp("C", 1)], now=0)
+    # Ties go to the camp listed first
+    assert [name for name, _ in priorities.top(3, now=0)] == ["A", "B", "C"]
+    priorities.delivered_to("A", 10, now=HOUR)
+    assert [name for name, _ in priorities.top(2, now=HOUR)] == ["B", "A"]
+    # The time term grows alike for all camps, so waiting alone changes no ranks
+    assert [name for name, _ in priorities.top(3, now=100 * HOUR)] == ["B", "A", "C"]
+    assert priorities.score("C", now=100 * HOUR) - priorities.score("C", now=HOUR) == pytest.approx(99 * TIME_WEIGHT)
+
+
+def test_top_matches_a_full_sort_after_many_deliveries():
+    rng = random.Random(7)
+    camps = [camp(f"C{i}", rng.randint(0, 5), {"children": rng.randint(0, 300)}, {"water": rng.randint(1, 50)},
+                  last_delivery=rng.uniform(0, 10 * HOUR)) for i in range(50)]
+    priorities = CampPriorities(camps, now=10 * HOUR)
+    for step in range(500):
+        priorities.delivered_to(f"C{rng.randrange(50)}", rng.randint(1, 5), now=10 * HOUR + step)
+    now = 12 * HOUR
+    expected = sorted(priorities.names, key=lambda name: (-priorities.score(name, now), priorities.names.index(name)))
+    assert [name for name, _ in priorities.top(10, now)] == expected[:10]
+    assert len(priorities._heap) <= 2 * len(camps) + 64
+
+
+def test_allocate_hub_serves_the_most_critical_camp_first(disastro):
+    client = disastro.app.test_client()
+    body = client.post("/allocate_hub", json={"requests": [
+        {"relief_camp": "Camp Q", "resource": "water", "units": 15},
+        {"relief_camp": "Camp X", "resource": "water", "units": 15},
+    ]}).get_json()
+    # Camp Q is not in hubs.json, so it has no score and goes last
+    assert [(alloc["allocated_to"], alloc["allocated_units"]) for alloc in body
+            if alloc["status"] == "Allocated"] == [("Camp X", 15), ("Camp Q", 5)]
+    assert client.get("/priorities", query_string={"camp": "Camp X"}).get_json()["camp"] == "Camp X"
+    assert client.get("/priorities", query_string={"camp": "Camp Q"}).status_code == 404
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from rebalance import Rebalancer
+
+PORT = {"name": "Port", "location": [13.05, 77.70], "dispatch_hours": 24, "resources": {"water": 0}}
+DEPOT = {"name": "Depot", "location": [12.98, 77.60], "resources": {"water": 0}}
+CAMP = {"name": "Camp X", "location": [12.975, 77.595], "allocations": []}
+
+
+def camp_km(rebalancer):
+    # Camp X sits next to Depot, 14 km from Port
+    return lambda camp, hub: {"Depot": 0.8, "Port": rebalancer.hub_distances.get("Port", "Depot") + 0.5}[hub]
+
+
+def test_transfer_when_the_source_dispatches_late():
+    rebalancer = Rebalancer([PORT, DEPOT])
+    assert rebalancer.hours("Port", 40) == 25
+    moves = rebalancer.plan(["Port", "Depot"], [50, 0], [("Camp X", "Depot", 30)], camp_km(rebalancer))
+    assert [(source, sink, units) for source, sink, units, _ in moves] == [("Port", "Depot", 30)]
+
+
+def test_no_transfer_without_dispatch_hours():
+    rebalancer = Rebalancer([dict(PORT, dispatch_hours=0), DEPOT])
+    assert rebalancer.plan(["Port", "Depot"], [50, 0], [("Camp X", "Depot", 30)], camp_km(rebalancer)) == []
+
+
+@pytest.fixture
+def port_path(tmp_path):
+    path = tmp_path / "hubs.json"
+    path.write_text(json.dumps({"hubs": [PORT, DEPOT], "relief_camps": [CAMP]}), encoding="utf-8")
+    return str(path)
+
+
+def test_restocked_port_moves_stock_to_the_depot(port_path, monkeypatch):
+    import app
+    app.init_store(port_path, "json")
+    monkeypatch.setattr(app, "REBALANCE", True)
+    try:
+        body, status = app.allocate_round_robin({"requests": [
+            {"relief_camp": "Camp X", "resource": "water", "units": 30, "priority": "children"}]})
+        assert status == 200
+        assert app.pending.count("water") == 1
+
+        body, status = app.update_hub_inventory({"hub_name": "Port", "update_type": "add",
+                                                 "resources": {"water": 50}})
+        assert status == 200
+        assert [(t["from"], t["to"], t["units"]) for t in body["transfers"]] == [("Port", "Depot", 30)]
+        assert app.store.hub("Port")["resources"]["water"] == 20
+        assert app.store.hub("Depot")["resources"]["water"] == 0
+        shipped = [alloc for alloc in app.store.camp("Camp X")["allocations"] if alloc.get("hub") == "Depot"]
+        assert [alloc["allocated_units"] for alloc in shipped] == [30]
+        assert app.pending.count("water") == 0
+    finally:
+        app.store.close()
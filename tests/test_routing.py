@@ -0,0 +1,73 @@
+import random
+
+import numpy as np
+import pytest
+
+from routing import MatrixCache, plan_routes, point_matrix, route_length, two_opt
+
+DEPOT = [12.97, 77.59]
+
+
+def test_every_unit_is_delivered_within_capacity():
+    rng = random.Random(3)
+    stops = [([12.97 + rng.uniform(-0.3, 0.3), 77.59 + rng.uniform(-0.3, 0.3)], rng.randint(1, 140))
+             for _ in range(40)]
+    routes, stats = plan_routes(DEPOT, stops, capacity=100, time_budget=5.0)
+
+    delivered = [0] * len(stops)
+    for route in routes:
+        assert route["load"] == sum(units for _, units in route["stops"]) <= 100
+        for k, units in route["stops"]:
+            delivered[k] += units
+    assert delivered == [units for _, units in stops]
+    # Stops over a vehicle load get whole out-and-back trips first
+    assert sum(1 for route in routes if route["load"] == 100 and len(route["stops"]) == 1) >= sum(
+        units // 100 for _, units in stops)
+    assert stats["vehicles"] == len(routes)
+    assert stats["total_distance_km"] <= stats["nearest_neighbour_km"]
+
+
+def test_stops_along_a_road_are_one_run_out_and_back():
+    # Nearest neighbour zigzags; the improved route visits them in order
+    stops = [([12.97, 77.59 + 0.01 * k], 1) for k in (3, 1, 5, 2, 4)]
+    routes, stats = plan_routes(DEPOT, stops, capacity=10)
+    (route,) = routes
+    farthest = point_matrix([DEPOT, stops[2][0]])[0, 1]
+    assert route["distance_km"] == pytest.approx(2 * farthest, rel=1e-4)
+    assert [k for k, _ in route["stops"]] in ([1, 3, 0, 4, 2], [2, 4, 0, 3, 1])
+
+
+def test_two_opt_untangles_a_crossing():
+    corners = [[0, 0], [0, 1], [1, 1], [1, 0]]
+    matrix = point_matrix([[12.97 + 0.1 * lat, 77.59 + 0.1 * lon] for lat, lon in corners])
+    crossed = [0, 2, 1, 3, 0]
+    route, changed = two_opt(crossed, matrix, deadline=float("inf"))
+    assert changed and route_length(route, matrix) < route_length(crossed, matrix)
+    assert route in ([0, 1, 2, 3, 0], [0, 3, 2, 1, 0])
+
+
+def test_matrix_cache_reuses_a_matrix_for_the_same_points():
+    cache = MatrixCache(size=1)
+    points = [DEPOT, [13.0, 77.6]]
+    first = cache.get(points)
+    assert cache.get([tuple(point) for point in points]) is first
+    cache.get([DEPOT])
+    assert cache.get(points) is not first
+    assert np.array_equal(cache.get(points), first)
+
+
+def test_plan_routes_endpoint(disastro):
+    client = disastro.app.test_client()
+    body = client.post("/plan_routes", json={"hub": "Hub B", "capacity": 10, "allocations": [
+        {"hub": "Hub B", "allocated_to": "Camp X", "allocated_units": 12, "status": "Allocated"},
+        {"hub": "Hub B", "allocated_to": "Camp Y", "allocated_units": 4, "location": [12.99, 77.61]},
+        {"hub": "Hub B", "allocated_to": "Camp Z", "allocated_units": 3},
+        {"hub": "Hub A", "allocated_to": "Camp X", "allocated_units": 50},
+    ]}).get_json()
+    assert body["skipped"] == ["Camp Z"]
+    assert sorted((stop["camp"], stop["units"]) for route in body["routes"] for stop in route["stops"]) == [
+        ("Camp X", 2), ("Camp X", 10), ("Camp Y", 4)]
+    assert body["stats"]["vehicles"] == 2
+
+    assert client.post("/plan_routes", json={"hub": "Hub B", "capacity": 0}).status_code == 400
+    assert client.post("/plan_routes", json={"hub": "Nowhere", "capacity": 10}).status_code == 404
@@ -0,0 +1,75 @@
+import json
+
+from session import SessionAllocations
+
+
+def entry(camp, resource, units, status="Allocated"):
+    return {"allocated_to": camp, "resource": resource, "allocated_units": units, "status": status}
+
+
+def ring(**kwargs):
+    return SessionAllocations(lambda alloc: json.dumps(alloc, sort_keys=True), **kwargs)
+
+
+def test_ring_keeps_the_newest_and_positions_survive_eviction(tmp_path):
+    spill = tmp_path / "session.ndjson"
+    session = ring(capacity=3, spill_path=str(spill), spill_every=1)
+    assert session.extend([entry("Camp X", "water", units) for units in range(5)]) == 0
+    assert session.extend([entry("Camp Y", "food", 9)]) == 5
+
+    assert (session.first, session.total, len(session)) == (3, 6, 3)
+    assert [alloc["allocated_units"] for alloc in json.loads(session.body())] == [3, 4, 9]
+    assert [json.loads(line)["allocated_units"] for line in spill.read_text().splitlines()] == [0, 1, 2]
+
+    # Counters cover the whole session, evicted entries included
+    assert session.rollup(camp="Camp X") == {"allocations": 5, "units": 10, "pending": 0}
+    assert session.rollup()["evicted"] == 3
+
+
+def test_page_from_a_stale_cursor_starts_at_the_oldest_retained():
+    session = ring(capacity=3)
+    session.extend([entry("Camp X", "water", units) for units in range(5)])
+    page = json.loads(session.page(0, 2))
+    assert [alloc["allocated_units"] for alloc in page["allocations"]] == [2, 3]
+    assert (page["first"], page["next_cursor"], page["total"]) == (2, 4, 5)
+    page = json.loads(session.page(page["next_cursor"], 2))
+    assert [alloc["allocated_units"] for alloc in page["allocations"]] == [4]
+    assert page["next_cursor"] == 5
+
+
+def test_max_age_expires_old_entries():
+    session = ring(max_age=10)
+    session.extend([entry("Camp X", "water", 1)], now=100)
+    session.extend([entry("Camp X", "water", 2)], now=105)
+    session.expire(now=112)
+    assert [alloc["allocated_units"] for alloc in session.items()] == [2]
+    assert session.first == 1
+
+
+def test_refresh_picks_up_a_filled_pending_entry():
+    session = ring(capacity=1)
+    waiting = entry("Camp X", "water", 0, status="Pending")
+    session.extend([waiting])
+    assert session.rollup(resource="water")["pending"] == 1
+
+    waiting.update(status="Allocated", allocated_units=7)
+    assert session.refresh(waiting) == 0
+    assert json.loads(session.body())[0]["allocated_units"] == 7
+
+    # Evicted before it was filled: the rollup still moves, the ring does not
+    late = entry("Camp X", "water", 0, status="Pending")
+    session.extend([late, entry("Camp Y", "water", 1)])
+    late.update(status="Allocated", allocated_units=3)
+    assert session.refresh(late) is None
+    assert session.rollup(resource="water") == {"allocations": 3, "units": 11, "pending": 0}
+
+
+def test_endpoint_pages_this_sessions_allocations(disastro):
+    client = disastro.app.test_client()
+    before = client.get("/session_allocations", query_string={"cursor": 0, "limit": 100}).get_json()["total"]
+    client.post("/allocate_hub", json={"requests": [{"relief_camp": "Camp X", "resource": "water", "units": 5}]})
+
+    page = client.get("/session_allocations", query_string={"cursor": before, "limit": 100}).get_json()
+    assert [(alloc["hub"], alloc["allocated_units"]) for alloc in page["allocations"]] == [("Hub B", 5)]
+    assert page["next_cursor"] == before + 1
+    assert client.get("/session_allocations/rollup", query_string={"camp": "Camp X"}).get_json()["units"] >= 5
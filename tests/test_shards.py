@@ -0,0 +1,52 @@
+import shards
+import serialize
+
+BANGALORE, DELHI = [12.97, 77.59], [28.61, 77.21]
+
+
+def dataset():
+    return {
+        "hubs": [
+            {"name": "Hub A", "location": BANGALORE, "resources": {"water": 5}},
+            {"name": "Hub D", "location": DELHI, "resources": {"water": 20}},
+        ],
+        "relief_camps": [{"name": "Camp X", "location": [12.975, 77.595], "allocations": []}],
+    }
+
+
+def test_geohash():
+    assert shards.geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_partition_keeps_neighbours_together():
+    data = dataset()
+    shard_map = shards.ShardMap.partition(data, 2)
+    parts = shard_map.split(data)
+    assert [[hub["name"] for hub in part["hubs"]] for part in parts] == [["Hub A"], ["Hub D"]]
+    assert [camp["name"] for camp in parts[0]["relief_camps"]] == ["Camp X"]
+    # A cell no hub or camp was in goes with its neighbour in geohash order
+    assert shard_map.shard_of([12.90, 77.50]) == 0
+    assert shards.ShardMap.from_dict(shard_map.to_dict()).prefixes == shard_map.prefixes
+
+
+def test_shortfall_spills_to_another_shard_and_each_shard_reconciles(tmp_path):
+    directory = str(tmp_path)
+    shards.write_shards(dataset(), 2, directory)
+    coordinator = shards.Coordinator(directory).start()
+    try:
+        body, status = coordinator.allocate({"relief_camp": "Camp X", "location": [12.975, 77.595],
+                                             "requests": [{"resource": "water", "units": 12}]})
+    finally:
+        coordinator.stop()
+    assert status == 200
+    assert [(alloc["hub"], alloc["allocated_units"]) for alloc in body] == [("Hub A", 5), ("Hub D", 7)]
+    assert coordinator.stats["spilled_units"] == 7
+
+    # Both shards' records survive a restart: the camp's shard has the
+    # allocations, the shipping shard its stock and the shipment
+    home, other = (serialize.load(shards.shard_path(directory, index)) for index in range(2))
+    assert home["hubs"][0]["resources"] == {"water": 0}
+    assert [alloc["allocated_units"] for alloc in home["relief_camps"][0]["allocations"]] == [5, 7]
+    assert other["hubs"][0]["resources"] == {"water": 13}
+    assert [(alloc["hub"], alloc["allocated_units"], alloc["shard"]) for alloc in other["shipped_out"]] == [
+        ("Hub D", 7, 0)]
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+from state import StateStore
+from storage import open_storage
+
+
+def open_store(path, kind="json"):
+    return StateStore(path, flush_interval=60, storage=open_storage(kind, path))
+
+
+def change(store):
+    """One of each change record the store journals."""
+    store.adjust_inventory(store.hub("Hub A"), "water", 5)
+    store.set_inventory(store.hub("Hub B"), "water", 3)
+    store.add_hub({"name": "Hub C", "location": [12.99, 77.61], "resources": {"food": 4}})
+    index = store.add_allocation("Camp X", {"resource": "water", "allocated_to": "Camp X", "hub": "N/A",
+                                            "allocated_units": 0, "units_remaining": 9, "status": "Pending"})
+    store.update_allocation("Camp X", index, units_remaining=0, status="Allocated")
+    with store.transaction():
+        store.adjust_inventory(store.hub("Hub A"), "food", -2)
+        store.adjust_inventory(store.hub("Hub C"), "food", 2)
+
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_flush_and_reload(data_path, kind):
+    store = open_store(data_path, kind)
+    change(store)
+    assert store.flush() == 6
+    assert open_store(data_path, kind).data == store.data
+
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_compact_and_reload(data_path, kind):
+    store = open_store(data_path, kind)
+    change(store)
+    store.flush()
+    assert store.compact()
+    assert store.storage.size == 0
+    assert not store.compact()
+    reloaded = open_store(data_path, kind)
+    assert reloaded.data == store.data
+    assert reloaded.seq == store.seq
+
+
+def test_compact_folds_the_journal_into_the_snapshot(data_path):
+    store = open_store(data_path)
+    change(store)
+    store.compact()
+    assert os.path.getsize(data_path + ".journal") == 0
+    with open(data_path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot.pop("journal_seq") == store.seq
+    assert snapshot == store.data
+
+
+def test_records_after_compaction_replay_on_top(data_path):
+    store = open_store(data_path)
+    change(store)
+    store.compact()
+    store.adjust_inventory(store.hub("Hub A"), "water", 7)
+    store.flush()
+    reloaded = open_store(data_path)
+    assert reloaded.hub("Hub A")["resources"]["water"] == 12
+    assert reloaded.data == store.data
+
+
+def test_close_writes_everything(data_path):
+    store = open_store(data_path).start()
+    change(store)
+    store.close()
+    assert open_store(data_path).data == store.data
+
+
+def test_duplicate_hub_names_are_rejected(data_path):
+    with open(data_path, encoding="utf-8") as f:
+        data = json.load(f)
+    data["hubs"].append({"name": "Hub A", "location": [12.99, 77.61], "resources": {"water": 50}})
+    with open(data_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    with pytest.raises(ValueError, match="Hub A"):
+        open_store(data_path)
@@ -0,0 +1,97 @@
+import itertools
+
+import numpy as np
+
+from batch import solve_batch
+from transport import balance, solve_transportation
+
+
+def splits(units, parts):
+    """Every way to split `units` into `parts` non-negative integers."""
+    if parts == 1:
+        yield (units,)
+        return
+    for first in range(units + 1):
+        for rest in splits(units - first, parts - 1):
+            yield (first,) + rest
+
+
+def brute_force(supply, demand, cost, shortage_cost):
+    """Least total cost over every integer plan, shortage included."""
+    best = np.inf
+    for plan in itertools.product(*(splits(d, len(supply) + 1) for d in demand)):
+        flow = np.array(plan).T  # (sources + shortage, sinks)
+        if (flow[:-1].sum(axis=1) > supply).any():
+            continue
+        best = min(best, (flow[:-1] * cost).sum() + (flow[-1] * shortage_cost).sum())
+    return best
+
+
+def test_transportation_matches_brute_force():
+    rng = np.random.default_rng(7)
+    for _ in range(60):
+        m, n = rng.integers(1, 3, endpoint=True), rng.integers(1, 3, endpoint=True)
+        supply = rng.integers(0, 4, m, endpoint=True)
+        demand = rng.integers(0, 3, n, endpoint=True)
+        cost = rng.integers(1, 20, (m, n)).astype(float)
+        shortage_cost = rng.integers(5, 40, n).astype(float)
+
+        flow, unmet = solve_transportation(supply, demand, cost, shortage_cost)
+        assert (flow >= 0).all() and (unmet >= 0).all()
+        assert (flow.sum(axis=1) <= supply).all()
+        assert (flow.sum(axis=0) + unmet == demand).all()
+        total = (flow * cost).sum() + (unmet * shortage_cost).sum()
+        assert total == brute_force(supply, demand, cost, shortage_cost)
+
+
+def test_shortage_goes_to_the_cheapest_sink_to_leave_short():
+    flow, unmet = solve_transportation([5], [4, 4], [[1.0, 1.0]], [10.0, 50.0])
+    assert flow.tolist() == [[1, 4]] and unmet.tolist() == [3, 0]
+
+
+def test_balance_moves_excess_at_least_distance():
+    positions = np.array([0.0, 1.0, 10.0, 11.0])
+
+    def cost(sources, sinks):
+        return np.abs(positions[sources][:, None] - positions[sinks][None, :])
+
+    moves, short = balance([5, 0, 5, 0], [0, 5, 0, 5], cost)
+    assert sorted(moves) == [(0, 1, 5), (2, 3, 5)]
+    assert short == 0
+    moves, short = balance([3, 0, 0, 0], [0, 2, 0, 4], cost)
+    assert sum(units for _, _, units in moves) == 3 and short == 3
+
+
+def test_batch_beats_greedy_and_serves_children_first():
+    requests = [
+        {"relief_camp": "Near A", "resource": "water", "units": 5, "priority": "men"},
+        {"relief_camp": "Near B", "resource": "water", "units": 5, "priority": "children"},
+    ]
+    # Hub 0 sits next to the first camp, hub 1 next to the second
+    rows = np.array([[1.0, 9.0], [9.0, 1.0]])
+    shipments, unmet, stats = solve_batch(requests, lambda resource: ([0, 1], np.array([5, 5])),
+                                          lambda indexes, positions: rows[np.ix_(indexes, positions)])
+    assert sorted((k, hub, units) for k, hub, units, _ in shipments) == [(0, 0, 5), (1, 1, 5)]
+    assert unmet == {} and stats["total_unit_km"] == 10.0
+    assert stats["total_unit_km"] <= stats["greedy_total_unit_km"]
+
+    _, unmet, _ = solve_batch(requests, lambda resource: ([0], np.array([5])),
+                              lambda indexes, positions: rows[np.ix_(indexes, positions)])
+    assert unmet == {0: 5}
+
+
+def test_allocate_batch_endpoint(disastro):
+    client = disastro.app.test_client()
+    response = client.post("/allocate_batch", json={"requests": [{"resource": "water", "units": 5}]})
+    assert response.status_code == 400
+
+    payload = {"requests": [{"relief_camp": "Camp X", "resource": "water", "units": 25}]}
+    body = client.post("/allocate_batch", json=dict(payload, dry_run=True)).get_json()
+    assert body["stats"]["units_allocated"] == 20
+    assert disastro.store.hub("Hub B")["resources"]["water"] == 20
+
+    body = client.post("/allocate_batch", json=payload).get_json()
+    shipped = [(a["hub"], a["allocated_units"]) for a in body["allocations"] if a["status"] == "Allocated"]
+    assert shipped == [("Hub B", 20)]
+    assert disastro.store.hub("Hub B")["resources"]["water"] == 0
+    assert disastro.pending.count("water") == 1
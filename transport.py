@@ -0,0 +1,142 @@
+import numpy as np
+
+
+def solve_transportation(supply, demand, cost, shortage_cost):
+    """
+    Min-cost transportation by successive shortest paths.
+
+    supply:        (m,) units available at each source
+    demand:        (n,) units wanted at each sink
+    cost:          (m, n) cost per unit shipped
+    shortage_cost: (n,) cost per unit of a sink's demand left unmet
+
+    Every unit of demand is either shipped or charged its shortage cost, so
+    when supply runs short the sinks with the highest shortage cost are
+    served first. Returns (flow, unmet) as integer arrays.
+    """
+    supply = np.asarray(supply, dtype=np.int64)
+    demand = np.asarray(demand, dtype=np.int64)
+    m, n = len(supply), len(demand)
+    # Row m is a virtual source that covers any shortage at its penalty.
+    cost = np.vstack([np.asarray(cost, dtype=float).reshape(m, n), np.asarray(shortage_cost, dtype=float)])
+    left = np.append(supply, demand.sum())
+    need = demand.copy()
+    flow = np.zeros((m + 1, n), dtype=np.int64)
+    p_row = np.zeros(m + 1)
+    p_col = np.zeros(n)
+    p_sink = 0.0
+
+    while need.sum() > 0:
+        # Dijkstra over source -> rows -> columns -> sink on reduced costs.
+        dist_row = np.where(left > 0, -p_row, np.inf)
+        dist_col = np.full(n, np.inf)
+        dist_sink = np.inf
+        via_row = np.full(n, -1)
+        via_col = np.full(m + 1, -1)
+        done_row = np.zeros(m + 1, dtype=bool)
+        done_col = np.zeros(n, dtype=bool)
+        last_col = -1
+        while True:
+            open_row = np.where(done_row, np.inf, dist_row)
+            open_col = np.where(done_col, np.inf, dist_col)
+            i, j = int(open_row.argmin()), int(open_col.argmin())
+            best = min(open_row[i], open_col[j])
+            if dist_sink <= best:
+                break
+            if not np.isfinite(best):
+                break
+            if open_row[i] <= open_col[j]:
+                done_row[i] = True
+                reach = dist_row[i] + cost[i] + p_row[i] - p_col
+                better = (reach < dist_col) & ~done_col
+                dist_col[better] = reach[better]
+                via_row[better] = i
+            else:
+                done_col[j] = True
+                if need[j] > 0 and dist_col[j] + p_col[j] - p_sink < dist_sink:
+                    dist_sink = dist_col[j] + p_col[j] - p_sink
+                    last_col = j
+                back = flow[:, j] > 0
+                reach = dist_col[j] - cost[:, j] + p_col[j] - p_row
+                better = back & (reach < dist_row) & ~done_row
+                dist_row[better] = reach[better]
+                via_col[better] = j
+        if last_col < 0:
+            break
+
+        p_row += np.minimum(dist_row, dist_sink)
+        p_col += np.minimum(dist_col, dist_sink)
+        p_sink += dist_sink
+
+        # Walk the path back from the sink and push its bottleneck.
+        path = []
+        j = last_col
+        while True:
+            i = int(via_row[j])
+            path.append((i, j))
+            j = int(via_col[i])
+            if j < 0:
+                break
+        source = path[-1][0]
+        # Consecutive forward edges are joined by a backward edge (row, next column).
+        backward = [(path[s][0], path[s + 1][1]) for s in range(len(path) - 1)]
+        amount = min(left[source], need[last_col], *(flow[i, j] for i, j in backward))
+        for i, j in path:
+            flow[i, j] += amount
+        for i, j in backward:
+            flow[i, j] -= amount
+        left[source] -= amount
+        need[last_col] -= amount
+
+    return flow[:m], flow[m]
+
+
+# Largest sources x sinks problem balance() solves exactly; past it the
+# successive-shortest-path solve grows to seconds
+EXACT_PAIRS = 4096
+
+
+def _cheapest_first(supply, demand, costs):
+    """Fill the cheapest pairs first: optimal with one source or one sink, close to it otherwise."""
+    flow = np.zeros(costs.shape, dtype=np.int64)
+    left, wanted = supply.copy(), demand.copy()
+    remaining = min(left.sum(), wanted.sum())
+    for a, b in zip(*np.unravel_index(np.argsort(costs, axis=None, kind="stable"), costs.shape)):
+        sent = min(left[a], wanted[b])
+        if sent:
+            flow[a, b], left[a], wanted[b] = sent, left[a] - sent, wanted[b] - sent
+            remaining -= sent
+            if not remaining:
+                break
+    return flow
+
+
+def balance(stock, need, cost):
+    """
+    Move units from sites holding more than they need to sites holding
+    less, at the least total cost.
+
+    stock, need: (k,) units held and wanted at each site
+    cost:        function (sources, sinks) -> (len(sources), len(sinks))
+                 cost per unit moved between the given site indexes
+
+    Solved exactly (solve_transportation) up to EXACT_PAIRS source-sink
+    pairs, and by filling the cheapest pairs first above that or when one
+    side is a single site. Returns (moves, short): [(source, sink, units)]
+    and the units still short across all sites once the moves are made.
+    """
+    stock = np.floor(np.clip(np.asarray(stock, dtype=float), 0, None)).astype(np.int64)
+    need = np.ceil(np.clip(np.asarray(need, dtype=float), 0, None)).astype(np.int64)
+    excess = stock - need
+    sources, sinks = np.flatnonzero(excess > 0), np.flatnonzero(excess < 0)
+    short = int(-excess[sinks].sum())
+    if not len(sources) or not len(sinks):
+        return [], short
+    costs = np.asarray(cost(sources, sinks), dtype=float)
+    if len(sources) == 1 or len(sinks) == 1 or len(sources) * len(sinks) > EXACT_PAIRS:
+        flow = _cheapest_first(excess[sources], -excess[sinks], costs)
+    else:
+        # Leaving a unit short costs more than any move, so as much as possible is moved
+        flow, _ = solve_transportation(excess[sources], -excess[sinks], costs, np.full(len(sinks), costs.max() + 1.0))
+    moves = [(int(sources[a]), int(sinks[b]), int(flow[a, b])) for a, b in zip(*np.nonzero(flow))]
+    return moves, short - sum(units for _, _, units in moves)